@@ -2,31 +2,38 @@
 
 import pandas as pd
 import numpy as np
+from CleaningRules import replace_empty_strings, drop_missing_values
+from DataCache import load_csv
+from CurrencyValidation import map_currency_symbols
+from DateNormalization import normalize_dates
+from DishDeduplication import standardize_names, build_id_mapping, remap_dish_ids
+from ChangeMetrics import column_changes
+
+# Let cleaned frames share memory with the loaded data until a column is changed
+pd.set_option("mode.copy_on_write", True)
 
 # @begin Load_Data @desc Load the menu data from CSV
 # @in menu_csv @uri file:./data/Menu.csv
 # @out df_initial
-df = pd.read_csv("./data/Menu.csv")
+df = load_csv("./data/Menu.csv")
 # @end Load_Data
 
-# Create a copy of the original DataFrame
-df_original = df.copy()
+# The original DataFrame is never modified, so it is shared instead of copied
+df_original = df
 
-# Create a copy to be used for cleaning
-df_cleaned = df.copy()
+# Shallow copy to be used for cleaning; copy-on-write only duplicates changed columns
+df_cleaned = df.copy(deep=False)
 
 # @begin Replace_Empty_Strings @desc Replace empty strings with NaN
 # @in df_initial
 # @out df_replaced_empty
-df_cleaned.replace("", pd.NA, inplace=True)
+df_cleaned = replace_empty_strings(df_cleaned)
 # @end Replace_Empty_Strings
 
 # @begin Drop_Missing_Values @desc Remove rows with missing values in the specified columns
 # @in df_replaced_empty
 # @out df_dropped_missing
-df_cleaned = df_cleaned.dropna(subset=["date"])
-df_cleaned = df_cleaned.dropna(subset=["currency"])
-df_cleaned = df_cleaned.dropna(subset=["location"])
+df_cleaned = drop_missing_values(df_cleaned, ["date", "currency", "location"])
 # @end Drop_Missing_Values
 
 # @begin Display_Results @desc Display the lengths of original and cleaned data
@@ -50,18 +57,16 @@ for column in original_lengths:
 # @begin To_ISO_Format @desc Convert date to ISO format
 # @in df_dropped_missing
 # @out df_iso_format
-def to_iso_format(date_str):
-    try:
-        date = pd.to_datetime(date_str, errors="raise")
-        return date.strftime("%Y-%m-%d")
-    except Exception as e:
-        return None
-
-df_cleaned["date"] = df_cleaned["date"].apply(to_iso_format)
+df_cleaned["date"], date_format_counts = normalize_dates(df_cleaned["date"])
 
 # Drop rows where the date could not be parsed
 df_cleaned = df_cleaned.dropna(subset=["date"])
 
+print(f"{'Date Format':<20} | {'Matched Rows':<15}")
+print("-" * 35)
+for date_format, count in date_format_counts.items():
+    print(f"{date_format:<20} | {count:<15}")
+
 # Display the results
 original_lengths = {
     "date": len(df_original["date"])
@@ -123,17 +128,15 @@ currency_to_symbol = {
     'Straits_dollar_1904_1939': 'SGD'
 }
 
-df_cleaned['currency_symbol'] = df_cleaned['currency'].map(currency_to_symbol).fillna(df_cleaned['currency_symbol'])
+df_cleaned['currency_symbol'] = map_currency_symbols(df_cleaned['currency'], df_cleaned['currency_symbol'], currency_to_symbol)
 # @end Clean_Currency_Columns
 
 # @begin Compare_Columns @desc Compare columns between original and cleaned DataFrames
 # @in df_original @in df_cleaned_currency
 # @out diff_count_a @out diff_count_b
-df_original_aligned = df_original.loc[df_cleaned.index]
-diff_a = df_original_aligned['currency'] != df_cleaned['currency']
-diff_b = df_original_aligned['currency_symbol'] != df_cleaned['currency_symbol']
-diff_count_a = diff_a.sum()
-diff_count_b = diff_b.sum()
+changes = column_changes(df_original, df_cleaned)
+diff_count_a = changes.loc['currency', 'cells_modified']
+diff_count_b = changes.loc['currency_symbol', 'cells_modified']
 print(f"{'Column':<20} | {'Differing Rows':<15}")
 print("-" * 35)
 print(f"{'currency':<20} | {diff_count_a:<15}")
@@ -155,14 +158,14 @@ print(f"{'Cleaned Occasions':<20} | {total_rows:<10}")
 # @in menu_item_csv @uri file:./data/MenuItem.csv
 # @in dish_csv @uri file:./data/Dish.csv
 # @out df_menu_item @out df_dish
-df = pd.read_csv("./data/MenuItem.csv")
-dish_df = pd.read_csv("./data/Dish.csv")
+df = load_csv("./data/MenuItem.csv")
+dish_df = load_csv("./data/Dish.csv")
 # @end Load_MenuItem_Data
 
 # @begin Replace_Empty_Strings_MenuItem @desc Replace empty strings with NaN in MenuItem data
 # @in df_menu_item
 # @out df_cleaned_menu_item
-df_cleaned.replace("", pd.NA, inplace=True)
+df_cleaned = replace_empty_strings(df_cleaned)
 # @end Replace_Empty_Strings_MenuItem
 
 # @begin Drop_Missing_Price @desc Remove rows with missing values in the price column
@@ -180,36 +183,22 @@ for column in original_lengths:
 # @begin Standardize_Name @desc Standardize the dish names
 # @in name
 # @out standardized_name
-def standardize_name(name):
-    if pd.isna(name):
-        return name
-    return ' '.join(word.capitalize() for word in name.split())
-
-dish_df['name'] = dish_df['name'].apply(standardize_name)
+dish_df['name'] = standardize_names(dish_df['name'])
 # @end Standardize_Name
 
 # @begin Handle_Duplicates @desc Handle duplicate dish names
 # @in df_dish
 # @out id_mapping @out df_cleaned_dish
-duplicates = dish_df[dish_df.duplicated(subset='name', keep=False)]
-duplicate_groups = duplicates.groupby('name')['id'].apply(list).reset_index()
-id_mapping = {}
-for _, row in duplicate_groups.iterrows():
-    name = row['name']
-    ids = row['id']
-    first_id = ids[0]
-    for duplicate_id in ids[1:]:
-        id_mapping[duplicate_id] = first_id
-
-df_cleaned['dish_id'] = df_cleaned['dish_id'].replace(id_mapping)
+id_mapping = build_id_mapping(dish_df)
+
+df_cleaned['dish_id'] = remap_dish_ids(df_cleaned['dish_id'], id_mapping)
 # @end Handle_Duplicates
 
 # @begin Compare_Columns_DishID @desc Compare columns between original and cleaned DataFrames for dish_id
 # @in df_menu_item @in df_cleaned_dish
 # @out diff_count_dish_id
-df_original_aligned = df_original.loc[df_cleaned.index]
-diff_a = df_original_aligned['dish_id'] != df_cleaned['dish_id']
-diff_count_a = diff_a.sum()
+changes = column_changes(df_original, df_cleaned, ['dish_id'])
+diff_count_a = changes.loc['dish_id', 'cells_modified']
 print(f"{'Column':<20} | {'Differing Rows':<15}")
 print("-" * 35)
 print(f"{'dish_id':<20} | {diff_count_a:<15}")
@@ -2,33 +2,38 @@
 
 import pandas as pd
 import numpy as np
-from datetime import datetime
-from forex_python.converter import CurrencyCodes
+from CleaningRules import replace_empty_strings, drop_missing_values
+from DataCache import load_csv, unique_rows
+from CurrencyValidation import map_currency_symbols, count_invalid_iso_4217, validate_iso_4217
+from DateNormalization import normalize_dates, count_invalid_dates
+from DishDeduplication import standardize_names, build_id_mapping, remap_dish_ids, verify_integrity
+from OccasionClustering import normalize_occasions
+
+# Let cleaned frames share memory with the loaded data until a column is changed
+pd.set_option("mode.copy_on_write", True)
 
 # @begin Load_Data @desc Load the menu data from CSV
 # @in menu_csv @uri file:./data/Menu.csv
 # @out df_initial
-df = pd.read_csv("./data/Menu.csv")
+df = load_csv("./data/Menu.csv")
 # @end Load_Data
 
-# Create a copy of the original DataFrame
-df_original = df.copy()
+# The original DataFrame is never modified, so it is shared instead of copied
+df_original = df
 
-# Create a copy to be used for cleaning
-df_cleaned = df.copy()
+# Shallow copy to be used for cleaning; copy-on-write only duplicates changed columns
+df_cleaned = df.copy(deep=False)
 
 # @begin Replace_Empty_Strings @desc Replace empty strings with NaN
 # @in df_initial
 # @out df_replaced_empty
-df_cleaned.replace("", pd.NA, inplace=True)
+df_cleaned = replace_empty_strings(df_cleaned)
 # @end Replace_Empty_Strings
 
 # @begin Drop_Missing_Values @desc Remove the rows with missing values in the specified columns
 # @in df_replaced_empty
 # @out df_dropped_missing
-df_cleaned = df_cleaned.dropna(subset=["date"])
-df_cleaned = df_cleaned.dropna(subset=["currency"])
-df_cleaned = df_cleaned.dropna(subset=["location"])
+df_cleaned = drop_missing_values(df_cleaned, ["date", "currency", "location"])
 # @end Drop_Missing_Values
 
 # @begin Count_Empty @desc Count empty values in columns
@@ -71,37 +76,16 @@ print("\nQuery Result:", invalid_rows)
 # @begin To_ISO_Format @desc Convert date to ISO format
 # @in df_dropped_missing
 # @out df_iso_format
-def to_iso_format(date_str):
-    try:
-        date = pd.to_datetime(date_str, errors="raise")
-        return date.strftime("%Y-%m-%d")
-    except Exception as e:
-        return None
-
-df_cleaned["date"] = df_cleaned["date"].apply(to_iso_format)
+df_cleaned["date"], date_format_counts = normalize_dates(df_cleaned["date"])
 
 # Drop rows where the date could not be parsed
 df_cleaned = df_cleaned.dropna(subset=["date"])
-# @end To_ISO_Format
 
-# @begin Is_Date_Format @desc Check if the date is in ISO format
-# @param date_str
-# @out is_valid_date
-def is_date_format(date_str):
-    try:
-        datetime.strptime(date_str, "%Y-%m-%d")
-        return True
-    except (ValueError, TypeError):
-        return False
-# @end Is_Date_Format
-
-# @begin Count_Invalid_Dates @desc Count invalid dates in the column
-# @in df @param column
-# @out invalid_count_dates
-def count_invalid_dates(df, column):
-    invalid_count = df[column].apply(lambda x: not is_date_format(x) if pd.notna(x) else True).sum()
-    return invalid_count
-# @end Count_Invalid_Dates
+print(f"{'Date Format':<20} | {'Matched Rows':<15}")
+print("-" * 35)
+for date_format, count in date_format_counts.items():
+    print(f"{date_format:<20} | {count:<15}")
+# @end To_ISO_Format
 
 # @begin Display_Date_Results @desc Display the lengths of original and cleaned data for date column
 # @in df_original @in df_iso_format
@@ -140,7 +124,7 @@ df_cleaned = df_cleaned[~df_cleaned['currency'].isin(['Cents', 'Pence'])]
 # @begin Unique_Currency_Combinations @desc Get unique currency and symbol combinations
 # @in df_cleaned_valid_currency
 # @out unique_combinations
-unique_combinations = df_cleaned[['currency', 'currency_symbol']].drop_duplicates()
+unique_combinations = unique_rows(df_cleaned, ['currency', 'currency_symbol'])
 # @end Unique_Currency_Combinations
 
 # @begin Currency_To_Symbol @desc Map currency to currency symbol
@@ -186,31 +170,15 @@ currency_to_symbol = {
     'Straits dollar (1904-1939)': 'SGD'
 }
 
-df_cleaned['currency_symbol'] = df_cleaned['currency'].map(currency_to_symbol).fillna(df_cleaned['currency_symbol'])
+df_cleaned['currency_symbol'] = map_currency_symbols(df_cleaned['currency'], df_cleaned['currency_symbol'], currency_to_symbol)
 # @end Currency_To_Symbol
 
 # @begin Unique_Combinations_After_Update @desc Get unique currency and symbol combinations after update
 # @in df_currency_mapped
 # @out unique_combinations_after_update
-unique_combinations_after_update = df_cleaned[['currency', 'currency_symbol']].drop_duplicates()
+unique_combinations_after_update = unique_rows(df_cleaned, ['currency', 'currency_symbol'])
 # @end Unique_Combinations_After_Update
 
-# @begin Is_Valid_ISO_4217 @desc Check if the currency code is a valid ISO 4217 code
-# @param currency_code
-# @out is_valid_iso
-def is_valid_iso_4217(currency_code):
-    c = CurrencyCodes()
-    return c.get_currency_name(currency_code) is not None
-# @end Is_Valid_ISO_4217
-
-# @begin Count_Invalid_ISO_4217 @desc Count invalid ISO 4217 codes
-# @in df @param column
-# @out invalid_count_iso
-def count_invalid_iso_4217(df, column):
-    invalid_count = df[column].apply(lambda x: not is_valid_iso_4217(x) if pd.notna(x) else True).sum()
-    return invalid_count
-# @end Count_Invalid_ISO_4217
-
 # @begin Display_Currency_Symbol_Results @desc Display the lengths of original and cleaned data for currency_symbol column
 # @in df_original @in df_currency_mapped
 original_lengths = {
@@ -225,34 +193,38 @@ print(f"{'Column':<10} | {'Original Violations':<15} | {'Cleaned Violations':<15
 print("-" * 45)
 for column in original_lengths:
     print(f"{column:<10} | {original_lengths[column]:<15} | {cleaned_lengths[column]:<15}")
+
+_, invalid_codes = validate_iso_4217(df_cleaned["currency_symbol"])
+print("\nInvalid Codes:", invalid_codes.to_dict())
 # @end Display_Currency_Symbol_Results
 
 # @begin Is_Valid_Occasion @desc Check if the occasion is valid
 # @param occasion
 # @out is_valid_occasion
+clusters = [
+    "Anniversary",
+    "Daily",
+    "Complimentary",
+    "Annual",
+    "Farewell",
+    "Tour",
+    "Holiday",
+    "Patriotic",
+    "Rite",
+    "Dinner",
+    "Breakfast",
+    "Social",
+    "Meeting",
+    "Religious Holiday",
+    "Political",
+    "Festival",
+    "Reunion",
+    "Reception",
+    "Lunch",
+    "Graduation"
+]
+
 def is_valid_occasion(occasion):
-    clusters = [
-        "Anniversary",
-        "Daily",
-        "Complimentary",
-        "Annual",
-        "Farewell",
-        "Tour",
-        "Holiday",
-        "Patriotic",
-        "Rite",
-        "Dinner",
-        "Breakfast",
-        "Social",
-        "Meeting",
-        "Religious Holiday",
-        "Political",
-        "Festival",
-        "Reunion",
-        "Reception",
-        "Lunch",
-        "Graduation"
-    ]
     return occasion in clusters
 # @end Is_Valid_Occasion
 
@@ -260,18 +232,25 @@ def is_valid_occasion(occasion):
 # @in df @param column
 # @out invalid_count_occasion
 def count_invalid_occasions(df, column):
-    invalid_count = df[column].apply(lambda x: not is_valid_occasion(x) if pd.notna(x) else True).sum()
+    # Missing occasions are invalid; isin works the same on object and categorical columns
+    invalid_count = (~df[column].isin(clusters)).sum()
     return invalid_count
 # @end Count_Invalid_Occasions
 
+# @begin Normalize_Occasion @desc Map the raw occasions to their clusters
+# @in df_cleaned
+# @out df_cleaned_occasion
+df_cleaned['occasion'], occasion_match_counts = normalize_occasions(df_cleaned['occasion'])
+# @end Normalize_Occasion
+
 # @begin Display_Occasion_Results @desc Display the lengths of original and cleaned data for occasion column
-# @in df_original @in df_cleaned
+# @in df_original @in df_cleaned_occasion
 original_lengths = {
     "occasion": count_invalid_occasions(df_original, "occasion")
 }
 
 cleaned_lengths = {
-    "occasion": 0
+    "occasion": count_invalid_occasions(df_cleaned, "occasion")
 }
 
 print(f"{'Column':<10} | {'Original Violations':<15} | {'Cleaned Violations':<15}")
@@ -284,20 +263,18 @@ for column in original_lengths:
 # @in menu_item_csv @uri file:./data/MenuItem.csv
 # @in dish_csv @uri file:./data/Dish.csv
 # @out df_menu_item @out df_dish
-df_menu_item = pd.read_csv("./data/MenuItem.csv")
-df_dish = pd.read_csv("./data/Dish.csv")
+df_menu_item = load_csv("./data/MenuItem.csv")
+df_dish = load_csv("./data/Dish.csv")
 # @end Load_MenuItem_Data
 
-# Create a copy of the original DataFrame
-df_original_menu_item = df_menu_item.copy()
+df_original_menu_item = df_menu_item
 
-# Create a copy to be used for cleaning
-df_cleaned_menu_item = df_menu_item.copy()
+df_cleaned_menu_item = df_menu_item.copy(deep=False)
 
 # @begin Replace_Empty_Strings_MenuItem @desc Replace empty strings with NaN in MenuItem data
 # @in df_menu_item
 # @out df_cleaned_menu_item_replaced
-df_cleaned_menu_item.replace("", pd.NA, inplace=True)
+df_cleaned_menu_item = replace_empty_strings(df_cleaned_menu_item)
 # @end Replace_Empty_Strings_MenuItem
 
 # @begin Drop_Missing_Price @desc Remove the rows with missing values in the price column
@@ -332,67 +309,37 @@ print("\nQuery Result:", invalid_rows)
 # @begin Standardize_Name @desc Standardize the dish names
 # @in df_dish
 # @out df_standardized_names
-def standardize_name(name):
-    if pd.isna(name):
-        return name
-    return ' '.join(word.capitalize() for word in name.split())
-
-df_dish['name'] = df_dish['name'].apply(standardize_name)
+df_dish['name'] = standardize_names(df_dish['name'])
 # @end Standardize_Name
 
 # @begin Handle_Duplicates @desc Handle duplicate dish names
 # @in df_dish
 # @out id_mapping @out df_cleaned_menu_item_dish
-duplicates = df_dish[df_dish.duplicated(subset='name', keep=False)]
-
-duplicate_groups = duplicates.groupby('name')['id'].apply(list).reset_index()
-
-id_mapping = {}
-for _, row in duplicate_groups.iterrows():
-    name = row['name']
-    ids = row['id']
-    first_id = ids[0]
-    for duplicate_id in ids[1:]:
-        id_mapping[duplicate_id] = first_id
+id_mapping = build_id_mapping(df_dish)
 
-df_cleaned_menu_item['dish_id'] = df_cleaned_menu_item['dish_id'].replace(id_mapping)
+df_cleaned_menu_item['dish_id'] = remap_dish_ids(df_cleaned_menu_item['dish_id'], id_mapping)
 # @end Handle_Duplicates
 
 # @begin Verify_Integrity @desc Verify integrity of the cleaned data
 # @in df_cleaned_menu_item @in df_dish @in id_mapping
 # @out violations
-def verify_integrity(df_cleaned, dish_df, id_mapping):
-    id_to_name = dish_df.set_index('id')['name'].to_dict()
-
-    seen_dish_ids = {}
-    violations = 0
-
-    for _, row in df_cleaned.iterrows():
-        dish_id = row['dish_id']
-        if pd.isna(dish_id):
-            continue
-
-        if dish_id in seen_dish_ids:
-            if seen_dish_ids[dish_id] != id_to_name.get(dish_id, None):
-                violations += 1
-                print(f"Violation: dish_id {dish_id} maps to a different name.")
-        else:
-            seen_dish_ids[dish_id] = id_to_name.get(dish_id, None)
-
-    return violations
+original_violations, _ = verify_integrity(df_original_menu_item, df_dish, id_mapping)
+cleaned_violations, cleaned_violation_ids = verify_integrity(df_cleaned_menu_item, df_dish, id_mapping)
 
 original_lengths = {
-    "bad mappings": verify_integrity(df_original_menu_item, df_dish, id_mapping)
+    "bad mappings": original_violations
 }
 
 cleaned_lengths = {
-    "bad mappings": verify_integrity(df_cleaned_menu_item, df_dish, id_mapping)
+    "bad mappings": cleaned_violations
 }
 
 print(f"{'Column':<10} | {'Original Violations':<15} | {'Cleaned Violations':<15}")
 print("-" * 45)
 for column in original_lengths:
     print(f"{column:<10} | {original_lengths[column]:<15} | {cleaned_lengths[column]:<15}")
+
+print("\nViolating Dish Ids:", cleaned_violation_ids.head(10))
 # @end Verify_Integrity
 
 # @end ICViolationsScript
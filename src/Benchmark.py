@@ -0,0 +1,468 @@
+'''
+Benchmarks every cleaning rule and IC check of the scripts on synthetic
+Menu/MenuItem/Dish data and appends the results to a JSON history, so that
+each run can be compared against the previous run at the same scale
+
+Usage: python Benchmark.py [rows ...] [--repeat n] [--seed n] [--history path] [--no-fuzzy] [--no-sql]
+'''
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from CleaningRules import (MENU_CONSTRAINTS, MENU_ITEM_CONSTRAINTS, BAD_MAPPINGS, MENU_REQUIRED,
+                           replace_empty_strings, drop_missing_values, to_iso_format, drop_empty_currency,
+                           drop_invalid_currencies, currency_to_symbol, normalize_occasion, drop_missing_price,
+                           handle_duplicates)
+from CurrencyValidation import CURRENCY_TO_SYMBOL, load_iso_4217_codes
+from DataCache import load_csv, load_required_csv, read_schema_csv
+from DishDeduplication import deduplicate_dishes, verify_integrity
+from FuzzyDishDeduplication import fuzzy_id_mapping
+from ICRegistry import count_violations
+from OccasionClustering import OCCASION_CLUSTERS, OCCASION_KEYWORDS
+from Pipeline import reset_peak_rss, step_peak_rss_mb
+from SQLBackend import SQLBackend, connect
+
+DEFAULT_SCALES = [10_000, 100_000]
+DEFAULT_HISTORY = "./data/.cache/benchmark/history.json"
+DATASET_DIR = "./data/.cache/benchmark"
+CHUNK_SIZE = 1_000_000
+
+# Share of missing values per column, roughly as in the NYPL extract
+MENU_NULL_RATES = {
+    "name": 0.8, "sponsor": 0.1, "event": 0.55, "venue": 0.55, "place": 0.55,
+    "physical_description": 0.1, "occasion": 0.75, "notes": 0.4, "date": 0.03,
+    "location": 0.001, "currency": 0.63,
+}
+MENU_ITEM_NULL_RATES = {"price": 0.33, "high_price": 0.93, "dish_id": 0.001}
+
+# Raw date layouts and the share of the non-missing dates written in each;
+# "invalid" dates look like dates but no parser accepts them
+DATE_LAYOUTS = {
+    "%Y-%m-%d": 0.93,
+    "%m/%d/%Y": 0.02,
+    "%B %d, %Y": 0.02,
+    "%d %B %Y": 0.01,
+    "invalid": 0.02,
+}
+INVALID_DATES = np.array(["1912-02-30", "0190-03-06", "1901-13-01", "unknown", "19??"], dtype=object)
+
+# Symbols the transcribers used instead of the ISO code for common currencies
+DISPLAY_SYMBOLS = {"Dollars": "$", "UK Pounds": "£", "Francs": "F", "Deutsche Marks": "M"}
+
+EVENTS = np.array(["DINNER", "BREAKFAST", "LUNCH", "SUPPER", "BANQUET", "ANNUAL DINNER"], dtype=object)
+VENUES = np.array(["COMMERCIAL", "SOCIAL", "PROFESSIONAL", "PATRIOTIC", "GOVT", "EDUC"], dtype=object)
+PLACES = np.array(["NEW YORK, NY", "BOSTON, MA", "PARIS", "LONDON", "ON BOARD", "CHICAGO, IL"], dtype=object)
+LOCATIONS = np.array(["Waldorf Astoria", "Hotel Astor", "Delmonico's", "Hotel Manhattan", "Fifth Avenue Hotel",
+                      "Hamburg-Amerika Linie", "Norddeutscher Lloyd", "Cunard Line"], dtype=object)
+
+DISH_WORDS = np.array([
+    "consommé", "royale", "roast", "beef", "chicken", "soup", "oysters", "clams", "lobster", "salad",
+    "potatoes", "mashed", "boiled", "fried", "sauce", "hollandaise", "tea", "coffee", "ice", "cream",
+    "apple", "pie", "lamb", "mint", "filet", "mignon", "turtle", "green", "peas", "asparagus",
+    "crab", "deviled", "eggs", "omelette", "ham", "bacon", "toast", "rolls", "butter", "cheese",
+], dtype=object)
+
+# Share of dish names that repeat an earlier name with different case or spacing
+DISH_DUPLICATE_RATE = 0.3
+
+def missing(rng, size, rate):
+    return rng.random(size) < rate
+
+def with_nulls(values, mask):
+    values = values.astype(object)
+    values[mask] = None
+    return values
+
+def random_dates(rng, size):
+    """Raw date strings in the layouts of DATE_LAYOUTS, between 1851 and 2008."""
+    days = rng.integers(np.datetime64("1851-01-01", "D").astype(int), np.datetime64("2008-12-31", "D").astype(int), size)
+    dates = pd.Series(pd.to_datetime(days, unit="D"))
+    layouts = rng.choice(list(DATE_LAYOUTS), size, p=list(DATE_LAYOUTS.values()))
+
+    raw = np.empty(size, dtype=object)
+    for layout in DATE_LAYOUTS:
+        rows = layouts == layout
+        if layout == "invalid":
+            raw[rows] = rng.choice(INVALID_DATES, int(rows.sum()))
+        else:
+            raw[rows] = dates[rows].dt.strftime(layout).to_numpy()
+    return raw
+
+def random_occasions(rng, size):
+    # Cluster names and keywords in assorted case, with some trailing punctuation and unmatched text
+    vocabulary = [name for name in OCCASION_CLUSTERS] + [word for words in OCCASION_KEYWORDS.values() for word in words]
+    occasions = rng.choice(np.array(vocabulary + ["unknown", "other"], dtype=object), size)
+    upper = rng.random(size) < 0.5
+    occasions[upper] = [occasion.upper() for occasion in occasions[upper]]
+    punctuated = rng.random(size) < 0.2
+    occasions[punctuated] = occasions[punctuated] + ";"
+    return occasions
+
+def generate_menu(rows, seed=0, start_id=1):
+    """A Menu.csv-shaped frame with realistic null rates and raw date formats."""
+    rng = np.random.default_rng([seed, start_id])
+    currencies = np.array(list(CURRENCY_TO_SYMBOL) + ["Cents", "Pence"], dtype=object)
+    weights = np.full(len(currencies), 0.1 / (len(currencies) - 1))
+    weights[0] = 0.9
+    currency = rng.choice(currencies, rows, p=weights / weights.sum())
+
+    # The symbol is mostly the ISO code, sometimes the display symbol, and missing with the currency
+    symbol = np.array([CURRENCY_TO_SYMBOL.get(name, name[0].lower()) for name in currency], dtype=object)
+    display = rng.random(rows) < 0.5
+    symbol[display] = [DISPLAY_SYMBOLS.get(name, code) for name, code in zip(currency[display], symbol[display])]
+    currency_missing = missing(rng, rows, MENU_NULL_RATES["currency"])
+
+    return pd.DataFrame({
+        "id": np.arange(start_id, start_id + rows),
+        "name": with_nulls(rng.choice(LOCATIONS, rows), missing(rng, rows, MENU_NULL_RATES["name"])),
+        "sponsor": with_nulls(rng.choice(LOCATIONS, rows), missing(rng, rows, MENU_NULL_RATES["sponsor"])),
+        "event": with_nulls(rng.choice(EVENTS, rows), missing(rng, rows, MENU_NULL_RATES["event"])),
+        "venue": with_nulls(rng.choice(VENUES, rows), missing(rng, rows, MENU_NULL_RATES["venue"])),
+        "place": with_nulls(rng.choice(PLACES, rows), missing(rng, rows, MENU_NULL_RATES["place"])),
+        "physical_description": with_nulls(np.full(rows, "CARD; 4.75X7.5;", dtype=object),
+                                           missing(rng, rows, MENU_NULL_RATES["physical_description"])),
+        "occasion": with_nulls(random_occasions(rng, rows), missing(rng, rows, MENU_NULL_RATES["occasion"])),
+        "notes": with_nulls(np.full(rows, "WINE LIST", dtype=object), missing(rng, rows, MENU_NULL_RATES["notes"])),
+        "call_number": np.char.add("1900-", rng.integers(0, 10_000, rows).astype(str)).astype(object),
+        "keywords": None,
+        "language": None,
+        "date": with_nulls(random_dates(rng, rows), missing(rng, rows, MENU_NULL_RATES["date"])),
+        "location": with_nulls(rng.choice(LOCATIONS, rows), missing(rng, rows, MENU_NULL_RATES["location"])),
+        "location_type": None,
+        "currency": with_nulls(currency, currency_missing),
+        "currency_symbol": with_nulls(symbol, currency_missing | missing(rng, rows, 0.01)),
+        "status": rng.choice(np.array(["complete", "under review"], dtype=object), rows, p=[0.95, 0.05]),
+        "page_count": rng.integers(1, 12, rows),
+        "dish_count": rng.integers(0, 300, rows),
+    })
+
+def generate_dishes(rows, seed=0, start_id=1):
+    """
+    A Dish.csv-shaped frame. DISH_DUPLICATE_RATE of the names repeat an
+    earlier name in different case or with extra spaces, and some are
+    written without accents, as in the NYPL data.
+    """
+    rng = np.random.default_rng([seed, start_id, 1])
+    lengths = rng.integers(1, 5, rows)
+    words = rng.choice(DISH_WORDS, lengths.sum())
+    names = np.array([" ".join(words[end - length:end]) for end, length in zip(np.cumsum(lengths), lengths)], dtype=object)
+
+    duplicate = np.flatnonzero(rng.random(rows) < DISH_DUPLICATE_RATE)
+    duplicate = duplicate[duplicate > 0]
+    names[duplicate] = names[rng.integers(0, duplicate)]
+    variant = rng.integers(0, 4, rows)
+    names = np.array([
+        name.upper() if kind == 1 else name.title() if kind == 2 else name.replace(" ", "  ") if kind == 3 else name
+        for name, kind in zip(names, variant)
+    ], dtype=object)
+    unaccented = rng.random(rows) < 0.1
+    names[unaccented] = [name.replace("é", "e").replace("É", "E") for name in names[unaccented]]
+
+    return pd.DataFrame({
+        "id": np.arange(start_id, start_id + rows),
+        "name": names,
+        "description": None,
+        "menus_appeared": rng.integers(1, 100, rows),
+        "times_appeared": rng.integers(1, 200, rows),
+        "first_appeared": rng.integers(1851, 1950, rows),
+        "last_appeared": rng.integers(1950, 2009, rows),
+        "lowest_price": rng.random(rows).round(2),
+        "highest_price": (rng.random(rows) * 10).round(2),
+    })
+
+def generate_menu_items(rows, num_dishes, num_pages, seed=0, start_id=1):
+    """
+    A MenuItem.csv-shaped frame whose dish ids follow a skewed popularity
+    distribution over `num_dishes` dishes, with a few ids missing from Dish.csv.
+    """
+    rng = np.random.default_rng([seed, start_id, 2])
+    dish_ids = (rng.zipf(1.3, rows) - 1) % (int(num_dishes * 1.01) + 1) + 1
+    price = rng.gamma(2.0, 0.5, rows).round(2)
+    created = pd.Timestamp("2011-03-28") + pd.to_timedelta(rng.integers(0, 3 * 365 * 86_400, rows), unit="s")
+    created_at = created.strftime("%Y-%m-%d %H:%M:%S UTC").to_numpy(dtype=object)
+
+    return pd.DataFrame({
+        "id": np.arange(start_id, start_id + rows),
+        "menu_page_id": rng.integers(1, num_pages + 1, rows),
+        "price": np.where(missing(rng, rows, MENU_ITEM_NULL_RATES["price"]), np.nan, price),
+        "high_price": np.where(missing(rng, rows, MENU_ITEM_NULL_RATES["high_price"]), np.nan, price * 2),
+        "dish_id": pd.array(np.where(missing(rng, rows, MENU_ITEM_NULL_RATES["dish_id"]), None, dish_ids),
+                            dtype="Int64"),
+        "created_at": created_at,
+        "updated_at": created_at,
+        "xpos": rng.random(rows).round(6),
+        "ypos": rng.random(rows).round(6),
+    })
+
+def write_dataset(directory, rows, seed=0, chunk_size=CHUNK_SIZE):
+    """
+    Write Menu.csv and MenuItem.csv with `rows` rows each, and Dish.csv with
+    a third as many, into `directory`. Tables are generated and appended
+    `chunk_size` rows at a time so that large scales fit in memory.
+    """
+    os.makedirs(directory, exist_ok=True)
+    num_dishes = max(rows // 3, 1)
+    tables = {
+        "Menu.csv": (rows, lambda size, start: generate_menu(size, seed, start)),
+        "Dish.csv": (num_dishes, lambda size, start: generate_dishes(size, seed, start)),
+        "MenuItem.csv": (rows, lambda size, start: generate_menu_items(size, num_dishes, rows * 4, seed, start)),
+    }
+    for file_name, (table_rows, generate) in tables.items():
+        path = os.path.join(directory, file_name)
+        for start in range(0, table_rows, chunk_size):
+            chunk = generate(min(chunk_size, table_rows - start), start + 1)
+            chunk.to_csv(path, mode="w" if start == 0 else "a", header=start == 0, index=False)
+
+def dataset_dir(rows, seed, root=DATASET_DIR):
+    # Generated once per scale and seed, then reused
+    directory = os.path.join(root, f"{rows}-{seed}")
+    if not all(os.path.exists(os.path.join(directory, name)) for name in ["Menu.csv", "Dish.csv", "MenuItem.csv"]):
+        write_dataset(directory, rows, seed)
+    return directory
+
+def measure(name, table, func, df, repeat=3):
+    """
+    Time `func(df)` (a fresh shallow copy of `df` each time, or None for
+    the loads) `repeat` times and record the best and mean wall time,
+    CPU time, rows per second and peak memory. The peak RSS is the highest
+    one the timed runs reached, each measured from its own start (None
+    where the peak cannot be reset, see Pipeline.reset_peak_rss), so it does
+    not depend on what ran earlier in the process. The peak allocation is
+    taken from one extra run under tracemalloc, so that tracing never slows
+    the timed runs. Returns the record and the result of the last run.
+    """
+    wall, cpu, peak_rss = [], [], []
+    for _ in range(repeat):
+        # Drop the previous run's result so that it does not count towards this run's peak
+        result = None
+        rss_reset = reset_peak_rss()
+        start, start_cpu = time.perf_counter(), time.process_time()
+        result = func(None if df is None else df.copy(deep=False))
+        wall.append(time.perf_counter() - start)
+        cpu.append(time.process_time() - start_cpu)
+        peak_rss.append(step_peak_rss_mb() if rss_reset else None)
+
+    tracemalloc.start()
+    func(None if df is None else df.copy(deep=False))
+    _, peak_alloc = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    rows_out = len(result) if isinstance(result, pd.DataFrame) else None
+    # Loads have no input frame and are rated by the rows they produce
+    rows = len(df) if df is not None else rows_out
+    record = {
+        "step": name,
+        "table": table,
+        "rows_in": None if df is None else len(df),
+        "rows_out": rows_out,
+        "seconds": min(wall),
+        "mean_seconds": sum(wall) / len(wall),
+        "cpu_seconds": min(cpu),
+        "rows_per_sec": rows / min(wall) if rows is not None and min(wall) > 0 else None,
+        "peak_alloc_mb": peak_alloc / (1024 * 1024),
+        "peak_rss_mb": None if None in peak_rss else max(peak_rss),
+    }
+    return record, result
+
+# The Menu and MenuItem sections of ICViolations.py, each step run on the previous step's output
+MENU_STEPS = [
+    ("Replace_Empty_Strings", replace_empty_strings),
+    ("Drop_Missing_Values", drop_missing_values),
+    ("To_ISO_Format", to_iso_format),
+    ("Drop_Empty_Currency", drop_empty_currency),
+    ("Drop_Invalid_Currencies", drop_invalid_currencies),
+    ("Currency_To_Symbol", currency_to_symbol),
+    ("Normalize_Occasion", normalize_occasion),
+]
+MENU_ITEM_STEPS = [
+    ("Replace_Empty_Strings_MenuItem", replace_empty_strings),
+    ("Drop_Missing_Price", drop_missing_price),
+]
+
+def run_benchmarks(directory, repeat=3, fuzzy=True, sql=True):
+    """Benchmark every step and check on the dataset in `directory`; returns the records."""
+    pd.set_option("mode.copy_on_write", True)
+    # Read the code table up front so that no check pays for it
+    load_iso_4217_codes()
+    paths = {table: os.path.join(directory, f"{table}.csv") for table in ["Menu", "MenuItem", "Dish"]}
+    records = []
+
+    def bench(name, table, func, df):
+        record, result = measure(name, table, func, df, repeat)
+        records.append(record)
+        return result
+
+    def bench_check(name, table, func, df, engine="pandas"):
+        # Checks also record their counts, so the backends can be compared
+        counts = bench(name, table, func, df)
+        records[-1].update(violations=counts, engine=engine)
+
+    frames = {}
+    for table, path in paths.items():
+        bench(f"Read_CSV_{table}", table, lambda _: read_schema_csv(path), None)
+        load_csv(path)
+        frames[table] = bench(f"Load_Cached_{table}", table, lambda _: load_csv(path), None)
+
+    # The cached Menu frame with the rows missing a required value dropped in one selection
+    bench("Load_Required_Menu", "Menu", lambda _: load_required_csv(paths["Menu"], MENU_REQUIRED), None)
+
+    df = frames["Menu"]
+    for name, func in MENU_STEPS:
+        df = bench(name, "Menu", func, df)
+
+    df = frames["MenuItem"]
+    for name, func in MENU_ITEM_STEPS:
+        df = bench(name, "MenuItem", func, df)
+    dish_df, id_mapping = bench("Standardize_Name", "Dish", deduplicate_dishes, frames["Dish"])
+    bench("Handle_Duplicates", "MenuItem", lambda df_cleaned: handle_duplicates(df_cleaned, id_mapping), df)
+    if fuzzy:
+        bench("Fuzzy_Dish_Dedup", "Dish", fuzzy_id_mapping, frames["Dish"])
+
+    # Every IC check on its own, then each table's checks fused into one pass
+    reference = dish_df[["id", "name"]]
+    for constraint in MENU_CONSTRAINTS:
+        bench_check(f"IC_{constraint.name}", "Menu", lambda df: count_violations([constraint], df)[0], frames["Menu"])
+    bench_check("IC_Menu_All", "Menu", lambda df: count_violations(MENU_CONSTRAINTS, df)[0], frames["Menu"])
+    for constraint in MENU_ITEM_CONSTRAINTS:
+        bench_check(f"IC_{constraint.name}", "MenuItem", lambda df: count_violations([constraint], df)[0],
+                    frames["MenuItem"])
+    bench_check(f"IC_{BAD_MAPPINGS.name}", "MenuItem",
+                lambda df: count_violations([BAD_MAPPINGS], df, reference)[0], frames["MenuItem"])
+    bench("Verify_Integrity", "MenuItem", lambda df: verify_integrity(df, dish_df), frames["MenuItem"])
+
+    if sql:
+        # The same checks as SQL straight over the CSV files, rated on the same rows
+        engine = connect("auto", os.path.join(directory, "tables.sqlite"))
+        backend = SQLBackend(engine)
+        def fresh_load(name, path):
+            # A throwaway database, so that every run pays for the load
+            scratch = connect(engine.name, ":memory:")
+            scratch.register(name, path)
+            scratch.close()
+
+        for table, name in [("Menu", "menu"), ("MenuItem", "menu_item"), ("Dish", "dish")]:
+            bench(f"SQL_Load_{table}", table, lambda _: fresh_load(name, paths[table]), None)
+            backend.register(name, paths[table])
+        bench("SQL_Standardize_Name", "Dish", lambda _: backend.deduplicate_dishes("dish"), frames["Dish"])
+        for constraint in MENU_CONSTRAINTS:
+            bench_check(f"SQL_IC_{constraint.name}", "Menu",
+                        lambda _: backend.count_violations([constraint], "menu"), frames["Menu"], engine.name)
+        bench_check("SQL_IC_Menu_All", "Menu", lambda _: backend.count_violations(MENU_CONSTRAINTS, "menu"),
+                    frames["Menu"], engine.name)
+        for constraint in MENU_ITEM_CONSTRAINTS:
+            bench_check(f"SQL_IC_{constraint.name}", "MenuItem",
+                        lambda _: backend.count_violations([constraint], "menu_item"), frames["MenuItem"], engine.name)
+        bench_check(f"SQL_IC_{BAD_MAPPINGS.name}", "MenuItem",
+                    lambda _: backend.count_violations([BAD_MAPPINGS], "menu_item", "dishes"), frames["MenuItem"],
+                    engine.name)
+        engine.close()
+
+    return records
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def load_history(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+def append_history(path, run):
+    history = load_history(path)
+    history.append(run)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(history, file, indent=1)
+    return history
+
+def previous_run(history, rows, seed):
+    # Most recent earlier run on the same dataset
+    for run in reversed(history[:-1]):
+        if run["rows"] == rows and run["seed"] == seed:
+            return run
+    return None
+
+def print_results(run, previous=None, tolerance=0.1):
+    """
+    Print the run's records. With a previous run, the change in best wall
+    time is shown and steps slower by more than `tolerance` are flagged.
+    """
+    before = {record["step"]: record for record in previous["results"]} if previous else {}
+    print(f"\nRows: {run['rows']}  Seed: {run['seed']}  Commit: {run['commit']}")
+    print(f"{'Step':<32} | {'Rows In':<10} | {'Seconds':<10} | {'Rows/Sec':<12} | {'Peak Alloc (MB)':<15} | {'Change':<10}")
+    print("-" * 105)
+    for record in run["results"]:
+        change = ""
+        if record["step"] in before and before[record["step"]]["seconds"] > 0:
+            ratio = record["seconds"] / before[record["step"]]["seconds"] - 1
+            change = f"{ratio:+.1%}" + (" SLOWER" if ratio > tolerance else "")
+        rows_in = "-" if record["rows_in"] is None else record["rows_in"]
+        rows_per_sec = "-" if record["rows_per_sec"] is None else f"{record['rows_per_sec']:.0f}"
+        print(f"{record['step']:<32} | {rows_in:<10} | {record['seconds']:<10.4f} | {rows_per_sec:<12} | "
+              f"{record['peak_alloc_mb']:<15.1f} | {change:<10}")
+
+def print_backend_comparison(run):
+    """Side by side timings of every IC check on pandas and on the SQL backend, and whether their counts agree."""
+    records = {record["step"]: record for record in run["results"]}
+    pairs = [(record, records[f"SQL_{record['step']}"]) for record in run["results"]
+             if record["step"].startswith("IC_") and f"SQL_{record['step']}" in records]
+    if not pairs:
+        return
+    print(f"\n{'Check':<20} | {'pandas (s)':<10} | {pairs[0][1]['engine'] + ' (s)':<10} | {'Speedup':<8} | {'Match':<5}")
+    print("-" * 65)
+    for pandas_record, sql_record in pairs:
+        speedup = pandas_record["seconds"] / sql_record["seconds"] if sql_record["seconds"] > 0 else float("inf")
+        match = "yes" if pandas_record["violations"] == sql_record["violations"] else "NO"
+        print(f"{pandas_record['step'][3:]:<20} | {pandas_record['seconds']:<10.4f} | {sql_record['seconds']:<10.4f} | "
+              f"{speedup:<8.2f} | {match:<5}")
+
+def parse_rows(text):
+    # Accepts 10000, 10k, 2.5m
+    multipliers = {"k": 1_000, "m": 1_000_000}
+    text = text.lower()
+    if text[-1] in multipliers:
+        return int(float(text[:-1]) * multipliers[text[-1]])
+    return int(text)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the cleaning rules and IC checks on synthetic data")
+    parser.add_argument("rows", nargs="*", type=parse_rows, default=DEFAULT_SCALES,
+                        help="Menu and MenuItem rows per dataset, e.g. 10k 1m 50m")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--history", default=DEFAULT_HISTORY)
+    parser.add_argument("--no-fuzzy", dest="fuzzy", action="store_false", help="Skip the fuzzy dish dedup")
+    parser.add_argument("--no-sql", dest="sql", action="store_false", help="Skip the SQL backend checks")
+    args = parser.parse_args()
+
+    for rows in args.rows:
+        directory = dataset_dir(rows, args.seed)
+        run = {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "rows": rows,
+            "seed": args.seed,
+            "repeat": args.repeat,
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "results": run_benchmarks(directory, args.repeat, args.fuzzy, args.sql),
+        }
+        history = append_history(args.history, run)
+        print_results(run, previous_run(history, rows, args.seed))
+        print_backend_comparison(run)
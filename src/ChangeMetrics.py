@@ -0,0 +1,73 @@
+'''
+Original vs cleaned change metrics for every column of a table
+'''
+
+import numpy as np
+import pandas as pd
+
+def cleaned_positions(original, cleaned):
+    """
+    Position in `original` of every row of `cleaned`. Cleaning only drops
+    and modifies rows, so each cleaned index label must occur exactly once
+    in the original index.
+    """
+    if isinstance(original.index, pd.RangeIndex) and original.index.step == 1 and cleaned.index.dtype.kind == "i":
+        positions = cleaned.index.to_numpy() - original.index.start
+        if len(positions) == 0 or (positions.min() >= 0 and positions.max() < len(original)):
+            return positions
+
+    if not original.index.is_unique:
+        raise ValueError("The original index must be unique to match cleaned rows")
+    positions = original.index.get_indexer(cleaned.index)
+    if (positions == -1).any():
+        raise ValueError("The cleaned frame has rows that are not in the original")
+    return positions
+
+def modified_cells(before, after):
+    """
+    Null-aware cell comparison of two equally long arrays: a cell is
+    modified when exactly one side is missing or both are present and
+    differ. Missing on both sides counts as unchanged.
+    """
+    try:
+        unequal = before != after
+    except TypeError:
+        # e.g. categoricals with different categories, or a categorical
+        # column that cleaning turned into strings
+        unequal = before.astype(object) != after.astype(object)
+    if isinstance(unequal, pd.api.extensions.ExtensionArray):
+        unequal = unequal.to_numpy(dtype=bool, na_value=True)
+
+    both_missing = pd.isna(before) & pd.isna(after)
+    return np.asarray(unequal, dtype=bool) & ~both_missing
+
+def column_changes(original, cleaned, columns=None):
+    """
+    Compare a cleaned frame with the frame it was cleaned from, column by
+    column. Original values are gathered by position for the surviving rows
+    only, so no aligned copy of the original frame is built.
+
+    Returns one row per column with the rows removed, the cells modified
+    and the cells unchanged. Columns missing from `cleaned` are skipped.
+    """
+    if columns is None:
+        columns = [column for column in original.columns if column in cleaned.columns]
+    positions = cleaned_positions(original, cleaned)
+    rows_removed = len(original) - len(cleaned)
+
+    changes = {}
+    for column in columns:
+        before = original[column].array.take(positions)
+        modified = int(modified_cells(before, cleaned[column].array).sum())
+        changes[column] = {
+            "rows_removed": rows_removed,
+            "cells_modified": modified,
+            "cells_unchanged": len(cleaned) - modified,
+        }
+    return pd.DataFrame.from_dict(changes, orient="index")
+
+def print_column_changes(changes):
+    print(f"{'Column':<20} | {'Rows Removed':<15} | {'Cells Modified':<15} | {'Cells Unchanged':<15}")
+    print("-" * 75)
+    for column, row in changes.iterrows():
+        print(f"{column:<20} | {row['rows_removed']:<15} | {row['cells_modified']:<15} | {row['cells_unchanged']:<15}")
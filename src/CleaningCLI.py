@@ -0,0 +1,50 @@
+'''
+Single entry point for the cleaning tools. Only the module of the chosen
+command is imported, so `--help` and the argument errors come back without
+loading pandas
+
+Usage: python CleaningCLI.py command [args ...]
+'''
+
+import runpy
+import sys
+
+# command: (module, description)
+COMMANDS = {
+    "ic-violations": ("ICViolations", "Clean Menu/MenuItem and report the IC violations before and after"),
+    "changes": ("DataCleaningChanges", "Clean Menu/MenuItem and report the rows and cells each step changed"),
+    "violations": ("ViolationBitmaps", "Show the rows behind the IC report: violations rows \"date & currency\""),
+    "check": ("CleaningRules", "Count the IC violations of a single CSV: check csv [constraint ...]"),
+    "sql": ("SQLBackend", "Run the IC checks as SQL (DuckDB or SQLite) over the CSV files"),
+    "lazy": ("PolarsBackend", "Run the Menu/MenuItem cleaning flows as lazy Polars plans"),
+    "incremental": ("IncrementalCleaning", "Re-clean only the rows changed since the last run"),
+    "stream": ("MenuItemStreaming", "Clean MenuItem.csv in bounded-memory chunks"),
+    "fuzzy": ("FuzzyDishDeduplication", "Find near-duplicate dish names"),
+    "benchmark": ("Benchmark", "Benchmark every rule and check on synthetic data"),
+    "profile": ("StepProfiler", "Run an annotated script with every block profiled"),
+    "workflow": ("WorkflowExecutor", "Run an annotated script as a cached graph of its blocks"),
+    "convert-notebooks": ("NotebookConverter", "Convert the notebooks into scripts"),
+}
+
+def usage():
+    lines = ["Usage: python CleaningCLI.py command [args ...]", "", "Commands:"]
+    lines += [f"  {command:<20} {description}" for command, (_, description) in COMMANDS.items()]
+    return "\n".join(lines)
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if not argv or argv[0] in ("-h", "--help"):
+        print(usage())
+        return 0
+    if argv[0] not in COMMANDS:
+        print(f"Unknown command {argv[0]!r}\n\n{usage()}", file=sys.stderr)
+        return 2
+
+    # The module sees the remaining arguments as if it had been run directly
+    module = COMMANDS[argv[0]][0]
+    sys.argv = [module] + argv[1:]
+    runpy.run_module(module, run_name="__main__", alter_sys=True)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
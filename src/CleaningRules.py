@@ -0,0 +1,136 @@
+'''
+The cleaning rules and integrity constraints of ICViolations.py and
+DataCleaningChanges.py as importable functions. Every rule takes and
+returns a DataFrame, so a caller that already holds the data can clean or
+check it without re-reading any CSV
+
+Usage: python CleaningRules.py csv [constraint ...]
+'''
+
+import sys
+
+import numpy as np
+import pandas as pd
+
+from CurrencyValidation import CURRENCY_TO_SYMBOL, map_currency_symbols
+from DataCache import blank_mask
+from DateNormalization import normalize_dates
+from DishDeduplication import remap_dish_ids
+from ICRegistry import NotNull, ISODate, ISO4217, Domain, FunctionalDependency, count_violations
+from OccasionClustering import OCCASION_CLUSTERS, normalize_occasions
+
+MENU_CONSTRAINTS = [
+    NotNull("date"), NotNull("currency"), NotNull("location"),
+    ISODate("date", name="iso date"), ISO4217("currency_symbol"), Domain("occasion", OCCASION_CLUSTERS),
+]
+MENU_ITEM_CONSTRAINTS = [NotNull("price")]
+# Checked against Dish.csv's id and name columns
+BAD_MAPPINGS = FunctionalDependency("dish_id", "name", reference_key="id", name="bad mappings")
+
+# Rows missing any of these are dropped before the Menu rules run
+MENU_REQUIRED = ["date", "currency", "location"]
+
+CONSTRAINTS = {constraint.name: constraint for constraint in MENU_CONSTRAINTS + MENU_ITEM_CONSTRAINTS + [BAD_MAPPINGS]}
+
+def count_empty(df, column):
+    # Missing values and empty strings, as the NotNull constraint counts them
+    values = df[column]
+    return int(values.isna().sum() + (values == '').sum())
+
+def replace_empty_strings(df_cleaned):
+    # Replace empty strings with NaN, only in the text columns that hold one
+    replaced = {}
+    for column in df_cleaned.columns:
+        values = df_cleaned[column]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            if "" in values.cat.categories:
+                replaced[column] = values.cat.remove_categories([""])
+        elif values.dtype == object and (values == "").any():
+            replaced[column] = values.mask(values == "", pd.NA)
+    return df_cleaned.assign(**replaced) if replaced else df_cleaned
+
+def drop_missing_values(df_cleaned, columns=MENU_REQUIRED):
+    """
+    Remove the rows with a missing, empty or whitespace-only value in any
+    of the required columns, with one combined mask and a single row selection.
+    """
+    missing = np.logical_or.reduce([blank_mask(df_cleaned[column]) for column in columns])
+    return df_cleaned[~missing]
+
+def to_iso_format(df_cleaned, format_counts=None):
+    """
+    Convert the date column to ISO format and drop the rows whose date could
+    not be parsed. The rows each date format matched are added to `format_counts`.
+    """
+    dates, counts = normalize_dates(df_cleaned["date"])
+    if format_counts is not None:
+        format_counts.update(counts)
+    return df_cleaned.assign(date=dates).dropna(subset=["date"])
+
+def drop_empty_currency(df_cleaned):
+    # Drop the rows without a currency and without a currency symbol
+    return df_cleaned[~(blank_mask(df_cleaned['currency']) & blank_mask(df_cleaned['currency_symbol']))]
+
+def drop_invalid_currencies(df_cleaned):
+    return df_cleaned[~df_cleaned['currency'].isin(['Cents', 'Pence'])]
+
+def currency_to_symbol(df_cleaned, mapping=CURRENCY_TO_SYMBOL):
+    # Replace currency_symbol based on currency using the mapping dictionary
+    return df_cleaned.assign(
+        currency_symbol=map_currency_symbols(df_cleaned['currency'], df_cleaned['currency_symbol'], mapping)
+    )
+
+def normalize_occasion(df_cleaned, match_counts=None):
+    """
+    Map every raw occasion to its cluster; unmatched occasions become
+    missing. The rows each match method accounted for are added to `match_counts`.
+    """
+    occasions, counts = normalize_occasions(df_cleaned["occasion"])
+    if match_counts is not None:
+        match_counts.update(counts)
+    return df_cleaned.assign(occasion=occasions)
+
+def drop_missing_price(df_cleaned):
+    # Remove the rows with missing values in the "price" column
+    return df_cleaned.dropna(subset=["price"])
+
+def handle_duplicates(df_cleaned, id_mapping):
+    # Map every duplicate dish_id to the first id with the same standardized name
+    return df_cleaned.assign(dish_id=remap_dish_ids(df_cleaned['dish_id'], id_mapping))
+
+def clean_menu(df):
+    """All Menu rules of ICViolations.py in order, from the raw Menu frame to the fully cleaned one."""
+    df_cleaned = drop_missing_values(replace_empty_strings(df))
+    df_cleaned = to_iso_format(df_cleaned)
+    df_cleaned = drop_invalid_currencies(drop_empty_currency(df_cleaned))
+    return normalize_occasion(currency_to_symbol(df_cleaned))
+
+def clean_menu_item(df, id_mapping):
+    """All MenuItem rules in order; `id_mapping` comes from DishDeduplication.deduplicate_dishes."""
+    return handle_duplicates(drop_missing_price(replace_empty_strings(df)), id_mapping)
+
+def check(df, names=None, dish_df=None):
+    """
+    Count the violations of the named constraints (all constraints whose
+    columns `df` has, by default) on a frame already in memory. "bad
+    mappings" needs `dish_df`. Returns the counts and the per-constraint
+    details, as `ICRegistry.count_violations` does.
+    """
+    if names is None:
+        names = [name for name, constraint in CONSTRAINTS.items()
+                 if set(constraint.columns) <= set(df.columns) and (dish_df is not None or constraint is not BAD_MAPPINGS)]
+    unknown = [name for name in names if name not in CONSTRAINTS]
+    if unknown:
+        raise KeyError(f"Unknown constraints {unknown}; known constraints are {list(CONSTRAINTS)}")
+
+    reference = None if dish_df is None else dish_df[["id", "name"]]
+    return count_violations([CONSTRAINTS[name] for name in names], df, reference)
+
+if __name__ == "__main__":
+    from DataCache import load_csv
+
+    counts, _ = check(load_csv(sys.argv[1]), sys.argv[2:] or None)
+    print(f"{'Constraint':<20} | {'Violations':<15}")
+    print("-" * 35)
+    for name, count in counts.items():
+        print(f"{name:<20} | {count:<15}")
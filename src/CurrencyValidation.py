@@ -0,0 +1,126 @@
+'''
+ISO 4217 currency code checks backed by a cached set of known codes
+'''
+
+import json
+import os
+from functools import lru_cache
+from itertools import product
+from string import ascii_uppercase
+
+import numpy as np
+import pandas as pd
+
+# Codes forex_python knows, so the checks run without it (see load_iso_4217_codes)
+ISO_4217_SNAPSHOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "iso_4217_codes.json")
+
+# Menu.csv currency names and the ISO 4217 code they are cleaned to
+CURRENCY_TO_SYMBOL = {
+    'Dollars': 'USD',
+    'Francs': 'FRF',
+    'Belgian Francs': 'BEF',
+    'Shillings': 'SHP',
+    'Deutsche Marks': 'DEM',
+    'UK Pounds': 'GBP',
+    'Canadian Dollars': 'CAD',
+    'Austro-Hungarian Kronen': 'HUF',
+    'Swiss Francs': 'CHF',
+    'Pesetas': 'ESP',
+    'Danish kroner': 'DKK',
+    'Swedish kronor (SEK/kr)': 'SEK',
+    'Yen': 'JPY',
+    'Italian Lire': 'ITL',
+    'Quetzales': 'GTQ',
+    'Israeli lirot (1948-1980)': 'ILS',
+    'Dutch Guilders': 'NLG',
+    'Austrian Schillings': 'ATS',
+    'Escudos': 'PTE',
+    'Euros': 'EUR',
+    'Bermudian dollars': 'BMD',
+    'Hungarian forint': 'HUF',
+    'Mexican pesos': 'MXN',
+    'Drachmas': 'GRD',
+    'New Taiwan Dollar': 'TWD',
+    'Icelandic Krónur': 'ISK',
+    'Australian Dollars': 'AUD',
+    'Argentine peso': 'ARS',
+    'Sol': 'PEN',
+    'Uruguayan pesos': 'UYU',
+    'Brazilian Cruzeiros': 'BRB',
+    'Złoty': 'PLN',
+    'Norwegian kroner': 'NOK',
+    'Cuban pesos': 'CUP',
+    'Finnish markka': 'FIM',
+    'Lats': 'LVL',
+    'Straits dollar (1904-1939)': 'SGD'
+}
+
+@lru_cache(maxsize=None)
+def load_iso_4217_codes(snapshot_path=ISO_4217_SNAPSHOT):
+    """
+    Load the known ISO 4217 codes once per process, from the snapshot shipped
+    next to this module by default. Only when `snapshot_path` does not exist
+    is forex_python needed: every three-letter code is looked up through its
+    public `get_currency_name`, and the codes it knows are written there.
+    """
+    if os.path.exists(snapshot_path):
+        with open(snapshot_path, "r", encoding="utf-8") as file:
+            return frozenset(json.load(file))
+
+    from forex_python.converter import CurrencyCodes
+
+    currency_codes = CurrencyCodes()
+    candidates = ("".join(letters) for letters in product(ascii_uppercase, repeat=3))
+    codes = frozenset(code for code in candidates if currency_codes.get_currency_name(code) is not None)
+
+    with open(snapshot_path, "w", encoding="utf-8") as file:
+        json.dump(sorted(codes), file, indent=1)
+    return codes
+
+def map_currency_symbols(currency, currency_symbol, mapping=CURRENCY_TO_SYMBOL):
+    """
+    Equivalent of `currency.map(mapping).fillna(currency_symbol)`. For
+    categorical columns the mapping is looked up once per category and the
+    result is assembled from the category codes, as a categorical column.
+    """
+    if not (isinstance(currency.dtype, pd.CategoricalDtype) and isinstance(currency_symbol.dtype, pd.CategoricalDtype)):
+        return currency.map(mapping).fillna(currency_symbol)
+
+    mapped = [mapping.get(category) for category in currency.cat.categories]
+    categories = currency_symbol.cat.categories.append(
+        pd.Index([symbol for symbol in mapped if symbol is not None], dtype=object)
+    ).unique()
+
+    # Code of the mapped symbol per currency code and of each symbol category; -1 (missing) stays -1
+    mapped_codes = np.append(categories.get_indexer(pd.Index(mapped, dtype=object)), -1)
+    symbol_codes = np.append(categories.get_indexer(currency_symbol.cat.categories), -1)
+
+    codes = mapped_codes[currency.cat.codes.to_numpy()]
+    unmapped = codes == -1
+    codes[unmapped] = symbol_codes[currency_symbol.cat.codes.to_numpy()[unmapped]]
+    return pd.Series(pd.Categorical.from_codes(codes, categories), index=currency.index)
+
+def is_valid_iso_4217(currency_code):
+    try:
+        return currency_code in load_iso_4217_codes()
+    except TypeError:
+        return False
+
+def validate_iso_4217(codes, valid_codes=None):
+    """
+    Check a whole column against the ISO 4217 table. Only the distinct values
+    are looked up; returns the number of invalid rows (missing values
+    included) and the row count of each distinct invalid code.
+    """
+    if valid_codes is None:
+        valid_codes = load_iso_4217_codes()
+
+    code_counts = codes.value_counts(dropna=False)
+    code_counts = code_counts[code_counts > 0]
+    invalid_codes = code_counts[~code_counts.index.isin(list(valid_codes))]
+
+    return int(invalid_codes.sum()), invalid_codes
+
+def count_invalid_iso_4217(df, column):
+    invalid_count, _ = validate_iso_4217(df[column])
+    return invalid_count
@@ -0,0 +1,165 @@
+'''
+Columnar (Feather) cache for the raw NYPL CSVs with an explicit dtype schema
+'''
+
+import hashlib
+import json
+import os
+import warnings
+
+import numpy as np
+import pandas as pd
+
+# Bump whenever a schema changes so existing caches are rebuilt
+SCHEMA_VERSION = 2
+
+SCHEMAS = {
+    "Menu.csv": {
+        "id": "Int64",
+        "occasion": "category",
+        "event": "category",
+        "venue": "category",
+        "place": "category",
+        "currency": "category",
+        "currency_symbol": "category",
+        "status": "category",
+        "page_count": "Int64",
+        "dish_count": "Int64",
+    },
+    "MenuItem.csv": {
+        "id": "Int64",
+        "menu_page_id": "Int64",
+        "dish_id": "Int64",
+    },
+    "Dish.csv": {
+        "id": "Int64",
+        "menus_appeared": "Int64",
+        "times_appeared": "Int64",
+    },
+}
+
+def unique_rows(df, columns):
+    """
+    Equivalent of `df[columns].drop_duplicates()`. When every column is
+    categorical the rows are deduplicated on one combined integer key built
+    from the category codes instead of hashing the values.
+    """
+    frame = df[columns]
+    if not all(isinstance(frame[column].dtype, pd.CategoricalDtype) for column in columns):
+        return frame.drop_duplicates()
+
+    key = np.zeros(len(frame), dtype=np.int64)
+    for column in columns:
+        # Missing values have code -1, so shift every code up by one
+        codes = frame[column].cat.codes.to_numpy().astype(np.int64) + 1
+        key = key * (len(frame[column].cat.categories) + 1) + codes
+    _, first_rows = np.unique(key, return_index=True)
+    return frame.iloc[np.sort(first_rows)]
+
+def blank_mask(values):
+    """
+    True for the missing, empty and whitespace-only values of a column.
+    Each distinct value is checked once and the result broadcast back.
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        codes, uniques = values.cat.codes.to_numpy(), values.cat.categories
+    else:
+        codes, uniques = pd.factorize(values)
+    blank = [isinstance(value, str) and not value.strip() for value in uniques]
+    return np.append(np.array(blank, dtype=bool), True)[codes]
+
+def file_hash(path, chunk_size=1 << 20):
+    digest = hashlib.blake2b()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def cache_paths(path, cache_dir=None):
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(path)), ".cache")
+    name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(cache_dir, f"{name}.feather"), os.path.join(cache_dir, f"{name}.meta.json")
+
+def read_schema_csv(path, schema=None, **read_csv_kwargs):
+    if schema is None:
+        schema = SCHEMAS.get(os.path.basename(path), {})
+    return pd.read_csv(path, dtype=schema, **read_csv_kwargs)
+
+def is_cache_valid(path, meta_path, schema):
+    """
+    The cache is valid when it was built from the same schema and the source
+    file still has the recorded size and mtime. If only the mtime changed
+    (e.g. the file was copied or touched) the content hash decides, and the
+    metadata is refreshed so the next run skips the hash again.
+    """
+    if not os.path.exists(meta_path):
+        return False
+    with open(meta_path, "r", encoding="utf-8") as file:
+        meta = json.load(file)
+
+    stat = os.stat(path)
+    if meta.get("schema_version") != SCHEMA_VERSION or meta.get("schema") != schema:
+        return False
+    if meta.get("size") != stat.st_size:
+        return False
+    if meta.get("mtime_ns") == stat.st_mtime_ns:
+        return True
+    if meta.get("hash") != file_hash(path):
+        return False
+
+    meta["mtime_ns"] = stat.st_mtime_ns
+    with open(meta_path, "w", encoding="utf-8") as file:
+        json.dump(meta, file, indent=1)
+    return True
+
+def load_csv(path, schema=None, cache_dir=None):
+    """
+    Load one of the raw CSVs through the columnar cache. The first load
+    parses the CSV with the table's dtype schema (categoricals for the low
+    cardinality columns, nullable ints for ids) and writes it as an
+    uncompressed Feather file; later loads memory-map that file instead of
+    parsing the CSV. Falls back to parsing the CSV when pyarrow is missing.
+    """
+    if schema is None:
+        schema = SCHEMAS.get(os.path.basename(path), {})
+
+    try:
+        import pyarrow.feather as feather
+    except ImportError:
+        warnings.warn("pyarrow is not installed, reading the CSV without the columnar cache")
+        return read_schema_csv(path, schema)
+
+    feather_path, meta_path = cache_paths(path, cache_dir)
+    if os.path.exists(feather_path) and is_cache_valid(path, meta_path, schema):
+        return feather.read_table(feather_path, memory_map=True).to_pandas()
+
+    df = read_schema_csv(path, schema)
+
+    os.makedirs(os.path.dirname(feather_path), exist_ok=True)
+    feather.write_feather(df, feather_path, compression="uncompressed")
+    stat = os.stat(path)
+    with open(meta_path, "w", encoding="utf-8") as file:
+        json.dump({
+            "schema_version": SCHEMA_VERSION,
+            "schema": schema,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "hash": file_hash(path),
+        }, file, indent=1)
+
+    return df
+
+def load_required_csv(path, required, null_columns=(), schema=None, cache_dir=None):
+    """
+    Load a CSV through the columnar cache (see `load_csv`) keeping only the
+    rows that hold a value in every `required` column, where empty and
+    whitespace-only strings count as missing. Blank values of the
+    `null_columns` become missing as well. The rows are dropped with one
+    combined mask and a single row selection.
+    """
+    df = load_csv(path, schema, cache_dir)
+    missing = np.logical_or.reduce([blank_mask(df[column]) for column in required])
+    df = df[~missing]
+    blanks = {column: df[column].mask(blank_mask(df[column]), pd.NA) for column in null_columns}
+    return df.assign(**blanks) if blanks else df
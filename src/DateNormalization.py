@@ -0,0 +1,95 @@
+'''
+Batched conversion of the raw menu dates into ISO format and ISO format checks
+'''
+
+import pandas as pd
+import numpy as np
+
+from Memoization import memoize_column
+
+# Formats tried across the whole column, most common first
+DATE_FORMATS = [
+    "%Y-%m-%d",
+    "%Y-%m-%d %H:%M:%S",
+    "%m/%d/%Y",
+    "%B %d, %Y",
+    "%d %B %Y",
+]
+
+# Helper function to check and convert a date to ISO format
+def to_iso_format(date_str):
+    try:
+        # Try to parse the date in various common formats
+        date = pd.to_datetime(date_str, errors="raise")
+        # Return the date in ISO format
+        return date.strftime("%Y-%m-%d")
+    except Exception as e:
+        return None
+
+def normalize_dates(dates, formats=DATE_FORMATS):
+    """
+    Convert a column of raw dates to ISO strings, returning the converted
+    column (None where a date could not be parsed, exactly as
+    `dates.apply(to_iso_format)` would) and the number of rows each format
+    matched. Rows no format matches are handed to `to_iso_format`, once per
+    distinct value.
+    """
+    iso_dates = np.full(len(dates), None, dtype=object)
+    format_counts = {}
+
+    # Only text values are tried against the known formats
+    if dates.dtype == object or isinstance(dates.dtype, pd.StringDtype):
+        pending = np.flatnonzero(dates.str.len().notna().to_numpy())
+    else:
+        pending = np.array([], dtype=np.intp)
+
+    for date_format in formats:
+        parsed = pd.to_datetime(dates.iloc[pending], format=date_format, errors="coerce")
+        matched = parsed.notna().to_numpy()
+        format_counts[date_format] = int(matched.sum())
+        iso_dates[pending[matched]] = parsed[matched].dt.strftime("%Y-%m-%d").to_numpy()
+        pending = pending[~matched]
+
+    # Fall back to per-row parsing for everything the formats did not cover
+    leftover = np.flatnonzero(dates.notna().to_numpy() & pd.isna(iso_dates))
+    fallback = memoize_column(to_iso_format, dates.iloc[leftover])
+    iso_dates[leftover] = fallback.to_numpy()
+    format_counts["fallback"] = int(fallback.notna().sum())
+    format_counts["unparsed"] = int(pd.isna(iso_dates).sum())
+
+    return pd.Series(iso_dates, index=dates.index), format_counts
+
+# Same pattern `datetime.strptime` builds for "%Y-%m-%d"
+ISO_DATE_PATTERN = r"\A(\d\d\d\d)-(1[0-2]|0[1-9]|[1-9])-(3[01]|[12]\d|0[1-9]|[1-9]| [1-9])\Z"
+
+DAYS_IN_MONTH = np.array([31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+
+def validate_iso_dates(dates):
+    """
+    Check a whole column for "%Y-%m-%d" dates, returning the number of
+    violations and a boolean mask that is True wherever
+    `datetime.strptime(value, "%Y-%m-%d")` would reject the value (missing
+    values included).
+    """
+    if dates.dtype == object or isinstance(dates.dtype, pd.StringDtype):
+        parts = dates.str.extract(ISO_DATE_PATTERN)
+    else:
+        parts = pd.DataFrame(np.nan, index=dates.index, columns=range(3))
+
+    matched = parts[0].notna().to_numpy()
+    year = parts[0][matched].astype(int).to_numpy()
+    month = parts[1][matched].astype(int).to_numpy()
+    day = parts[2][matched].astype(int).to_numpy()
+
+    leap = (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+    month_length = DAYS_IN_MONTH[month - 1] + ((month == 2) & leap)
+
+    valid = matched.copy()
+    valid[matched] = (year >= 1) & (day <= month_length)
+
+    invalid_mask = pd.Series(~valid, index=dates.index)
+    return int(invalid_mask.sum()), invalid_mask
+
+def count_invalid_dates(df, column):
+    invalid_count, _ = validate_iso_dates(df[column])
+    return invalid_count
@@ -0,0 +1,94 @@
+'''
+Dish name standardization, deduplication and consistency checks for the
+MenuItem/Dish tables
+'''
+
+import pandas as pd
+
+from Memoization import memoize_column
+
+def standardize_name(name):
+    if pd.isna(name):
+        return name
+    return ' '.join(word.capitalize() for word in name.split())
+
+def standardize_names(names):
+    """
+    Standardize a whole name column. Dish names repeat heavily, so each
+    distinct raw name is standardized once and the result broadcast back.
+    """
+    return memoize_column(standardize_name, names)
+
+def build_id_mapping(dish_df):
+    """
+    Map every duplicate dish id to the id of the first dish (in table order)
+    carrying the same, already standardized, name.
+    """
+    ids = dish_df["id"]
+    first_ids = ids.groupby(dish_df["name"].to_numpy(), sort=False).transform("first")
+    duplicate = first_ids.notna() & (first_ids != ids)
+
+    return dict(zip(ids[duplicate], first_ids[duplicate].astype(ids.dtype)))
+
+def deduplicate_dishes(dish_df):
+    """
+    Standardize the dish names and build the {duplicate_id: first_id}
+    mapping for `remap_dish_ids`. Returns the standardized Dish frame and
+    the mapping.
+    """
+    dish_df = dish_df.assign(name=standardize_names(dish_df["name"]))
+    return dish_df, build_id_mapping(dish_df)
+
+def remap_dish_ids(dish_ids, id_mapping):
+    """
+    Equivalent of `dish_ids.replace(id_mapping)` through a single hashed
+    lookup instead of one replacement per mapping entry.
+    """
+    remapped = dish_ids.map(pd.Series(id_mapping))
+    return remapped.where(remapped.notna(), dish_ids).astype(dish_ids.dtype)
+
+def verify_integrity(df_cleaned, dish_df, id_mapping=None, verbose=False, max_printed=20, seen_dish_ids=None):
+    """
+    Check that every occurrence of a dish_id in MenuItem maps to the same
+    standardized Dish name. A repeated dish_id violates the constraint when
+    its name differs from the one seen at its first occurrence; a missing
+    name never compares equal, so every repeat of such an id is counted.
+
+    Returns the number of violating rows and a frame with one line per
+    offending dish_id. Violations are only printed when `verbose` is set,
+    and at most `max_printed` of them.
+
+    When MenuItem is checked in chunks, pass the same `seen_dish_ids` set to
+    every call: ids it already holds count as repeats and the set is
+    updated with the chunk's ids. Names come from one lookup, so the first
+    occurrence's name never needs to be carried between chunks.
+    """
+    id_to_name = dish_df.drop_duplicates(subset="id", keep="last").set_index("id")["name"]
+
+    dish_ids = df_cleaned["dish_id"].dropna()
+    names = dish_ids.map(id_to_name)
+
+    # Ids missing from Dish.csv have no name to disagree with
+    known = dish_ids.isin(id_to_name.index)
+    first_name = names.groupby(dish_ids.to_numpy()).transform("first")
+    repeated = dish_ids.duplicated()
+    if seen_dish_ids is not None:
+        repeated |= dish_ids.isin(seen_dish_ids)
+        seen_dish_ids.update(dish_ids.unique())
+    inconsistent = names.isna() | first_name.isna() | (names != first_name)
+    violating = known & repeated & inconsistent
+
+    violations = (
+        pd.DataFrame({"dish_id": dish_ids[violating], "name": names[violating]})
+        .groupby("dish_id", dropna=False, sort=False)
+        .agg(name=("name", "first"), violations=("name", "size"))
+        .reset_index()
+    )
+
+    if verbose:
+        for dish_id in dish_ids[violating].head(max_printed):
+            print(f"Violation: dish_id {dish_id} maps to a different name.")
+        if violating.sum() > max_printed:
+            print(f"... {violating.sum() - max_printed} more violations not shown.")
+
+    return int(violating.sum()), violations
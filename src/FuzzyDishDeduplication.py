@@ -0,0 +1,222 @@
+'''
+Near-duplicate dish name resolution for Dish.csv with blocking keys and a
+MinHash/LSH index over character n-grams
+
+Usage: python FuzzyDishDeduplication.py [threshold]
+'''
+
+import re
+import sys
+import time
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+from Memoization import memoize_column
+from Pipeline import reset_peak_rss, step_peak_rss_mb
+
+# Odd 64-bit multipliers for the multiply-shift hashes
+HASH_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+
+def blocking_key(name):
+    """
+    Accent-, case- and punctuation-insensitive form of a dish name, e.g.
+    "Consommé Royale" -> "consomme royale". Names with the same key are
+    duplicates without any further comparison.
+    """
+    if not isinstance(name, str):
+        return None
+    decomposed = unicodedata.normalize("NFKD", name)
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return " ".join(re.sub(r"[\W_]+", " ", stripped.casefold()).split()) or None
+
+def ngram_hashes(keys, ngram=3):
+    """
+    Hash every character n-gram of every key in one vectorized pass over
+    the concatenated code points. Keys are padded with a space on each side
+    so that word boundaries take part in the n-grams. Returns the hashes
+    and the index of the key each one belongs to.
+    """
+    padded = [f" {key} " for key in keys]
+    lengths = np.array([len(text) for text in padded], dtype=np.int64)
+    code_points = np.frombuffer("".join(padded).encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+
+    owner = np.repeat(np.arange(len(keys)), lengths)
+    offset = np.arange(len(code_points)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    starts = np.flatnonzero(offset <= (lengths[owner] - ngram))
+
+    grams = np.zeros(len(starts), dtype=np.uint64)
+    for position in range(ngram):
+        grams = grams * np.uint64(0x110000) + code_points[starts + position]
+    return grams * HASH_MULTIPLIER, owner[starts]
+
+def minhash_signatures(hashes, owner, num_keys, num_perm=64, seed=0):
+    """MinHash signature of every key: the minimum of each of `num_perm` hash permutations."""
+    rng = np.random.default_rng(seed)
+    multipliers = rng.integers(1, 2**63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+    offsets = rng.integers(0, 2**63, size=num_perm, dtype=np.uint64)
+
+    # n-grams are grouped by key, so each key's minimum is one reduceat segment
+    segment_starts = np.searchsorted(owner, np.arange(num_keys))
+    signatures = np.empty((num_keys, num_perm), dtype=np.uint32)
+    for permutation in range(num_perm):
+        permuted = ((hashes * multipliers[permutation] + offsets[permutation]) >> np.uint64(32)).astype(np.uint32)
+        signatures[:, permutation] = np.minimum.reduceat(permuted, segment_starts)
+    return signatures
+
+def candidate_pairs(signatures, bands=16, window=5):
+    """
+    LSH banding: keys whose signatures agree on every row of some band
+    share a bucket, and keys sharing a bucket become candidate pairs. Each
+    member is paired with the next `window` members of its bucket, which
+    covers every pair of the small buckets and keeps the number of pairs
+    linear in the number of keys for the large ones.
+    """
+    num_keys, num_perm = signatures.shape
+    rows = num_perm // bands
+    pairs = []
+    for band in range(bands):
+        bucket = np.zeros(num_keys, dtype=np.uint64)
+        for column in range(band * rows, (band + 1) * rows):
+            bucket = (bucket ^ signatures[:, column].astype(np.uint64)) * HASH_MULTIPLIER
+
+        order = np.argsort(bucket, kind="stable")
+        sorted_buckets = bucket[order]
+        for distance in range(1, window + 1):
+            same = sorted_buckets[distance:] == sorted_buckets[:-distance]
+            if not same.any():
+                break
+            pairs.append(np.stack([order[:-distance][same], order[distance:][same]], axis=1))
+
+    if not pairs:
+        return np.empty((0, 2), dtype=np.int64)
+    pairs = np.sort(np.concatenate(pairs), axis=1)
+    return np.unique(pairs, axis=0)
+
+def estimated_similarities(pairs, signatures, chunk_size=1_000_000):
+    # Share of agreeing MinHash values, an unbiased estimate of the Jaccard similarity
+    estimates = np.empty(len(pairs))
+    for start in range(0, len(pairs), chunk_size):
+        chunk = pairs[start:start + chunk_size]
+        estimates[start:start + chunk_size] = (signatures[chunk[:, 0]] == signatures[chunk[:, 1]]).mean(axis=1)
+    return estimates
+
+def jaccard_similarities(pairs, hashes, owner, num_keys):
+    # Exact Jaccard similarity of the n-gram sets of each candidate pair
+    segment_starts = np.searchsorted(owner, np.arange(num_keys + 1))
+    gram_sets = {}
+    def grams(key):
+        if key not in gram_sets:
+            gram_sets[key] = set(hashes[segment_starts[key]:segment_starts[key + 1]].tolist())
+        return gram_sets[key]
+
+    similarities = np.empty(len(pairs))
+    for position, (first, second) in enumerate(pairs):
+        first_grams, second_grams = grams(first), grams(second)
+        similarities[position] = len(first_grams & second_grams) / len(first_grams | second_grams)
+    return similarities
+
+def connected_components(pairs, num_keys):
+    # Label every key with the smallest key it is connected to
+    labels = np.arange(num_keys)
+    while len(pairs):
+        smallest = np.minimum(labels[pairs[:, 0]], labels[pairs[:, 1]])
+        updated = labels.copy()
+        np.minimum.at(updated, pairs[:, 0], smallest)
+        np.minimum.at(updated, pairs[:, 1], smallest)
+        updated = updated[updated]
+        if np.array_equal(updated, labels):
+            break
+        labels = updated
+    return labels
+
+def fuzzy_id_mapping(dish_df, threshold=0.75, ngram=3, num_perm=64, bands=16, window=5,
+                     estimate_margin=0.15, seed=0, phases=None):
+    """
+    Map every dish id whose name is a near duplicate of an earlier dish's
+    name to the id of the first dish (in table order) of its group, in the
+    same {duplicate_id: first_id} form as `build_id_mapping`.
+
+    Names are first grouped by `blocking_key`; the distinct keys are then
+    indexed with MinHash/LSH over character n-grams. Candidate pairs whose
+    MinHash estimate is within `estimate_margin` of `threshold` have their
+    exact n-gram Jaccard similarity computed, and the pairs reaching
+    `threshold` are merged transitively. Each phase's time and the peak RSS
+    it reached (None where the peak cannot be reset, see
+    Pipeline.reset_peak_rss) are appended to `phases`.
+    """
+    if phases is None:
+        phases = []
+    rss_reset = False
+
+    def begin():
+        nonlocal rss_reset
+        rss_reset = reset_peak_rss()
+        return time.perf_counter()
+
+    def phase(name, start, count):
+        phases.append({"phase": name, "seconds": time.perf_counter() - start,
+                       "peak_rss_mb": step_peak_rss_mb() if rss_reset else None, "count": count})
+
+    start = begin()
+    keys = memoize_column(blocking_key, dish_df["name"])
+    key_codes, distinct_keys = pd.factorize(keys)
+    phase("Blocking_Keys", start, len(distinct_keys))
+    # No named dish, so nothing to index or merge
+    if len(distinct_keys) == 0:
+        return {}
+
+    start = begin()
+    hashes, owner = ngram_hashes(list(distinct_keys), ngram)
+    phase("Ngram_Hashes", start, len(hashes))
+
+    start = begin()
+    signatures = minhash_signatures(hashes, owner, len(distinct_keys), num_perm, seed)
+    phase("MinHash_Signatures", start, len(signatures))
+
+    start = begin()
+    pairs = candidate_pairs(signatures, bands, window)
+    phase("LSH_Candidates", start, len(pairs))
+
+    start = begin()
+    pairs = pairs[estimated_similarities(pairs, signatures) >= threshold - estimate_margin]
+    pairs = pairs[jaccard_similarities(pairs, hashes, owner, len(distinct_keys)) >= threshold]
+    phase("Verify_Pairs", start, len(pairs))
+
+    start = begin()
+    labels = connected_components(pairs, len(distinct_keys))
+    groups = np.where(key_codes == -1, -1, labels[key_codes])
+
+    # Dishes without a name are never merged
+    ids = dish_df["id"]
+    named = groups != -1
+    first_ids = ids[named].groupby(groups[named], sort=False).transform("first")
+    duplicate = first_ids.notna() & (first_ids != ids[named])
+    id_mapping = dict(zip(ids[named][duplicate], first_ids[duplicate].astype(ids.dtype)))
+    phase("Cluster", start, len(id_mapping))
+
+    return id_mapping
+
+def print_phases(phases):
+    print(f"{'Phase':<20} | {'Seconds':<10} | {'Peak RSS (MB)':<15} | {'Count':<10}")
+    print("-" * 65)
+    for phase in phases:
+        peak_rss = "-" if phase["peak_rss_mb"] is None else f"{phase['peak_rss_mb']:.1f}"
+        print(f"{phase['phase']:<20} | {phase['seconds']:<10.3f} | {peak_rss:<15} | {phase['count']:<10}")
+
+if __name__ == "__main__":
+    from DataCache import load_csv
+    from DishDeduplication import deduplicate_dishes
+
+    threshold = float(sys.argv[1]) if len(sys.argv) > 1 else 0.75
+    dish_df, exact_mapping = deduplicate_dishes(load_csv("./data/Dish.csv"))
+
+    phases = []
+    fuzzy_mapping = fuzzy_id_mapping(dish_df, threshold, phases=phases)
+    print_phases(phases)
+
+    print(f"\n{'Mapping':<20} | {'Merged Dishes':<15}")
+    print("-" * 35)
+    print(f"{'exact':<20} | {len(exact_mapping):<15}")
+    print(f"{'fuzzy':<20} | {len(fuzzy_mapping):<15}")
@@ -0,0 +1,204 @@
+'''
+Declarative integrity constraints, evaluated together in one pass per table
+'''
+
+import numpy as np
+import pandas as pd
+
+from CurrencyValidation import load_iso_4217_codes
+from DateNormalization import validate_iso_dates
+
+class TableScan:
+    """
+    One pass over a table. Each column a constraint reads is factorized
+    once; per-value constraints are then checked on the distinct values
+    only and broadcast back to the rows through the shared codes. Other
+    intermediates are cached under a key so constraints can share them.
+    """
+
+    def __init__(self, df, reference=None):
+        self.df = df
+        self.reference = reference
+        self.intermediates = {}
+
+    def intermediate(self, key, compute):
+        if key not in self.intermediates:
+            self.intermediates[key] = compute()
+        return self.intermediates[key]
+
+    def factorized(self, column):
+        # (codes, distinct values); missing values get code -1
+        def compute():
+            values = self.df[column]
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                # Dictionary-encoded columns already carry their codes
+                return values.cat.codes.to_numpy(), pd.Series(values.cat.categories)
+            codes, uniques = pd.factorize(values)
+            return codes, pd.Series(uniques)
+        return self.intermediate(("factorized", column), compute)
+
+    def broadcast(self, column, invalid_values, missing_invalid=True):
+        codes, _ = self.factorized(column)
+        invalid_values = np.asarray(invalid_values, dtype=bool)
+        mask = np.append(invalid_values, missing_invalid)[codes]
+        return pd.Series(mask, index=self.df.index)
+
+class Constraint:
+    """
+    Base class for declared constraints. `columns` are the table columns
+    the constraint reads and `mask` returns True for each violating row.
+    """
+
+    def __init__(self, name, columns):
+        self.name = name
+        self.columns = list(columns)
+
+    def mask(self, scan):
+        raise NotImplementedError
+
+    def details(self, scan, mask):
+        return None
+
+class NotNull(Constraint):
+    """Missing values and empty strings violate the constraint."""
+
+    def __init__(self, column, name=None):
+        super().__init__(name or column, [column])
+        self.column = column
+
+    def mask(self, scan):
+        _, uniques = scan.factorized(self.column)
+        return scan.broadcast(self.column, (uniques == '').to_numpy())
+
+class ISODate(Constraint):
+    """Values must be valid "%Y-%m-%d" dates; missing values violate it."""
+
+    def __init__(self, column, name=None):
+        super().__init__(name or column, [column])
+        self.column = column
+
+    def mask(self, scan):
+        _, uniques = scan.factorized(self.column)
+        _, invalid = scan.intermediate(("iso_dates", self.column), lambda: validate_iso_dates(uniques))
+        return scan.broadcast(self.column, invalid.to_numpy())
+
+class Domain(Constraint):
+    """
+    Values must belong to `values`; missing values violate it. `values` may
+    be a callable so that e.g. the ISO 4217 table is only loaded when the
+    constraint is evaluated.
+    """
+
+    def __init__(self, column, values, name=None):
+        super().__init__(name or column, [column])
+        self.column = column
+        self.values = values
+
+    def mask(self, scan):
+        values = self.values() if callable(self.values) else self.values
+        _, uniques = scan.factorized(self.column)
+        return scan.broadcast(self.column, (~uniques.isin(list(values))).to_numpy())
+
+class ISO4217(Domain):
+    """Values must be known ISO 4217 currency codes."""
+
+    def __init__(self, column, name=None):
+        super().__init__(column, load_iso_4217_codes, name)
+
+class FunctionalDependency(Constraint):
+    """
+    `determinant -> dependent`: every repeat of a determinant value must
+    carry the dependent value of its first occurrence, and a missing
+    dependent value never compares equal. Rows with a missing determinant
+    are ignored.
+
+    With `reference_key` the dependent column is looked up in the reference
+    frame passed to the evaluation (e.g. `dish_id -> name` through Dish.csv),
+    and determinant values missing from it are ignored as well.
+    """
+
+    def __init__(self, determinant, dependent, reference_key=None, name=None):
+        columns = [determinant] if reference_key else [determinant, dependent]
+        super().__init__(name or f"{determinant} -> {dependent}", columns)
+        self.determinant = determinant
+        self.dependent = dependent
+        self.reference_key = reference_key
+
+    def lookup(self, scan):
+        # dependent value of each reference key; the last row wins for repeated keys
+        return scan.intermediate(("lookup", self.reference_key, self.dependent), lambda: (
+            scan.reference.drop_duplicates(subset=self.reference_key, keep="last")
+            .set_index(self.reference_key)[self.dependent]
+        ))
+
+    def mask(self, scan):
+        codes, uniques = scan.factorized(self.determinant)
+
+        if self.reference_key:
+            lookup = self.lookup(scan)
+            known = np.append(uniques.isin(lookup.index).to_numpy(), False)[codes]
+            unique_values = uniques.map(lookup).to_numpy()
+            values = pd.Series(np.append(unique_values, None)[codes], dtype=object)
+        else:
+            known = codes != -1
+            values = pd.Series(scan.df[self.dependent].to_numpy(dtype=object))
+
+        # Position of each determinant value's first occurrence
+        repeated = pd.Series(codes).duplicated().to_numpy()
+        first_position = np.zeros(len(uniques) + 1, dtype=np.intp)
+        first_rows = np.flatnonzero(~repeated)
+        first_position[codes[first_rows]] = first_rows
+        first_values = values.iloc[first_position[codes]].reset_index(drop=True)
+
+        inconsistent = values.isna() | first_values.isna() | (values != first_values)
+        violating = known & repeated & inconsistent.to_numpy()
+        return pd.Series(violating, index=scan.df.index)
+
+    def details(self, scan, mask):
+        # One line per violating determinant value, in order of first violation
+        violating = scan.df.loc[mask.to_numpy(), [self.determinant]]
+        if self.reference_key:
+            violating[self.dependent] = violating[self.determinant].map(self.lookup(scan))
+        else:
+            violating[self.dependent] = scan.df.loc[mask.to_numpy(), self.dependent].to_numpy()
+        return (
+            violating.groupby(self.determinant, dropna=False, sort=False)
+            .agg(**{self.dependent: (self.dependent, "first"), "violations": (self.dependent, "size")})
+            .reset_index()
+        )
+
+def required_columns(constraints):
+    return list(dict.fromkeys(column for constraint in constraints for column in constraint.columns))
+
+def evaluate(scan, constraints):
+    """
+    Compute the violation masks of all `constraints` over the scanned table
+    together. Returns a boolean frame with one column per constraint.
+    """
+    return pd.DataFrame({constraint.name: constraint.mask(scan).to_numpy() for constraint in constraints},
+                        index=scan.df.index)
+
+def count_violations(constraints, df, reference=None, bitmaps=False):
+    """
+    Evaluate `constraints` over `df` and return the violation count of each
+    one, plus the details of the constraints that provide them. Use
+    `functools.partial(count_violations, constraints)` as an ICScheduler
+    group check. With `bitmaps` a third dict holds the ViolationBitmaps.Bitmap
+    of the violating rows of each constraint, identified by the frame's
+    integer index labels.
+    """
+    scan = TableScan(df, reference)
+    masks = evaluate(scan, constraints)
+
+    counts = {name: int(count) for name, count in masks.sum().items()}
+    details = {}
+    for constraint in constraints:
+        constraint_details = constraint.details(scan, masks[constraint.name])
+        if constraint_details is not None:
+            details[constraint.name] = constraint_details
+    if bitmaps:
+        from ViolationBitmaps import Bitmap
+
+        rows = {name: Bitmap.from_mask(masks[name].to_numpy(), df.index) for name in masks.columns}
+        return counts, details, rows
+    return counts, details
@@ -0,0 +1,161 @@
+'''
+Runs independent integrity constraint checks concurrently in a process pool
+'''
+
+import gc
+import multiprocessing
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import pandas as pd
+
+def share_columns(df, columns):
+    """
+    Write `df[columns]` into a shared memory block as an Arrow IPC stream
+    and return a picklable handle for `attach_columns`. Without pyarrow the
+    handle carries the selected columns themselves.
+    """
+    try:
+        import pyarrow as pa
+    except ImportError:
+        return {"frame": df[columns]}
+
+    table = pa.Table.from_pandas(df[columns], preserve_index=True)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    buffer = sink.getvalue()
+
+    block = shared_memory.SharedMemory(create=True, size=max(buffer.size, 1))
+    block.buf[:buffer.size] = memoryview(buffer).cast("B")
+    return {"block": block, "name": block.name, "size": buffer.size}
+
+def attach_columns(handle):
+    """
+    Rebuild the shared columns in a worker. Numeric columns are read straight
+    from the shared memory block, so the block is returned as well and must
+    only be closed once the frame is no longer used.
+    """
+    if "frame" in handle:
+        return handle["frame"], None
+
+    import pyarrow as pa
+
+    block = shared_memory.SharedMemory(name=handle["name"])
+    reader = pa.ipc.open_stream(pa.py_buffer(block.buf[:handle["size"]]))
+    return reader.read_all().to_pandas(), block
+
+def run_check(func, handles, args):
+    attached = [attach_columns(handle) for handle in handles]
+    blocks = [block for _, block in attached if block is not None]
+    try:
+        # Serialize while the blocks are open, as results may still point into them (e.g. a
+        # details frame keyed by a shared column); the pool sends the bytes back as they are
+        return pickle.dumps(func(*(frame for frame, _ in attached), *args))
+    finally:
+        # Accessors such as `.str` form reference cycles with their Series, so
+        # collect them before closing the blocks their buffers point into
+        del attached
+        gc.collect()
+        for block in blocks:
+            try:
+                block.close()
+            except BufferError:
+                # Only when func raised: its traceback still references the frames, so
+                # leave the block to be closed with them and let the error propagate
+                pass
+
+class ICScheduler:
+    """
+    Collects integrity constraint checks together with the frames and
+    columns each one reads, then runs them all at once in a process pool.
+
+    Every (frame, columns) input is placed in shared memory once, so a
+    worker only receives a small handle instead of a pickled copy of the
+    whole frame. Check functions must be importable or defined at module
+    level, e.g. `count_empty(df, column)`, as workers are started with the
+    platform's default method (spawn on Windows and macOS) unless
+    `start_method` names another.
+    """
+
+    def __init__(self):
+        self.checks = []
+        self.results = {}
+        self.details = {}
+        self.bitmaps = {}
+        self.order = []
+
+    def register(self, check, side, func, inputs, args=()):
+        # inputs is a list of (frame, columns) pairs passed to func in order
+        self.checks.append((check, side, func, inputs, args))
+        self.order.append(check)
+
+    def register_group(self, checks, side, func, inputs, args=()):
+        # func evaluates several checks in one pass and returns ({check: count}, {check: details}),
+        # optionally followed by {check: bitmap of the violating rows}
+        self.checks.append((list(checks), side, func, inputs, args))
+        self.order.extend(checks)
+
+    def set_result(self, check, side, value):
+        # For sides that need no check, e.g. a count that is known up front
+        self.results[(check, side)] = value
+        self.order.append(check)
+
+    def run(self, max_workers=None, start_method=None):
+        def picklable(handle):
+            return {key: value for key, value in handle.items() if key != "block"}
+
+        handles = {}
+        try:
+            # Each (frame, columns) input is shared once, however many checks read it
+            check_handles = []
+            for _, _, _, inputs, _ in self.checks:
+                keys = []
+                for frame, columns in inputs:
+                    key = (id(frame), tuple(columns))
+                    if key not in handles:
+                        handles[key] = share_columns(frame, list(columns))
+                    keys.append(key)
+                check_handles.append(keys)
+
+            context = multiprocessing.get_context(start_method)
+            with ProcessPoolExecutor(max_workers=max_workers, mp_context=context) as pool:
+                futures = [
+                    pool.submit(run_check, func, [picklable(handles[key]) for key in keys], args)
+                    for (_, _, func, _, args), keys in zip(self.checks, check_handles)
+                ]
+                for (check, side, _, _, _), future in zip(self.checks, futures):
+                    result = pickle.loads(future.result())
+                    if isinstance(check, list):
+                        counts, details = result[:2]
+                        for name, count in counts.items():
+                            self.results[(name, side)] = int(count)
+                        for name, detail in details.items():
+                            self.details[(name, side)] = detail
+                        for name, bitmap in (result[2] if len(result) > 2 else {}).items():
+                            self.bitmaps[(name, side)] = bitmap
+                        continue
+                    # Checks that also return details (e.g. verify_integrity) report their count first
+                    if isinstance(result, tuple):
+                        result, self.details[(check, side)] = result[0], result[1]
+                    self.results[(check, side)] = int(result)
+        finally:
+            for handle in handles.values():
+                if "block" in handle:
+                    handle["block"].close()
+                    handle["block"].unlink()
+
+        return self.report()
+
+    def report(self):
+        report = pd.Series(self.results).unstack()
+        # Keep checks in registration order rather than alphabetical
+        return report.loc[list(dict.fromkeys(self.order))]
+
+    def print_report(self):
+        report = self.report()
+        print(f"{'Column':<10} | {'Original Violations':<15} | {'Cleaned Violations':<15}")
+        print("-" * 45)
+        for check, row in report.iterrows():
+            print(f"{check:<10} | {row['Original']:<15} | {row['Cleaned']:<15}")
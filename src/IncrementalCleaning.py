@@ -0,0 +1,290 @@
+'''
+Incremental re-cleaning of Menu.csv and MenuItem.csv. Rows are keyed by id
+and a per-row content hash from the previous run; only inserted and updated
+rows go through the cleaning rules and IC checks, and the IC and change
+counters are updated from the delta
+
+Usage: python IncrementalCleaning.py [state_dir]
+'''
+
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from ChangeMetrics import cleaned_positions, modified_cells
+from CleaningRules import (MENU_CONSTRAINTS, MENU_ITEM_CONSTRAINTS, BAD_MAPPINGS, replace_empty_strings,
+                           drop_missing_values, drop_empty_currency, drop_invalid_currencies, drop_missing_price)
+from CurrencyValidation import map_currency_symbols
+from DataCache import load_csv
+from DateNormalization import normalize_dates
+from DishDeduplication import deduplicate_dishes, remap_dish_ids
+from ICRegistry import TableScan, evaluate
+from OccasionClustering import normalize_occasions
+
+# Bump whenever the row results change so existing states are rebuilt
+STATE_VERSION = 3
+
+def row_hashes(df):
+    """Content hash of every row, indexed by the row's id."""
+    ids = df["id"]
+    if ids.isna().any() or not ids.is_unique:
+        raise ValueError("Incremental cleaning needs a unique, non-missing id for every row")
+    return pd.Series(pd.util.hash_pandas_object(df, index=False).to_numpy(), index=pd.Index(ids.to_numpy()))
+
+def scatter(mask, subset, df):
+    # Spread a mask computed over the surviving rows of a cleaning step back onto `df`
+    flags = np.zeros(len(df), dtype=bool)
+    flags[cleaned_positions(df, subset)] = np.asarray(mask, dtype=bool)
+    return flags
+
+def menu_row_results(df):
+    """
+    Per-row results of the Menu sections of ICViolations.py and
+    DataCleaningChanges.py: the original and cleaned IC flags, whether each
+    section kept the row, the cells it modified and the cleaned values.
+    """
+    results = {}
+    original = evaluate(TableScan(df), MENU_CONSTRAINTS)
+    for name in original.columns:
+        results[f"original {name}"] = original[name].to_numpy()
+
+    # Drop_Missing_Values
+    cleaned = drop_missing_values(df)
+    results["kept missing"] = scatter(np.ones(len(cleaned)), cleaned, df)
+    masks = evaluate(TableScan(cleaned), MENU_CONSTRAINTS[:3])
+    for name in masks.columns:
+        results[f"cleaned {name}"] = scatter(masks[name], cleaned, df)
+
+    # To_ISO_Format
+    iso_dates, _ = normalize_dates(df["date"])
+    cleaned = df.assign(date=iso_dates).dropna(subset=["date"])
+    results["kept date"] = scatter(np.ones(len(cleaned)), cleaned, df)
+    results["cleaned iso date"] = scatter(evaluate(TableScan(cleaned), MENU_CONSTRAINTS[3:4])["iso date"], cleaned, df)
+    results["cleaned date value"] = iso_dates.to_numpy()
+
+    # Drop_Empty_Currency, Drop_Invalid_Currencies and Currency_To_Symbol
+    cleaned = drop_invalid_currencies(drop_empty_currency(df))
+    cleaned = cleaned.assign(
+        currency_symbol=map_currency_symbols(cleaned["currency"], cleaned["currency_symbol"])
+    )
+    results["kept currency"] = scatter(np.ones(len(cleaned)), cleaned, df)
+    results["cleaned currency_symbol"] = scatter(
+        evaluate(TableScan(cleaned), MENU_CONSTRAINTS[4:5])["currency_symbol"], cleaned, df
+    )
+    before = df.loc[cleaned.index]
+    results["modified currency"] = scatter(
+        modified_cells(before["currency"].array, cleaned["currency"].array), cleaned, df
+    )
+    results["modified currency_symbol"] = scatter(
+        modified_cells(before["currency_symbol"].array, cleaned["currency_symbol"].array), cleaned, df
+    )
+    symbols = np.full(len(df), None, dtype=object)
+    symbols[cleaned_positions(df, cleaned)] = cleaned["currency_symbol"].astype(object).to_numpy()
+    results["cleaned currency_symbol value"] = symbols
+
+    # Normalize_Occasion
+    cleaned = df.assign(occasion=normalize_occasions(df["occasion"])[0])
+    results["cleaned occasion"] = evaluate(TableScan(cleaned), MENU_CONSTRAINTS[5:6])["occasion"].to_numpy()
+
+    return pd.DataFrame(results, index=pd.Index(df["id"].to_numpy()))
+
+def menu_item_row_results(df, id_mapping):
+    """
+    Per-row results of the MenuItem sections: the price IC flags, whether
+    the row survives Drop_Missing_Price and the remapped dish_id.
+    """
+    results = {"original price": evaluate(TableScan(df), MENU_ITEM_CONSTRAINTS)["price"].to_numpy()}
+
+    cleaned = drop_missing_price(replace_empty_strings(df))
+    results["kept price"] = scatter(np.ones(len(cleaned)), cleaned, df)
+    results["cleaned price"] = scatter(evaluate(TableScan(cleaned), MENU_ITEM_CONSTRAINTS)["price"], cleaned, df)
+
+    dish_ids = remap_dish_ids(df["dish_id"], id_mapping)
+    results["modified dish_id"] = modified_cells(df["dish_id"].array, dish_ids.array)
+    results["original dish_id value"] = df["dish_id"].array
+    results["cleaned dish_id value"] = dish_ids.array
+
+    return pd.DataFrame(results, index=pd.Index(df["id"].to_numpy()))
+
+def dish_violations(dish_ids, dish_df):
+    # Bad mapping rows per dish_id; the dependency only compares rows of the same dish_id
+    frame = pd.DataFrame({"dish_id": dish_ids})
+    mask = BAD_MAPPINGS.mask(TableScan(frame, dish_df))
+    return frame.loc[mask.to_numpy(), "dish_id"].value_counts()
+
+class IncrementalState:
+    """
+    The previous run's per-row results of one table, indexed by id, with
+    the `hash` of each row, plus running totals of the boolean columns and
+    any extra frames the table keeps (e.g. the dish id mapping).
+    """
+
+    def __init__(self, name, state_dir):
+        self.name = name
+        self.state_dir = state_dir
+        self.rows = pd.DataFrame()
+        self.totals = {}
+        self.extras = {}
+
+    def path(self, part):
+        return os.path.join(self.state_dir, f"{self.name}.{part}")
+
+    def load(self, extras=()):
+        try:
+            import pyarrow.feather as feather
+        except ImportError:
+            return self
+        if not os.path.exists(self.path("meta.json")):
+            return self
+        with open(self.path("meta.json"), "r", encoding="utf-8") as file:
+            meta = json.load(file)
+        if meta.get("state_version") != STATE_VERSION:
+            return self
+
+        self.rows = feather.read_feather(self.path("feather")).set_index("id")
+        self.totals = meta["totals"]
+        for extra in extras:
+            self.extras[extra] = feather.read_feather(self.path(f"{extra}.feather")).set_index("key")["value"]
+        return self
+
+    def save(self):
+        try:
+            import pyarrow.feather as feather
+        except ImportError:
+            return
+        os.makedirs(self.state_dir, exist_ok=True)
+        feather.write_feather(self.rows.rename_axis("id").reset_index(), self.path("feather"))
+        for extra, values in self.extras.items():
+            feather.write_feather(pd.DataFrame({"key": values.index, "value": values.to_numpy()}),
+                                  self.path(f"{extra}.feather"))
+        with open(self.path("meta.json"), "w", encoding="utf-8") as file:
+            json.dump({"state_version": STATE_VERSION, "totals": self.totals}, file, indent=1)
+
+    def update(self, df, row_results, force_ids=()):
+        """
+        Bring the state up to date with `df`. Inserted, updated and
+        `force_ids` rows are run through `row_results`; the rows of every
+        other id are reused as they are. Returns the delta sizes.
+        """
+        hashes = row_hashes(df)
+        previous = self.rows["hash"] if "hash" in self.rows else pd.Series(dtype=np.uint64)
+
+        inserted = hashes.index.difference(previous.index)
+        deleted = previous.index.difference(hashes.index)
+        common = hashes.index.intersection(previous.index)
+        updated = common[hashes[common].to_numpy() != previous[common].to_numpy()]
+        recompute = inserted.union(updated).union(common.intersection(pd.Index(force_ids)))
+
+        positions = np.sort(hashes.index.get_indexer(recompute))
+        results = row_results(df.iloc[positions])
+        results["hash"] = hashes.iloc[positions].to_numpy()
+
+        # Totals move by the difference between the replaced and the new results
+        replaced = self.rows.loc[self.rows.index.intersection(recompute.union(deleted))]
+        for column in results.columns[results.dtypes == bool]:
+            previous_sum = int(replaced[column].sum()) if column in replaced else 0
+            self.totals[column] = self.totals.get(column, 0) - previous_sum + int(results[column].sum())
+        self.totals["rows"] = len(df)
+
+        self.rows = pd.concat([self.rows.drop(index=replaced.index), results]).reindex(hashes.index)
+        return {"inserted": inserted, "updated": updated, "deleted": deleted,
+                "recomputed": recompute, "replaced": replaced}
+
+def changed_keys(previous, current):
+    # Keys whose value was added, removed or changed between two Series
+    previous = previous.astype(object)
+    current = current.astype(object)
+    keys = previous.index.union(current.index)
+    return keys[previous.reindex(keys).to_numpy() != current.reindex(keys).to_numpy()]
+
+def recount_bad_mappings(state, delta, dish_df, previous_names, dish_names):
+    """
+    Bad mappings only compare rows of the same dish_id, so they are recounted
+    for the dish_ids a recomputed or deleted row had or has, and the ones
+    whose Dish.csv name changed. The other per-dish_id counts are reused.
+    """
+    value_columns = ["original dish_id value", "cleaned dish_id value"]
+    affected = pd.Index(changed_keys(previous_names, dish_names))
+    for frame in [delta["replaced"], state.rows.loc[delta["recomputed"]]]:
+        for column in value_columns:
+            if column in frame:
+                affected = affected.union(pd.Index(frame[column].dropna().unique()))
+
+    for side, column in zip(["original", "cleaned"], value_columns):
+        previous = state.extras.get(f"{side} bad mappings", pd.Series(dtype="int64"))
+        dish_ids = state.rows[column]
+        counts = dish_violations(dish_ids[dish_ids.isin(affected)].array, dish_df)
+        previous = previous.drop(index=previous.index.intersection(affected))
+        if len(previous):
+            counts = pd.concat([previous, counts])
+        state.extras[f"{side} bad mappings"] = counts.astype("int64")
+        state.totals[f"{side} bad mappings"] = int(counts.sum())
+
+def run_incremental(menu_path, menu_item_path, dish_path, state_dir=None):
+    """
+    Bring the Menu and MenuItem states up to date and save them. Returns
+    both states and the delta of each table.
+    """
+    if state_dir is None:
+        state_dir = os.path.join(os.path.dirname(os.path.abspath(menu_path)), ".cache", "incremental")
+
+    menu_state = IncrementalState("Menu", state_dir).load()
+    menu_delta = menu_state.update(load_csv(menu_path), menu_row_results)
+
+    dish_df, id_mapping = deduplicate_dishes(load_csv(dish_path))
+    dish_names = dish_df.drop_duplicates(subset="id", keep="last").set_index("id")["name"]
+
+    menu_item_state = IncrementalState("MenuItem", state_dir).load(
+        ["id_mapping", "dish_names", "original bad mappings", "cleaned bad mappings"]
+    )
+    previous_mapping = menu_item_state.extras.get("id_mapping", pd.Series(dtype=object))
+    previous_names = menu_item_state.extras.get("dish_names", pd.Series(dtype=object))
+
+    # A changed mapping entry changes the cleaned dish_id of every row with that dish_id
+    menu_item_df = load_csv(menu_item_path)
+    remapped = changed_keys(previous_mapping, pd.Series(id_mapping, dtype=object))
+    force_ids = menu_item_df.loc[menu_item_df["dish_id"].isin(remapped), "id"]
+    menu_item_delta = menu_item_state.update(
+        menu_item_df, lambda df: menu_item_row_results(df, id_mapping), force_ids
+    )
+    recount_bad_mappings(menu_item_state, menu_item_delta, dish_df, previous_names, dish_names)
+
+    menu_item_state.extras["id_mapping"] = pd.Series(id_mapping, dtype="int64")
+    menu_item_state.extras["dish_names"] = dish_names.astype(object)
+
+    menu_state.save()
+    menu_item_state.save()
+    return menu_state, menu_delta, menu_item_state, menu_item_delta
+
+if __name__ == "__main__":
+    state_dir = sys.argv[1] if len(sys.argv) > 1 else None
+    menu_state, menu_delta, menu_item_state, menu_item_delta = run_incremental(
+        "./data/Menu.csv", "./data/MenuItem.csv", "./data/Dish.csv", state_dir
+    )
+
+    print(f"{'Table':<10} | {'Inserted':<10} | {'Updated':<10} | {'Deleted':<10} | {'Recomputed':<10}")
+    print("-" * 60)
+    for table, delta in [("Menu", menu_delta), ("MenuItem", menu_item_delta)]:
+        print(f"{table:<10} | {len(delta['inserted']):<10} | {len(delta['updated']):<10} | "
+              f"{len(delta['deleted']):<10} | {len(delta['recomputed']):<10}")
+
+    totals = {**menu_state.totals, **menu_item_state.totals}
+    print(f"\n{'Column':<10} | {'Original Violations':<15} | {'Cleaned Violations':<15}")
+    print("-" * 45)
+    for check in ["date", "currency", "location", "iso date", "currency_symbol", "occasion", "price", "bad mappings"]:
+        print(f"{check:<10} | {totals[f'original {check}']:<15} | {totals[f'cleaned {check}']:<15}")
+
+    print(f"\n{'Column':<10} | {'Original Length':<15} | {'Cleaned Length':<15}")
+    print("-" * 45)
+    for column, kept in [("date", "kept missing"), ("date (iso)", "kept date"), ("currency", "kept currency"),
+                         ("price", "kept price")]:
+        rows = menu_item_state.totals["rows"] if column == "price" else menu_state.totals["rows"]
+        print(f"{column:<10} | {rows:<15} | {totals[kept]:<15}")
+
+    print(f"\n{'Column':<20} | {'Differing Rows':<15}")
+    print("-" * 35)
+    for column in ["currency", "currency_symbol", "dish_id"]:
+        print(f"{column:<20} | {totals[f'modified {column}']:<15}")
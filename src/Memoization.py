@@ -0,0 +1,155 @@
+'''
+Per-distinct-value memoization for the per-value cleaning functions, with
+an optional on-disk LRU store so results survive across runs
+'''
+
+import hashlib
+import inspect
+import os
+import pickle
+import sqlite3
+import time
+
+import numpy as np
+import pandas as pd
+
+# Rows, distinct values, disk hits and computed values of every memoized function
+MEMO_STATS = {}
+
+class DiskMemo:
+    """
+    SQLite store of memoized results keyed by function namespace (its name
+    and code version, see `memo_namespace`) and input value. Every lookup
+    refreshes an entry's last use; once the store holds more than
+    `max_entries` results, the least recently used are evicted.
+    """
+
+    BATCH_SIZE = 500
+
+    def __init__(self, path, max_entries=1_000_000):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.max_entries = max_entries
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS memo "
+            "(namespace TEXT, key BLOB, value BLOB, used INTEGER, PRIMARY KEY (namespace, key))"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS memo_used ON memo (used)")
+
+    def expire_versions(self, namespace):
+        # Results of the other code versions of the same function (and of stores
+        # written before namespaces carried a version) can never be hit again
+        name = namespace.rsplit("@", 1)[0]
+        with self.connection:
+            self.connection.execute(
+                "DELETE FROM memo WHERE (substr(namespace, 1, ?) = ? AND namespace != ?) OR namespace = ?",
+                (len(name) + 1, name + "@", namespace, name),
+            )
+
+    def get_many(self, namespace, keys):
+        """Return {position in `keys`: result} for the keys found in the store."""
+        blobs = [pickle.dumps(key) for key in keys]
+        positions = {blob: position for position, blob in enumerate(blobs)}
+        found = {}
+        for start in range(0, len(blobs), self.BATCH_SIZE):
+            batch = blobs[start:start + self.BATCH_SIZE]
+            rows = self.connection.execute(
+                f"SELECT key, value FROM memo WHERE namespace = ? AND key IN ({', '.join('?' * len(batch))})",
+                [namespace, *batch],
+            )
+            for blob, value in rows:
+                found[positions[blob]] = pickle.loads(value)
+
+        used = time.time_ns()
+        with self.connection:
+            self.connection.executemany(
+                "UPDATE memo SET used = ? WHERE namespace = ? AND key = ?",
+                [(used, namespace, blobs[position]) for position in found],
+            )
+        return found
+
+    def put_many(self, namespace, items):
+        used = time.time_ns()
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO memo VALUES (?, ?, ?, ?)",
+                [(namespace, pickle.dumps(key), pickle.dumps(value), used) for key, value in items],
+            )
+            excess = self.connection.execute("SELECT COUNT(*) FROM memo").fetchone()[0] - self.max_entries
+            if excess > 0:
+                self.connection.execute(
+                    "DELETE FROM memo WHERE rowid IN (SELECT rowid FROM memo ORDER BY used LIMIT ?)", (excess,)
+                )
+
+disk_store = None
+# Namespaces whose stale versions were already expired in the current store
+expired_namespaces = set()
+
+def set_disk_store(path, max_entries=1_000_000):
+    """Keep memoized results in the store at `path` from now on; None turns it off."""
+    global disk_store
+    disk_store = None if path is None else DiskMemo(path, max_entries)
+    expired_namespaces.clear()
+    return disk_store
+
+def memo_namespace(func, name, version=None):
+    """
+    Disk store namespace of `func`: its name and a code version, by default
+    a hash of its source, so editing the function invalidates its stored
+    results. Pass an explicit `version` to invalidate them for changes the
+    source does not show (e.g. a helper or library it calls).
+    """
+    if version is None:
+        try:
+            source = inspect.getsource(func)
+        except (OSError, TypeError):
+            source = repr(getattr(func, "__code__", func))
+        version = hashlib.blake2b(source.encode(), digest_size=8).hexdigest()
+    return f"{name}@{version}"
+
+def memoize_column(func, values, name=None, version=None):
+    """
+    Equivalent of `values.map(func)` that calls `func` once per distinct
+    value: the column is factorized, `func` runs on the distinct values the
+    disk store does not already hold for this version of `func` (see
+    `memo_namespace`), and the results are broadcast back through the codes.
+    Missing values are passed to `func` once as well.
+    """
+    name = name or f"{func.__module__}.{func.__qualname__}"
+    codes, uniques = pd.factorize(values)
+    uniques = list(uniques)
+
+    namespace = memo_namespace(func, name, version) if disk_store is not None else None
+    if disk_store is not None and namespace not in expired_namespaces:
+        disk_store.expire_versions(namespace)
+        expired_namespaces.add(namespace)
+
+    results = np.empty(len(uniques) + 1, dtype=object)
+    found = disk_store.get_many(namespace, uniques) if disk_store is not None and uniques else {}
+    for position, result in found.items():
+        results[position] = result
+
+    computed = [(position, func(value)) for position, value in enumerate(uniques) if position not in found]
+    for position, result in computed:
+        results[position] = result
+    if disk_store is not None and computed:
+        disk_store.put_many(namespace, [(uniques[position], result) for position, result in computed])
+
+    missing = np.flatnonzero(codes == -1)
+    if len(missing):
+        results[-1] = func(values.iloc[missing[0]])
+
+    stats = MEMO_STATS.setdefault(name, dict.fromkeys(["rows", "distinct", "disk_hits", "computed"], 0))
+    stats["rows"] += len(values)
+    stats["distinct"] += len(uniques)
+    stats["disk_hits"] += len(found)
+    stats["computed"] += len(computed) + bool(len(missing))
+
+    return pd.Series(results[codes], index=values.index, dtype=object)
+
+def print_memo_stats():
+    print(f"{'Function':<45} | {'Rows':<10} | {'Distinct':<10} | {'Disk Hits':<10} | {'Computed':<10}")
+    print("-" * 95)
+    for name, stats in MEMO_STATS.items():
+        print(f"{name:<45} | {stats['rows']:<10} | {stats['distinct']:<10} | "
+              f"{stats['disk_hits']:<10} | {stats['computed']:<10}")
@@ -0,0 +1,81 @@
+'''
+Streams MenuItem.csv in chunks and reports the MenuItem integrity constraint
+and change counts of ICViolations.py and DataCleaningChanges.py, with memory
+bounded by the chunk size instead of the table size
+
+Usage: python MenuItemStreaming.py [chunk_size]
+'''
+
+import sys
+
+import pandas as pd
+
+from ChangeMetrics import modified_cells
+from CleaningRules import count_empty, drop_missing_price, replace_empty_strings
+from DataCache import load_csv, read_schema_csv
+from DishDeduplication import deduplicate_dishes, remap_dish_ids, verify_integrity
+
+DEFAULT_CHUNK_SIZE = 100_000
+
+def stream_menu_item(path, dish_df, id_mapping, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Run the price emptiness check and the dish_id remap chunk by chunk and
+    accumulate the counters the in-memory scripts print. Returns the
+    counters and the per-dish_id bad mapping summary of the cleaned data.
+    """
+    counters = dict.fromkeys([
+        "rows", "rows_cleaned", "price_original", "price_cleaned", "invalid_price_rows",
+        "dish_id_changed", "bad_mappings_original", "bad_mappings_cleaned",
+    ], 0)
+    seen_original, seen_cleaned = set(), set()
+    violation_frames = []
+    mapping = pd.Series(id_mapping)
+
+    for chunk in read_schema_csv(path, chunksize=chunk_size):
+        cleaned = drop_missing_price(replace_empty_strings(chunk))
+
+        counters["rows"] += len(chunk)
+        counters["rows_cleaned"] += len(cleaned)
+        counters["price_original"] += count_empty(chunk, "price")
+        counters["price_cleaned"] += count_empty(cleaned, "price")
+        counters["invalid_price_rows"] += len(cleaned.query("price == ''"))
+
+        remapped = chunk.assign(dish_id=remap_dish_ids(chunk["dish_id"], mapping))
+        # Null-aware, as in DataCleaningChanges: a dish_id missing before and after is unchanged
+        counters["dish_id_changed"] += int(modified_cells(chunk["dish_id"].array, remapped["dish_id"].array).sum())
+
+        violations, _ = verify_integrity(chunk, dish_df, id_mapping, seen_dish_ids=seen_original)
+        counters["bad_mappings_original"] += violations
+        violations, violation_ids = verify_integrity(remapped, dish_df, id_mapping, seen_dish_ids=seen_cleaned)
+        counters["bad_mappings_cleaned"] += violations
+        violation_frames.append(violation_ids)
+
+    violation_ids = (
+        pd.concat(violation_frames, ignore_index=True)
+        .groupby("dish_id", dropna=False, sort=False)
+        .agg(name=("name", "first"), violations=("violations", "sum"))
+        .reset_index()
+    )
+    return counters, violation_ids
+
+if __name__ == "__main__":
+    chunk_size = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_CHUNK_SIZE
+
+    dish_df, id_mapping = deduplicate_dishes(load_csv("./data/Dish.csv"))
+    counters, violation_ids = stream_menu_item("./data/MenuItem.csv", dish_df, id_mapping, chunk_size)
+
+    print(f"{'Column':<10} | {'Original Violations':<15} | {'Cleaned Violations':<15}")
+    print("-" * 45)
+    print(f"{'price':<10} | {counters['price_original']:<15} | {counters['price_cleaned']:<15}")
+    print(f"{'bad mappings':<10} | {counters['bad_mappings_original']:<15} | {counters['bad_mappings_cleaned']:<15}")
+
+    print(f"\n{'Column':<10} | {'Original Length':<15} | {'Cleaned Length':<15}")
+    print("-" * 45)
+    print(f"{'price':<10} | {counters['rows']:<15} | {counters['rows_cleaned']:<15}")
+
+    print(f"\n{'Column':<20} | {'Differing Rows':<15}")
+    print("-" * 35)
+    print(f"{'dish_id':<20} | {counters['dish_id_changed']:<15}")
+
+    print("\nInvalid Price Rows:", counters["invalid_price_rows"])
+    print("\nViolating Dish Ids:", violation_ids.head(10))
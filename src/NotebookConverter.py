@@ -1,23 +1,261 @@
 '''
-Converts Jupyter notebooks into standalone Python scripts
+Converts Jupyter notebooks into standalone Python scripts, in parallel and
+only when a notebook changed since its last conversion. With `--annotate`
+every code cell is wrapped in YesWorkflow `@begin/@end` annotations, so the
+generated scripts can be run by StepProfiler.py and WorkflowExecutor.py.
+A script the converter did not write, or that was edited since, is never
+overwritten without `--overwrite`
+
+Usage: python NotebookConverter.py notebook, directory or glob ... [--output-dir dir] [--annotate]
+                                   [--workers n] [--force] [--overwrite]
 '''
 
-import nbformat
+import argparse
+import glob
+import hashlib
+import json
+import os
+import re
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# Bump whenever the generated scripts change so every notebook is converted again
+CONVERTER_VERSION = 1
+MANIFEST_NAME = os.path.join(".cache", "notebook_hashes.json")
+
+def read_cells(path):
+    """
+    The cells of a notebook as dicts with `cell_type` and `source` (a
+    string). nbformat is only imported for notebooks older than version 4.
+    """
+    with open(path, "r", encoding="utf-8") as file:
+        notebook = json.load(file)
+    if notebook.get("nbformat", 4) < 4:
+        import nbformat
+        notebook = nbformat.convert(nbformat.from_dict(notebook), 4)
+
+    return [
+        {"cell_type": cell["cell_type"],
+         "source": "".join(cell["source"]) if isinstance(cell["source"], list) else cell["source"]}
+        for cell in notebook["cells"]
+    ]
+
+def block_name(heading, used):
+    # "### 2. Date Standardization" -> "Date_Standardization", unique within the script
+    words = re.sub(r"^\s*#+\s*(\d+\.)?", "", heading)
+    name = "_".join(re.sub(r"[\W_]+", " ", words).split()) or "Cell"
+    if name[0].isdigit():
+        name = f"Cell_{name}"
+    unique, count = name, 1
+    while unique in used:
+        count += 1
+        unique = f"{name}_{count}"
+    used.add(unique)
+    return unique
+
+def cell_annotations(cells, script_name):
+    """
+    (begin, end) annotation lines for every code cell. A cell is named after
+    the closest markdown heading above it; its `@in` names are the names it
+    reads that an earlier cell wrote, and its `@out` names the names it writes.
+    """
+    from WorkflowExecutor import Node
+
+    annotations, used, writers = [], {script_name}, set()
+    heading, description = None, ""
+    for position, cell in enumerate(cells):
+        if cell["cell_type"] == "markdown":
+            lines = [line for line in cell["source"].splitlines() if line.strip()]
+            if lines and lines[0].lstrip().startswith("#"):
+                # An "@" would start a new annotation tag
+                heading, description = lines[0], lines[0].lstrip("# ").replace("@", "").strip()
+            continue
+        if cell["cell_type"] != "code":
+            continue
+
+        name = block_name(heading or f"Cell {position + 1}", used)
+        try:
+            node = Node(name, 1, 1, cell["source"])
+            inputs, outputs = sorted(node.reads & writers), sorted(node.writes)
+        except ValueError:
+            # Cells with IPython magics are not plain Python
+            inputs, outputs = [], []
+        writers |= set(outputs)
+
+        lines = [f"# @begin {name}" + (f" @desc {description}" if description else "")]
+        if inputs:
+            lines.append("# " + " ".join(f"@in {input_name}" for input_name in inputs))
+        if outputs:
+            lines.append("# " + " ".join(f"@out {output_name}" for output_name in outputs))
+        annotations.append(("\n".join(lines) + "\n", f"# @end {name}\n"))
+        heading, description = None, ""
+    return annotations
+
+def convert_notebook(path, script_path, annotate=False):
+    """
+    Write the code cells of the notebook at `path` to `script_path`, one
+    cell after the other, each followed by a blank line. The script is
+    streamed to a temporary file and moved into place once complete.
+    Returns the number of code cells.
+    """
+    cells = read_cells(path)
+    code_cells = [cell for cell in cells if cell["cell_type"] == "code"]
+    script_name = f"{os.path.splitext(os.path.basename(script_path))[0]}Script"
+    annotations = iter(cell_annotations(cells, script_name)) if annotate else None
+
+    directory = os.path.dirname(os.path.abspath(script_path))
+    with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=directory, suffix=".tmp", delete=False) as file:
+        if annotate:
+            file.write(f"# @begin {script_name}\n\n")
+        for cell in code_cells:
+            if annotate:
+                begin, end = next(annotations)
+                file.write(begin)
+                file.write(cell["source"])
+                file.write(f"\n{end}\n")
+            else:
+                file.write(cell["source"])
+                file.write("\n\n")
+        if annotate:
+            file.write(f"# @end {script_name}\n")
+    os.replace(file.name, script_path)
+    return len(code_cells)
+
+def notebook_hash(path, annotate):
+    digest = hashlib.blake2b(f"{CONVERTER_VERSION}:{annotate}".encode("utf-8"))
+    with open(path, "rb") as file:
+        digest.update(file.read())
+    return digest.hexdigest()
+
+def script_hash(path):
+    with open(path, "rb") as file:
+        return hashlib.blake2b(file.read()).hexdigest()
+
+def owns_script(entry, script_path):
+    """
+    Whether the converter may write `script_path`: it does not exist yet, or
+    the manifest `entry` of its notebook records the script exactly as it is
+    now (i.e. the converter wrote it and nobody edited it since).
+    """
+    if not os.path.exists(script_path):
+        return True
+    return isinstance(entry, dict) and entry.get("script") == script_hash(script_path)
+
+def find_notebooks(patterns):
+    """Notebooks named by paths, directories (searched recursively) and glob patterns, in order and without repeats."""
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = sorted(glob.glob(os.path.join(pattern, "**", "*.ipynb"), recursive=True))
+        else:
+            matches = sorted(glob.glob(pattern, recursive=True))
+        paths += [os.path.normpath(match) for match in matches
+                  if match.endswith(".ipynb") and ".ipynb_checkpoints" not in match]
+    return list(dict.fromkeys(paths))
+
+def script_path_for(path, output_dir=None):
+    name = f"{os.path.splitext(os.path.basename(path))[0]}.py"
+    return os.path.join(output_dir if output_dir is not None else os.path.dirname(path), name)
+
+def convert_job(path, script_path, annotate):
+    # Runs in a worker process
+    start = time.perf_counter()
+    cells = convert_notebook(path, script_path, annotate)
+    return cells, time.perf_counter() - start
+
+def load_manifest(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+def convert_all(paths, output_dir=None, annotate=False, workers=None, force=False, overwrite=False):
+    """
+    Convert every notebook in `paths` whose content hash differs from the
+    one recorded at its last conversion (or whose script is missing), in
+    parallel worker processes. Scripts not written by the converter (see
+    `owns_script`) are skipped unless `overwrite`. Returns one result dict
+    per notebook.
+    """
+    manifest_dirs = {os.path.dirname(script_path_for(path, output_dir)) or "." for path in paths}
+    manifests = {directory: load_manifest(os.path.join(directory, MANIFEST_NAME)) for directory in manifest_dirs}
+
+    results, jobs = [], []
+    for path in paths:
+        script_path = script_path_for(path, output_dir)
+        manifest = manifests[os.path.dirname(script_path) or "."]
+        digest = notebook_hash(path, annotate)
+        key = os.path.abspath(path)
+        result = {"notebook": path, "script": script_path, "hash": digest, "cells": None, "seconds": 0.0}
+        entry = manifest.get(key)
+        if not overwrite and not owns_script(entry, script_path):
+            result["status"] = "not ours"
+        elif not force and isinstance(entry, dict) and entry.get("hash") == digest and os.path.exists(script_path):
+            result["status"] = "unchanged"
+        else:
+            jobs.append(result)
+        results.append(result)
+
+    if len(jobs) > 1 and workers != 1:
+        with ProcessPoolExecutor(workers) as pool:
+            futures = [(result, pool.submit(convert_job, result["notebook"], result["script"], annotate)) for result in jobs]
+            outcomes = []
+            for result, future in futures:
+                try:
+                    outcomes.append((result, future.result(), None))
+                except Exception as error:
+                    outcomes.append((result, None, error))
+    else:
+        outcomes = []
+        for result in jobs:
+            try:
+                outcomes.append((result, convert_job(result["notebook"], result["script"], annotate), None))
+            except Exception as error:
+                outcomes.append((result, None, error))
+
+    for result, outcome, error in outcomes:
+        manifest = manifests[os.path.dirname(result["script"]) or "."]
+        if error is not None:
+            result["status"] = f"failed: {error}"
+            manifest.pop(os.path.abspath(result["notebook"]), None)
+        else:
+            result["status"] = "converted"
+            result["cells"], result["seconds"] = outcome
+            manifest[os.path.abspath(result["notebook"])] = {"hash": result["hash"],
+                                                             "script": script_hash(result["script"])}
 
-# Load the Jupyter notebook
-with open("./ICViolations.ipynb", "r", encoding="utf-8") as file:
-    notebook = nbformat.read(file, as_version=4)
+    for directory, manifest in manifests.items():
+        manifest_path = os.path.join(directory, MANIFEST_NAME)
+        os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+        with open(manifest_path, "w", encoding="utf-8") as file:
+            json.dump(manifest, file, indent=1, sort_keys=True)
+    return results
 
-# Collect all code into a single script
-script_code = ""
-for cell in notebook.cells:
-    if cell.cell_type == "code":
-        script_code += "\n".join(cell.source.split("\n"))
-        script_code += "\n\n"
+def print_results(results):
+    print(f"{'Notebook':<40} | {'Script':<40} | {'Status':<12} | {'Cells':<6} | {'Seconds':<8}")
+    print("-" * 118)
+    for result in results:
+        cells = "-" if result["cells"] is None else result["cells"]
+        print(f"{result['notebook']:<40} | {result['script']:<40} | {result['status']:<12} | {cells:<6} | "
+              f"{result['seconds']:<8.3f}")
+    skipped = [result["script"] for result in results if result["status"] == "not ours"]
+    if skipped:
+        print(f"\nNot overwritten, as the converter did not write them or they were edited since: "
+              f"{', '.join(skipped)}. Use --output-dir to convert elsewhere, or --overwrite to replace them.")
 
-# Save the code to a single Python file
-script_path = "./ICViolations.py"
-with open(script_path, "w", encoding="utf-8") as file:
-    file.write(script_code)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert Jupyter notebooks into standalone Python scripts")
+    parser.add_argument("paths", nargs="+", help="Notebooks, directories or glob patterns")
+    parser.add_argument("--output-dir", default=None, help="Write the scripts here instead of next to each notebook")
+    parser.add_argument("--annotate", action="store_true", help="Wrap every code cell in @begin/@end annotations")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--force", action="store_true", help="Convert even the unchanged notebooks")
+    parser.add_argument("--overwrite", action="store_true",
+                        help="Replace scripts the converter did not write or that were edited since")
+    args = parser.parse_args()
 
-script_path
+    if args.output_dir is not None:
+        os.makedirs(args.output_dir, exist_ok=True)
+    print_results(convert_all(find_notebooks(args.paths), args.output_dir, args.annotate, args.workers, args.force,
+                              args.overwrite))
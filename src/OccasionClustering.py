@@ -0,0 +1,132 @@
+'''
+Normalization of the free-text Menu.csv occasions to a fixed set of clusters
+'''
+
+import re
+
+import numpy as np
+import pandas as pd
+
+OCCASION_CLUSTERS = [
+    "Anniversary",
+    "Daily",
+    "Complimentary",
+    "Annual",
+    "Farewell",
+    "Tour",
+    "Holiday",
+    "Patriotic",
+    "Rite",
+    "Dinner",
+    "Breakfast",
+    "Social",
+    "Meeting",
+    "Religious Holiday",
+    "Political",
+    "Festival",
+    "Reunion",
+    "Reception",
+    "Lunch",
+    "Graduation"
+]
+
+# Words that identify a cluster inside a longer free-text occasion. Every
+# single-word cluster name is a keyword of its own cluster as well
+OCCASION_KEYWORDS = {
+    "Anniversary": ["jubilee", "centennial", "centenary"],
+    "Complimentary": ["testimonial", "honor", "honour", "tribute"],
+    "Annual": ["yearly"],
+    "Farewell": ["sendoff", "bon voyage", "departure"],
+    "Tour": ["excursion", "voyage", "cruise"],
+    "Holiday": ["thanksgiving", "new year", "new years", "halloween"],
+    "Patriotic": ["independence", "memorial", "flag day", "decoration day"],
+    "Rite": ["wedding", "christening", "baptism", "funeral", "confirmation"],
+    "Dinner": ["supper", "banquet"],
+    "Breakfast": ["brunch"],
+    "Social": ["party", "ball", "dance", "soiree"],
+    "Meeting": ["convention", "conference", "assembly", "congress"],
+    "Religious Holiday": ["christmas", "xmas", "easter", "passover", "purim"],
+    "Political": ["election", "campaign", "inauguration"],
+    "Festival": ["fete", "carnival", "fair"],
+    "Reunion": ["homecoming"],
+    "Reception": ["levee"],
+    "Lunch": ["luncheon", "tiffin"],
+    "Graduation": ["commencement", "alumni", "class day"],
+}
+
+def normalize_key(text):
+    # Case-insensitive key with punctuation and repeated whitespace removed
+    return " ".join(re.sub(r"[\W_]+", " ", text.casefold()).split())
+
+class OccasionIndex:
+    """
+    Lookup index from raw occasions to the clusters, built once. A value is
+    matched, in order:
+
+    - exactly, against the cluster names;
+    - normalized, when its `normalize_key` equals a cluster's;
+    - by tokens, when its normalized text contains a cluster name or
+      keyword as whole words. Longer phrases win over shorter ones, then
+      the phrase that starts first.
+
+    Anything else is unmatched.
+    """
+
+    METHODS = ["exact", "normalized", "token", "unmatched", "missing"]
+
+    def __init__(self, clusters=OCCASION_CLUSTERS, keywords=OCCASION_KEYWORDS):
+        self.clusters = list(clusters)
+        self.exact = {cluster: cluster for cluster in self.clusters}
+        self.normalized = {normalize_key(cluster): cluster for cluster in self.clusters}
+
+        self.phrases = dict(self.normalized)
+        for cluster, words in keywords.items():
+            for word in words:
+                self.phrases.setdefault(normalize_key(word), cluster)
+        # Phrases by word count, longest first
+        self.phrase_lengths = sorted({len(phrase.split()) for phrase in self.phrases}, reverse=True)
+
+    def match(self, occasion):
+        """Return the cluster of one raw occasion (None if unmatched) and the method that matched it."""
+        if not isinstance(occasion, str):
+            return None, "missing" if pd.isna(occasion) else "unmatched"
+        if occasion in self.exact:
+            return self.exact[occasion], "exact"
+
+        key = normalize_key(occasion)
+        if key in self.normalized:
+            return self.normalized[key], "normalized"
+
+        tokens = key.split()
+        for length in self.phrase_lengths:
+            for start in range(len(tokens) - length + 1):
+                cluster = self.phrases.get(" ".join(tokens[start:start + length]))
+                if cluster is not None:
+                    return cluster, "token"
+        return None, "unmatched"
+
+OCCASION_INDEX = OccasionIndex()
+
+def normalize_occasions(occasions, index=OCCASION_INDEX):
+    """
+    Map a raw occasion column to the clusters. Each distinct value is
+    matched once through `index` and the result is broadcast back through
+    the codes, as a categorical over the clusters; unmatched and missing
+    occasions become missing. Also returns the number of rows each match
+    method accounted for.
+    """
+    if isinstance(occasions.dtype, pd.CategoricalDtype):
+        codes, uniques = occasions.cat.codes.to_numpy(), list(occasions.cat.categories)
+    else:
+        codes, uniques = pd.factorize(occasions)
+        uniques = list(uniques)
+
+    matches = [index.match(value) for value in uniques]
+    positions = {cluster: position for position, cluster in enumerate(index.clusters)}
+    cluster_codes = np.array([positions.get(cluster, -1) for cluster, _ in matches] + [-1])
+    method_codes = np.array([index.METHODS.index(method) for _, method in matches] + [index.METHODS.index("missing")])
+
+    clusters = pd.Categorical.from_codes(cluster_codes[codes], index.clusters)
+    method_counts = np.bincount(method_codes[codes], minlength=len(index.METHODS))
+    return (pd.Series(clusters, index=occasions.index),
+            {method: int(count) for method, count in zip(index.METHODS, method_counts)})
@@ -0,0 +1,185 @@
+'''
+Runs the cleaning rules as steps over CSVs that are loaded once and shared
+'''
+
+import resource
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from ChangeMetrics import cleaned_positions, modified_cells
+from DataCache import load_csv, load_required_csv
+from Memoization import MEMO_STATS, print_memo_stats, set_disk_store
+
+def peak_rss_mb():
+    # ru_maxrss is reported in bytes on macOS and in kilobytes on Linux
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+def reset_peak_rss():
+    """
+    Reset the kernel's peak RSS (VmHWM) to the current RSS, so that
+    `step_peak_rss_mb` reads the peak reached since. Only Linux supports
+    the reset; returns False elsewhere.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w", encoding="ascii") as file:
+            file.write("5")
+        return True
+    except OSError:
+        return False
+
+def step_peak_rss_mb():
+    with open("/proc/self/status", "r", encoding="ascii") as file:
+        for line in file:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    return None
+
+def column_values(values):
+    # The numpy array behind a column, if it has one
+    array = values.array
+    if isinstance(array, pd.Categorical):
+        return array.codes
+    if isinstance(array, pd.arrays.NumpyExtensionArray):
+        return array.to_numpy()
+    # Masked arrays (nullable ints, floats and booleans) keep their values in _data
+    return getattr(array, "_data", None)
+
+def shares_values(before, after):
+    """
+    Whether column `after` still holds the very array of column `before`, as
+    every column a step did not assign does under copy-on-write.
+    """
+    if before.array is after.array:
+        return True
+    left, right = column_values(before), column_values(after)
+    return (isinstance(left, np.ndarray) and isinstance(right, np.ndarray) and before.dtype == after.dtype
+            and left.ctypes.data == right.ctypes.data and left.shape == right.shape and left.strides == right.strides)
+
+def touched_columns(before, after):
+    """
+    Columns a step added, removed or modified on the rows it kept, from the
+    frame it was given and the frame it returned. A step that returns
+    (frame, ...) is compared on its frame; None when there is nothing to compare.
+
+    When the step kept every row, the columns still sharing their array with
+    the input are unchanged without looking at their values, so only the
+    columns the step assigned are compared. When it dropped rows every
+    column was copied, and the kept rows are compared.
+    """
+    if isinstance(after, tuple) and after and isinstance(after[0], pd.DataFrame):
+        after = after[0]
+    if not isinstance(before, pd.DataFrame) or not isinstance(after, pd.DataFrame):
+        return None
+
+    columns = [column for column in after.columns if column not in before.columns]
+    columns += [column for column in before.columns if column not in after.columns]
+    common = [column for column in before.columns if column in after.columns]
+
+    if len(before) == len(after) and before.index.equals(after.index):
+        return columns + [column for column in common if not shares_values(before[column], after[column])
+                          and modified_cells(before[column].array, after[column].array).any()]
+    try:
+        positions = cleaned_positions(before, after)
+    except ValueError:
+        # Rows were added or relabelled, so values cannot be paired up
+        return list(after.columns)
+    return columns + [column for column in common
+                      if modified_cells(before[column].array.take(positions), after[column].array).any()]
+
+class PipelineRunner:
+    """
+    Loads each CSV once and runs cleaning steps over the shared frames.
+
+    Steps run with copy-on-write switched on (only while they run; the
+    global pandas option is left alone) so that they can start from the
+    loaded frame without `df.copy()`: a step only pays for the columns it
+    actually changes, and the loaded frame itself is never modified. Every
+    step is recorded with the columns it changed, rows in/out, wall time
+    and the peak RSS reached during the step (where the peak can be reset,
+    see `reset_peak_rss`). With `trace_memory` the step's own peak Python
+    allocation is traced with tracemalloc as well, which slows the steps down.
+
+    With `memo_path`, the per-value cleaning functions keep their results
+    in an on-disk LRU store there (see Memoization.DiskMemo).
+    """
+
+    def __init__(self, memo_path=None, trace_memory=False):
+        self.trace_memory = trace_memory
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        if memo_path is not None:
+            set_disk_store(memo_path)
+        self.frames = {}
+        self.records = []
+
+    def load(self, name, path, required=None, **load_kwargs):
+        """
+        Load a CSV once as `name`, through the columnar cache (see
+        DataCache.load_csv). With `required`, the rows missing a value in
+        any of those columns are dropped as well (see
+        DataCache.load_required_csv).
+        """
+        if name not in self.frames:
+            if required is None:
+                loader = lambda _: load_csv(path, **load_kwargs)
+            else:
+                loader = lambda _: load_required_csv(path, required, **load_kwargs)
+            self.frames[name] = self.run_step(f"Load_{name}", loader, None)
+        return self.frames[name]
+
+    def run_step(self, name, func, df):
+        rss_reset = reset_peak_rss()
+        if self.trace_memory:
+            allocated = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        with pd.option_context("mode.copy_on_write", True):
+            # A shallow copy is free under copy-on-write and keeps the step from
+            # mutating the shared frame it was given
+            result = func(df.copy(deep=False) if isinstance(df, pd.DataFrame) else df)
+        elapsed = time.perf_counter() - start
+        peak_rss = step_peak_rss_mb() if rss_reset else None
+        peak_alloc = (tracemalloc.get_traced_memory()[1] - allocated) / (1024 * 1024) if self.trace_memory else None
+
+        # Loads have no input frame, so everything they return is new
+        columns = touched_columns(df, result) if df is not None else ["all"]
+        self.records.append({
+            "step": name,
+            "columns": "-" if columns is None else ", ".join(columns) or "none",
+            "rows_in": len(df) if isinstance(df, pd.DataFrame) else None,
+            "rows_out": len(result) if isinstance(result, pd.DataFrame) else None,
+            "seconds": elapsed,
+            "peak_rss_mb": peak_rss,
+            "peak_alloc_mb": peak_alloc,
+        })
+        return result
+
+    def run(self, name, steps):
+        # steps is a list of (step name, function)
+        df = self.frames[name]
+        for step_name, func in steps:
+            df = self.run_step(step_name, func, df)
+        return df
+
+    def print_report(self):
+        print(f"{'Step':<35} | {'Rows In':<10} | {'Rows Out':<10} | {'Seconds':<10} | {'Peak RSS (MB)':<15} | "
+              f"{'Peak Alloc (MB)':<15} | {'Columns Changed'}")
+        print("-" * 130)
+        for record in self.records:
+            rows_in = "-" if record["rows_in"] is None else record["rows_in"]
+            rows_out = "-" if record["rows_out"] is None else record["rows_out"]
+            peak_rss = "-" if record["peak_rss_mb"] is None else f"{record['peak_rss_mb']:.1f}"
+            peak_alloc = "-" if record["peak_alloc_mb"] is None else f"{record['peak_alloc_mb']:.1f}"
+            print(f"{record['step']:<35} | {rows_in:<10} | {rows_out:<10} | {record['seconds']:<10.3f} | "
+                  f"{peak_rss:<15} | {peak_alloc:<15} | {record['columns']}")
+
+        if MEMO_STATS:
+            print()
+            print_memo_stats()
@@ -0,0 +1,228 @@
+'''
+Lazy Polars backend for the Menu and MenuItem cleaning flows of
+CleaningRules.py. Each flow is one LazyFrame plan over the CSV scan, so the
+null filters and the column selection are pushed into the scan, and all
+plans (the cleaned tables and their change counts) are collected together
+once at the end on Polars' thread pool. The per-value rules (dates,
+occasions, dish names) run in Python once per distinct value inside the plan
+
+Usage: python PolarsBackend.py [data_dir] [--check] [--explain]
+'''
+
+import argparse
+import os
+import time
+
+import pandas as pd
+import polars as pl
+
+from CleaningRules import MENU_REQUIRED
+from CurrencyValidation import CURRENCY_TO_SYMBOL
+from DataCache import SCHEMAS
+from DateNormalization import normalize_dates
+from DishDeduplication import standardize_names
+from OccasionClustering import normalize_occasions
+from SQLBackend import NA_VALUES
+
+def scan_table(path):
+    """
+    Lazy scan of a raw CSV with the same values pandas reads: every column
+    as text, the pandas null strings as nulls, and the schema's integer
+    columns as Int64. Each row carries its position in the file.
+    """
+    scan = pl.scan_csv(path, infer_schema=False, null_values=sorted(NA_VALUES))
+    # Only reads the header
+    header = scan.collect_schema().names()
+    integers = [column for column, dtype in SCHEMAS.get(os.path.basename(path), {}).items()
+                if dtype == "Int64" and column in header]
+    return scan.with_row_index("row_position").with_columns(pl.col(integers).cast(pl.Float64).cast(pl.Int64))
+
+def per_value(expr, func):
+    """
+    Apply a pandas column function (e.g. `normalize_dates(...)[0]`) to the
+    column inside the plan; the function itself works per distinct value.
+    """
+    def apply(series):
+        result = func(series.to_pandas().astype(object))
+        return pl.Series(series.name, result.astype(object).where(result.notna(), None).tolist(), dtype=pl.String)
+    return expr.map_batches(apply, return_dtype=pl.String)
+
+def is_empty(column):
+    # Missing, empty or whitespace-only, as DataCache.blank_mask
+    return pl.col(column).is_null() | (pl.col(column).str.strip_chars() == "")
+
+def add_counts(totals, counts):
+    # Polars may hand a column over in several batches, so counts accumulate
+    if totals is not None:
+        for key, count in counts.items():
+            totals[key] = totals.get(key, 0) + count
+
+def menu_plan(scan, format_counts=None, match_counts=None):
+    """
+    CleaningRules.clean_menu as a lazy plan. The rows each date format and
+    occasion match method accounted for are added to `format_counts` and
+    `match_counts` when the plan is collected.
+    """
+    def iso_dates(dates):
+        dates, counts = normalize_dates(dates)
+        add_counts(format_counts, counts)
+        return dates
+
+    def occasions(values):
+        values, counts = normalize_occasions(values)
+        add_counts(match_counts, counts)
+        return values
+
+    return (
+        scan.filter(~pl.any_horizontal(is_empty(column) for column in MENU_REQUIRED))
+        .with_columns(per_value(pl.col("date"), iso_dates))
+        .filter(pl.col("date").is_not_null())
+        .filter(~(is_empty("currency") & is_empty("currency_symbol")))
+        .filter(pl.col("currency").is_null() | ~pl.col("currency").is_in(["Cents", "Pence"]))
+        .with_columns(pl.coalesce(
+            pl.col("currency").replace_strict(CURRENCY_TO_SYMBOL, default=None, return_dtype=pl.String),
+            pl.col("currency_symbol"),
+        ).alias("currency_symbol"))
+        .with_columns(per_value(pl.col("occasion"), occasions))
+    )
+
+def id_mapping_plan(dish_scan):
+    """
+    DishDeduplication.deduplicate_dishes as a lazy plan: the (id, first_id)
+    pairs mapping every duplicate dish id to the first id with the same
+    standardized name.
+    """
+    dishes = dish_scan.select("id", per_value(pl.col("name"), standardize_names))
+    return (
+        dishes.filter(pl.col("name").is_not_null())
+        .with_columns(pl.col("id").first().over("name").alias("first_id"))
+        .filter(pl.col("first_id") != pl.col("id"))
+        .select("id", "first_id")
+    )
+
+def menu_item_plan(scan, id_mapping):
+    """CleaningRules.clean_menu_item as a lazy plan; `id_mapping` is the plan of `id_mapping_plan`."""
+    return (
+        scan.filter(pl.col("price").is_not_null())
+        .join(id_mapping, left_on="dish_id", right_on="id", how="left", maintain_order="left")
+        .with_columns(pl.coalesce("first_id", "dish_id").alias("dish_id"))
+        .drop("first_id")
+    )
+
+def changes_plan(scan, cleaned, columns):
+    """
+    ChangeMetrics.column_changes as a lazy plan: one row per column with
+    the rows removed and the cells of the surviving rows modified and
+    unchanged. A value missing on both sides is unchanged.
+    """
+    original = scan.select("row_position", *[pl.col(column).alias(f"{column}_original") for column in columns])
+    compared = cleaned.select("row_position", *columns).join(original, on="row_position", how="left")
+    rows = scan.select(pl.len().alias("rows"))
+    return (
+        compared.select(
+            pl.len().alias("cleaned_rows"),
+            *[pl.col(column).ne_missing(pl.col(f"{column}_original")).sum().alias(column) for column in columns],
+        )
+        .join(rows, how="cross")
+        .unpivot(index=["cleaned_rows", "rows"], variable_name="column", value_name="cells_modified")
+        .select(
+            "column",
+            (pl.col("rows") - pl.col("cleaned_rows")).alias("rows_removed"),
+            "cells_modified",
+            (pl.col("cleaned_rows") - pl.col("cells_modified")).alias("cells_unchanged"),
+        )
+    )
+
+def build_plans(data_dir="./data", format_counts=None, match_counts=None):
+    """The lazy plans of both flows, keyed by name; nothing is read until they are collected."""
+    menu = scan_table(os.path.join(data_dir, "Menu.csv"))
+    menu_item = scan_table(os.path.join(data_dir, "MenuItem.csv"))
+    dish = scan_table(os.path.join(data_dir, "Dish.csv"))
+
+    menu_cleaned = menu_plan(menu, format_counts, match_counts)
+    menu_item_cleaned = menu_item_plan(menu_item, id_mapping_plan(dish))
+    return {
+        "menu": menu_cleaned,
+        "menu_changes": changes_plan(menu, menu_cleaned, ["date", "currency", "currency_symbol", "occasion"]),
+        "menu_item": menu_item_cleaned,
+        "menu_item_changes": changes_plan(menu_item, menu_item_cleaned, ["price", "dish_id"]),
+    }
+
+def collect_plans(plans):
+    # One collect for every plan, so the scans they share are read once
+    return dict(zip(plans, pl.collect_all(list(plans.values()))))
+
+def frames_match(expected, actual):
+    """
+    Columns in which the pandas frame `expected` and the Polars frame
+    `actual` differ, compared row by row in order. Numeric pandas columns
+    are compared as numbers, all others as text; missing values match
+    missing values. Returns ["<rows>"] when the row counts differ.
+    """
+    if len(expected) != len(actual):
+        return ["<rows>"]
+    mismatched = []
+    for column in expected.columns:
+        values = expected[column]
+        if pd.api.types.is_numeric_dtype(values) and not isinstance(values.dtype, pd.CategoricalDtype):
+            left = values.astype("Float64").to_numpy(dtype=float, na_value=float("nan"))
+            right = actual[column].cast(pl.Float64).to_numpy()
+            equal = (left == right) | (pd.isna(left) & pd.isna(right))
+        else:
+            left = values.astype(object).where(values.notna(), None).tolist()
+            right = actual[column].cast(pl.String).to_list()
+            equal = [a == b for a, b in zip(left, right)]
+        if not all(equal):
+            mismatched.append(column)
+    return mismatched
+
+def check_against_pandas(results, data_dir="./data"):
+    """Run CleaningRules' pandas flows on the same files and return {table: mismatched columns}."""
+    from CleaningRules import clean_menu, clean_menu_item
+    from DataCache import load_csv
+    from DishDeduplication import deduplicate_dishes
+
+    pd.set_option("mode.copy_on_write", True)
+    _, id_mapping = deduplicate_dishes(load_csv(os.path.join(data_dir, "Dish.csv")))
+    expected = {
+        "menu": clean_menu(load_csv(os.path.join(data_dir, "Menu.csv"))),
+        "menu_item": clean_menu_item(load_csv(os.path.join(data_dir, "MenuItem.csv")), id_mapping),
+    }
+    return {table: frames_match(frame, results[table]) for table, frame in expected.items()}
+
+def print_changes(changes):
+    print(f"{'Column':<20} | {'Rows Removed':<15} | {'Cells Modified':<15} | {'Cells Unchanged':<15}")
+    print("-" * 75)
+    for row in changes.iter_rows(named=True):
+        print(f"{row['column']:<20} | {row['rows_removed']:<15} | {row['cells_modified']:<15} | {row['cells_unchanged']:<15}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the Menu and MenuItem cleaning flows as lazy Polars plans")
+    parser.add_argument("data_dir", nargs="?", default="./data")
+    parser.add_argument("--check", action="store_true", help="Compare the results with the pandas flows row by row")
+    parser.add_argument("--explain", action="store_true", help="Print the optimized plans")
+    args = parser.parse_args()
+
+    format_counts, match_counts = {}, {}
+    plans = build_plans(args.data_dir, format_counts, match_counts)
+    if args.explain:
+        for name, plan in plans.items():
+            print(f"== {name}\n{plan.explain()}\n")
+
+    start = time.perf_counter()
+    results = collect_plans(plans)
+    elapsed = time.perf_counter() - start
+
+    print(f"{'Table':<10} | {'Cleaned Rows':<15}")
+    print("-" * 30)
+    print(f"{'Menu':<10} | {len(results['menu']):<15}")
+    print(f"{'MenuItem':<10} | {len(results['menu_item']):<15}")
+    print()
+    print_changes(pl.concat([results["menu_changes"], results["menu_item_changes"]]))
+    print(f"\nCollected in {elapsed:.3f}s on {pl.thread_pool_size()} threads")
+
+    if args.check:
+        print(f"\n{'Table':<10} | {'Matches pandas':<15}")
+        print("-" * 30)
+        for table, mismatched in check_against_pandas(results, args.data_dir).items():
+            print(f"{table:<10} | {'yes' if not mismatched else 'NO: ' + ', '.join(mismatched):<15}")
@@ -0,0 +1,415 @@
+'''
+Runs the integrity constraints and cleaning rules of ICViolations.py as SQL
+in an embedded, in-process engine, straight over the CSV (or Parquet) files
+instead of pandas frames. DuckDB is used when it is installed: it scans the
+files in parallel and spills to disk, so the tables never have to fit in
+memory. Otherwise the standard library's SQLite is used, into which every
+file is streamed once and kept in an on-disk database until the file changes.
+
+The per-value rules (date parsing, occasion matching, ISO date checks) run
+in Python once per distinct value and are joined back as lookup tables, the
+way ICRegistry.TableScan broadcasts them through the factorized codes
+
+Usage: python SQLBackend.py [data_dir] [--engine auto|duckdb|sqlite] [--database path]
+'''
+
+import argparse
+import csv
+import os
+import re
+import sys
+
+import pandas as pd
+
+from CleaningRules import MENU_CONSTRAINTS, MENU_ITEM_CONSTRAINTS, BAD_MAPPINGS, MENU_REQUIRED
+from CurrencyValidation import CURRENCY_TO_SYMBOL
+from DataCache import SCHEMAS
+from DateNormalization import normalize_dates, validate_iso_dates
+from DishDeduplication import deduplicate_dishes
+from ICRegistry import NotNull, ISODate, Domain, FunctionalDependency
+from OccasionClustering import normalize_occasions
+
+DEFAULT_DATABASE = "./data/.cache/tables.sqlite"
+BATCH_SIZE = 50_000
+
+# The strings pandas.read_csv reads as missing values, so both backends see the same nulls
+NA_VALUES = {
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+    "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+}
+
+# The characters str.strip removes from ASCII text
+WHITESPACE = "".join(chr(code) for code in range(128) if chr(code).isspace())
+
+def quote(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+def is_blank(column):
+    # Missing, empty or whitespace-only, as DataCache.blank_mask
+    return f"({column} IS NULL OR TRIM({column}, '{WHITESPACE}') = '')"
+
+def integer_columns(path):
+    # Columns the DataCache schema reads as nullable integers ("4.0" and "4" are the same dish_id)
+    return {column for column, dtype in SCHEMAS.get(os.path.basename(path), {}).items() if dtype == "Int64"}
+
+class SQLiteEngine:
+    """
+    Tables live in the SQLite database at `path`. Each registered file is
+    streamed in batches into a table with a `row_position` column holding
+    its 1-based row number, and is only loaded again when its size or
+    modification time changed.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path=DEFAULT_DATABASE):
+        import sqlite3
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA synchronous = OFF")
+        self.connection.execute("PRAGMA temp_store = MEMORY")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS _sources (name TEXT PRIMARY KEY, path TEXT, size INTEGER, mtime_ns INTEGER)"
+        )
+
+    def register(self, name, path):
+        stat = os.stat(path)
+        source = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        known = self.connection.execute("SELECT path, size, mtime_ns FROM _sources WHERE name = ?", (name,)).fetchone()
+        if known == source:
+            return
+
+        integers = integer_columns(path)
+        rows = read_rows(path)
+        header = next(rows)
+        definitions = ", ".join(f"{quote(column)} {'INTEGER' if column in integers else 'TEXT'}" for column in header)
+        insert = (f"INSERT INTO {quote(name)} ({', '.join(quote(column) for column in header)}) "
+                  f"VALUES ({', '.join('?' for _ in header)})")
+        with self.connection:
+            self.connection.execute(f"DROP TABLE IF EXISTS {quote(name)}")
+            self.connection.execute(f"CREATE TABLE {quote(name)} (row_position INTEGER PRIMARY KEY, {definitions})")
+            batch = []
+            for row in rows:
+                batch.append(row)
+                if len(batch) == BATCH_SIZE:
+                    self.connection.executemany(insert, batch)
+                    batch = []
+            self.connection.executemany(insert, batch)
+            self.connection.execute("INSERT OR REPLACE INTO _sources VALUES (?, ?, ?, ?)", (name,) + source)
+
+    def write_table(self, name, columns, rows):
+        """Replace the table `name` with `rows`; `columns` are (name, SQL type) pairs."""
+        definitions = ", ".join(f"{quote(column)} {sql_type}" for column, sql_type in columns)
+        with self.connection:
+            self.connection.execute(f"DROP TABLE IF EXISTS temp.{quote(name)}")
+            self.connection.execute(f"CREATE TEMP TABLE {quote(name)} ({definitions})")
+            self.connection.executemany(
+                f"INSERT INTO temp.{quote(name)} VALUES ({', '.join('?' for _ in columns)})", rows
+            )
+
+    def create_view(self, name, sql):
+        self.connection.execute(f"DROP VIEW IF EXISTS temp.{quote(name)}")
+        self.connection.execute(f"CREATE TEMP VIEW {quote(name)} AS {sql}")
+
+    def query(self, sql, params=()):
+        return self.connection.execute(sql, params).fetchall()
+
+    def columns(self, name):
+        return [description[0] for description in self.connection.execute(f"SELECT * FROM {quote(name)} LIMIT 0").description]
+
+    def close(self):
+        self.connection.close()
+
+class DuckDBEngine:
+    """
+    Every registered file is a view over DuckDB's parallel CSV or Parquet
+    scan, so nothing is loaded up front. CSV columns are read as text with
+    the pandas null strings, and the schema's integer columns as numbers.
+    """
+
+    name = "duckdb"
+
+    def __init__(self, threads=None):
+        import duckdb
+
+        self.connection = duckdb.connect()
+        if threads is not None:
+            self.connection.execute(f"SET threads = {int(threads)}")
+
+    def register(self, name, path):
+        literal = "'" + os.path.abspath(path).replace("'", "''") + "'"
+        if path.endswith(".parquet"):
+            scan = f"read_parquet({literal})"
+        else:
+            null_strings = ", ".join("'" + value.replace("'", "''") + "'" for value in sorted(NA_VALUES))
+            scan = f"read_csv({literal}, header = true, all_varchar = true, nullstr = [{null_strings}])"
+
+        integers = integer_columns(path)
+        header = [row[0] for row in self.connection.execute(f"DESCRIBE SELECT * FROM {scan}").fetchall()]
+        select = ", ".join(f"TRY_CAST({quote(column)} AS DOUBLE) AS {quote(column)}" if column in integers
+                           else quote(column) for column in header)
+        # The scan keeps the file order, so the row number is the row's position in the file
+        self.create_view(name, f"SELECT row_number() OVER () AS row_position, {select} FROM {scan}")
+
+    def write_table(self, name, columns, rows):
+        # Row by row inserts are slow in DuckDB, so the rows go in as one registered frame
+        frame = pd.DataFrame(list(rows), columns=[column for column, _ in columns], dtype=object)
+        self.connection.register("_rows", frame)
+        select = ", ".join(f"CAST({quote(column)} AS {sql_type}) AS {quote(column)}" for column, sql_type in columns)
+        self.connection.execute(f"CREATE OR REPLACE TEMP TABLE {quote(name)} AS SELECT {select} FROM _rows")
+        self.connection.unregister("_rows")
+
+    def create_view(self, name, sql):
+        self.connection.execute(f"CREATE OR REPLACE TEMP VIEW {quote(name)} AS {sql}")
+
+    def query(self, sql, params=()):
+        return self.connection.execute(sql, params).fetchall()
+
+    def columns(self, name):
+        return [row[0] for row in self.connection.execute(f"DESCRIBE {quote(name)}").fetchall()]
+
+    def close(self):
+        self.connection.close()
+
+def read_rows(path):
+    """
+    Yield the header and then every row of a CSV or Parquet file, with the
+    pandas null strings of a CSV as None.
+    """
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as parquet
+
+        file = parquet.ParquetFile(path)
+        yield file.schema_arrow.names
+        for batch in file.iter_batches(BATCH_SIZE):
+            yield from zip(*(column.to_pylist() for column in batch.columns))
+        return
+
+    with open(path, "r", encoding="utf-8", newline="") as file:
+        reader = csv.reader(file)
+        yield next(reader)
+        for row in reader:
+            yield [None if value in NA_VALUES else value for value in row]
+
+def connect(engine="auto", database=DEFAULT_DATABASE):
+    # DuckDB when available ("auto"), else SQLite
+    if engine in ("auto", "duckdb"):
+        try:
+            return DuckDBEngine()
+        except ImportError:
+            if engine == "duckdb":
+                raise
+    return SQLiteEngine(database)
+
+class SQLBackend:
+    """
+    Evaluates the ICRegistry constraints over the tables and views of an
+    engine. Row-level constraints on the same table are fused into one
+    aggregate query, so each table is scanned once per call.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.domains = {}
+
+    def register(self, name, path):
+        self.engine.register(name, path)
+
+    def lookup_table(self, key, values, columns):
+        """
+        Temporary table of Python-side results. The name comes from `key`
+        (what the table holds), so computing the same lookup again replaces
+        the table instead of adding one per call.
+        """
+        name = "_lookup_" + re.sub(r"\W+", "_", key)
+        self.engine.write_table(name, columns, values)
+        return name
+
+    def distinct_values(self, table, column):
+        rows = self.engine.query(f"SELECT DISTINCT {quote(column)} FROM {quote(table)} WHERE {quote(column)} IS NOT NULL")
+        return pd.Series([row[0] for row in rows], dtype=object)
+
+    def value_map(self, table, column, func):
+        """
+        Table (raw, value) of `func` applied once to every distinct non-null
+        value of the column; `func` maps a Series to a Series of results.
+        """
+        raw = self.distinct_values(table, column)
+        mapped = func(raw).astype(object).where(lambda values: values.notna(), None)
+        return self.lookup_table(f"map_{table}_{column}", zip(raw.tolist(), mapped.tolist()),
+                                 [("raw", "TEXT"), ("value", "TEXT")])
+
+    def violation_condition(self, constraint, table):
+        """SQL condition that is true for each violating row, for the row-level constraints."""
+        column = quote(constraint.columns[0])
+        if isinstance(constraint, NotNull):
+            return f"{column} IS NULL OR CAST({column} AS TEXT) = ''"
+        if isinstance(constraint, ISODate):
+            values = self.distinct_values(table, constraint.columns[0])
+            _, invalid = validate_iso_dates(values)
+            lookup = self.lookup_table(f"invalid_{table}_{constraint.name}",
+                                       ((value,) for value in values[invalid.to_numpy()]), [("value", "TEXT")])
+            return f"{column} IS NULL OR {column} IN (SELECT value FROM {quote(lookup)})"
+        if isinstance(constraint, Domain):
+            if constraint.name not in self.domains:
+                values = constraint.values() if callable(constraint.values) else constraint.values
+                self.domains[constraint.name] = self.lookup_table(f"domain_{constraint.name}",
+                                                                  ((value,) for value in values), [("value", "TEXT")])
+            lookup = self.domains[constraint.name]
+            return f"{column} IS NULL OR {column} NOT IN (SELECT value FROM {quote(lookup)})"
+        raise NotImplementedError(f"No SQL translation for {type(constraint).__name__} {constraint.name!r}")
+
+    def dependency_violations(self, constraint, table, reference=None):
+        """
+        Count the rows violating a FunctionalDependency: repeats of a
+        determinant value whose dependent value is missing or differs from
+        the one at its first occurrence, as ICRegistry evaluates it.
+        """
+        determinant, dependent = quote(constraint.determinant), quote(constraint.dependent)
+        if constraint.reference_key:
+            key = quote(constraint.reference_key)
+            # The last reference row wins for repeated keys
+            rows = (
+                f"SELECT t.row_position, t.{determinant} AS determinant, l.dependent FROM {quote(table)} t "
+                f"JOIN (SELECT key, dependent FROM (SELECT {key} AS key, {dependent} AS dependent, "
+                f"row_number() OVER (PARTITION BY {key} ORDER BY row_position DESC) AS rank "
+                f"FROM {quote(reference)}) WHERE rank = 1) l ON t.{determinant} = l.key"
+            )
+        else:
+            rows = (f"SELECT row_position, {determinant} AS determinant, {dependent} AS dependent "
+                    f"FROM {quote(table)} WHERE {determinant} IS NOT NULL")
+        sql = (
+            f"SELECT COUNT(*) FROM (SELECT dependent, "
+            f"row_number() OVER (PARTITION BY determinant ORDER BY row_position) AS occurrence, "
+            f"first_value(dependent) OVER (PARTITION BY determinant ORDER BY row_position) AS first_dependent "
+            f"FROM ({rows})) WHERE occurrence > 1 "
+            f"AND (dependent IS NULL OR first_dependent IS NULL OR dependent <> first_dependent)"
+        )
+        return self.engine.query(sql)[0][0]
+
+    def count_violations(self, constraints, table, reference=None):
+        """
+        Violation count of each constraint over `table`, like
+        `ICRegistry.count_violations`. `reference` names the table the
+        FunctionalDependency lookups go through.
+        """
+        counts, conditions = {}, {}
+        for constraint in constraints:
+            if isinstance(constraint, FunctionalDependency):
+                counts[constraint.name] = self.dependency_violations(constraint, table, reference)
+            else:
+                conditions[constraint.name] = self.violation_condition(constraint, table)
+
+        if conditions:
+            sums = ", ".join(f"COALESCE(SUM(CASE WHEN {condition} THEN 1 ELSE 0 END), 0)"
+                             for condition in conditions.values())
+            totals = self.engine.query(f"SELECT {sums} FROM {quote(table)}")[0]
+            counts.update(zip(conditions, (int(total) for total in totals)))
+        return {constraint.name: counts[constraint.name] for constraint in constraints}
+
+    def replaced_select(self, table, replacements, alias="t"):
+        # SELECT list of every column of `table`, with some columns replaced by expressions
+        return ", ".join(f"{replacements[column]} AS {quote(column)}" if column in replacements
+                         else f"{alias}.{quote(column)}" for column in self.engine.columns(table))
+
+    def clean_menu(self, table="menu"):
+        """
+        Create the cleaned Menu views of ICViolations.py's sections, each
+        built from the raw table as the pandas pipeline does. Returns
+        {view: constraints checked on it}.
+        """
+        missing = " OR ".join(is_blank(f"t.{quote(column)}") for column in MENU_REQUIRED)
+        self.engine.create_view("menu_missing", f"SELECT t.* FROM {quote(table)} t WHERE NOT ({missing})")
+
+        dates = self.value_map(table, "date", lambda values: normalize_dates(values)[0])
+        self.engine.create_view("menu_dates", (
+            f"SELECT {self.replaced_select(table, {'date': 'd.value'})} FROM {quote(table)} t "
+            f"JOIN {quote(dates)} d ON t.{quote('date')} = d.raw WHERE d.value IS NOT NULL"
+        ))
+
+        symbols = self.lookup_table("currency_symbols", CURRENCY_TO_SYMBOL.items(),
+                                    [("currency", "TEXT"), ("symbol", "TEXT")])
+        self.engine.create_view("menu_currency", (
+            f"SELECT {self.replaced_select(table, {'currency_symbol': 'COALESCE(s.symbol, t.currency_symbol)'})} "
+            f"FROM {quote(table)} t LEFT JOIN {quote(symbols)} s ON t.currency = s.currency "
+            f"WHERE NOT ({is_blank('t.currency')} AND {is_blank('t.currency_symbol')}) "
+            f"AND (t.currency IS NULL OR t.currency NOT IN ('Cents', 'Pence'))"
+        ))
+
+        occasions = self.value_map(table, "occasion", lambda values: normalize_occasions(values)[0])
+        self.engine.create_view("menu_occasions", (
+            f"SELECT {self.replaced_select(table, {'occasion': 'o.value'})} FROM {quote(table)} t "
+            f"LEFT JOIN {quote(occasions)} o ON t.occasion = o.raw"
+        ))
+        return {"menu_missing": MENU_CONSTRAINTS[:3], "menu_dates": MENU_CONSTRAINTS[3:4],
+                "menu_currency": MENU_CONSTRAINTS[4:5], "menu_occasions": MENU_CONSTRAINTS[5:6]}
+
+    def deduplicate_dishes(self, table="dish"):
+        """
+        Standardize the dish names in Python and write the standardized
+        Dish table and the duplicate id mapping back as `dishes` and
+        `dish_id_mapping`.
+        """
+        rows = self.engine.query(f"SELECT row_position, id, name FROM {quote(table)} ORDER BY row_position")
+        dish_df = pd.DataFrame(rows, columns=["row_position", "id", "name"]).astype({"id": "Int64"})
+        dish_df, id_mapping = deduplicate_dishes(dish_df)
+
+        dishes = zip(dish_df["row_position"].tolist(), dish_df["id"].astype(object).where(dish_df["id"].notna(), None),
+                     dish_df["name"].astype(object).where(dish_df["name"].notna(), None))
+        self.engine.write_table("dishes", [("row_position", "INTEGER"), ("id", "INTEGER"), ("name", "TEXT")], dishes)
+        self.engine.write_table("dish_id_mapping", [("id", "INTEGER"), ("first_id", "INTEGER")],
+                                ((int(key), int(value)) for key, value in id_mapping.items()))
+        return id_mapping
+
+    def clean_menu_item(self, table="menu_item", dish_table="dish"):
+        """Create the cleaned MenuItem views; returns {view: constraints checked on it}."""
+        self.engine.create_view("menu_item_price", f"SELECT t.* FROM {quote(table)} t WHERE NULLIF(t.price, '') IS NOT NULL")
+        self.deduplicate_dishes(dish_table)
+        self.engine.create_view("menu_item_dishes", (
+            f"SELECT {self.replaced_select(table, {'dish_id': 'COALESCE(m.first_id, t.dish_id)'})} "
+            f"FROM {quote(table)} t LEFT JOIN dish_id_mapping m ON t.dish_id = m.id"
+        ))
+        return {"menu_item_price": MENU_ITEM_CONSTRAINTS, "menu_item_dishes": [BAD_MAPPINGS]}
+
+    def ic_report(self, data_dir="./data"):
+        """
+        The Original and Cleaned violation counts of every constraint in
+        ICViolations.py, as {constraint: {"Original": n, "Cleaned": n}}.
+        """
+        for name, file_name in [("menu", "Menu.csv"), ("menu_item", "MenuItem.csv"), ("dish", "Dish.csv")]:
+            self.register(name, os.path.join(data_dir, file_name))
+
+        report = {}
+        menu_views = self.clean_menu("menu")
+        menu_item_views = self.clean_menu_item("menu_item", "dish")
+
+        for name, count in self.count_violations(MENU_CONSTRAINTS, "menu").items():
+            report.setdefault(name, {})["Original"] = count
+        for name, count in self.count_violations(MENU_ITEM_CONSTRAINTS + [BAD_MAPPINGS], "menu_item", "dishes").items():
+            report.setdefault(name, {})["Original"] = count
+        for view, constraints in {**menu_views, **menu_item_views}.items():
+            for name, count in self.count_violations(constraints, view, "dishes").items():
+                report[name]["Cleaned"] = count
+        return report
+
+def print_report(report):
+    print(f"{'Column':<10} | {'Original Violations':<15} | {'Cleaned Violations':<15}")
+    print("-" * 45)
+    for check, counts in report.items():
+        print(f"{check:<10} | {counts['Original']:<15} | {counts['Cleaned']:<15}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the IC checks of ICViolations.py as SQL over the CSV files")
+    parser.add_argument("data_dir", nargs="?", default="./data")
+    parser.add_argument("--engine", choices=["auto", "duckdb", "sqlite"], default="auto")
+    parser.add_argument("--database", default=DEFAULT_DATABASE, help="SQLite database the CSVs are loaded into")
+    args = parser.parse_args()
+
+    engine = connect(args.engine, args.database)
+    print(f"Engine: {engine.name}", file=sys.stderr)
+    try:
+        print_report(SQLBackend(engine).ic_report(args.data_dir))
+    finally:
+        engine.close()
@@ -0,0 +1,258 @@
+'''
+Per-step instrumentation of the annotated scripts. Every `@begin/@end`
+block becomes a profiled step recording wall and CPU time, the rows in and
+out of the frames it rebinds, peak RSS and, with memory tracing on, the
+peak and net Python allocations. Records are appended to a JSON Lines log
+
+The instrumented script keeps its file name and line numbers, so cProfile
+output and `py-spy record -- python StepProfiler.py ...` point at the
+original annotated lines.
+
+Usage: python StepProfiler.py script [--log path] [--trace-memory] [--cprofile step ...]
+'''
+
+import argparse
+import cProfile
+import json
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import pandas as pd
+
+from Pipeline import reset_peak_rss, step_peak_rss_mb
+from WorkflowAnnotations import comment_tags, parse_blocks
+
+DEFAULT_LOG = "./data/.cache/profile/steps.jsonl"
+
+class CProfileHook:
+    """
+    Runs cProfile inside the named steps and dumps one pstats file per step
+    run to `output_dir`, e.g. `To_ISO_Format.prof` (then `To_ISO_Format.2.prof`
+    if the step runs again). Only one step is profiled at a time.
+    """
+
+    def __init__(self, steps, output_dir="./data/.cache/profile"):
+        self.steps = set(steps)
+        self.output_dir = output_dir
+        self.active = None
+        self.runs = {}
+
+    def begin(self, name):
+        if name in self.steps and self.active is None:
+            self.active = (name, cProfile.Profile())
+            self.active[1].enable()
+
+    def end(self, name, record):
+        if self.active is None or self.active[0] != name:
+            return
+        profile = self.active[1]
+        profile.disable()
+        self.active = None
+
+        self.runs[name] = self.runs.get(name, 0) + 1
+        suffix = "" if self.runs[name] == 1 else f".{self.runs[name]}"
+        os.makedirs(self.output_dir, exist_ok=True)
+        record["cprofile"] = os.path.join(self.output_dir, f"{name}{suffix}.prof")
+        profile.dump_stats(record["cprofile"])
+
+class StepProfiler:
+    """
+    Collects one record per step. Steps nest; a step's peak RSS and peak
+    allocation include the peaks of its nested steps but nothing reached
+    before the step began (the peak RSS is None where it cannot be reset,
+    see Pipeline.reset_peak_rss). With `log_path` every record is
+    appended to that JSON Lines file as soon as its step ends. Each hook's
+    `begin(name)` and `end(name, record)` are called at the step boundaries.
+    """
+
+    def __init__(self, script=None, log_path=None, trace_memory=False, hooks=(), descriptions=None):
+        self.script = script
+        self.log_path = log_path
+        self.trace_memory = trace_memory
+        self.hooks = list(hooks)
+        self.descriptions = descriptions or {}
+        self.run_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}"
+        self.records = []
+        self.stack = []
+        self.rss_reset = reset_peak_rss()
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        if log_path is not None:
+            os.makedirs(os.path.dirname(os.path.abspath(log_path)), exist_ok=True)
+
+    def begin(self, name, namespace=None):
+        if self.trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if self.stack:
+                self.stack[-1]["peak"] = max(self.stack[-1]["peak"], peak)
+            tracemalloc.reset_peak()
+        else:
+            current = 0
+        if self.rss_reset:
+            if self.stack:
+                self.stack[-1]["peak_rss"] = max(self.stack[-1]["peak_rss"], step_peak_rss_mb())
+            reset_peak_rss()
+
+        for hook in self.hooks:
+            hook.begin(name)
+        self.stack.append({
+            "name": name,
+            "frames": frame_rows(namespace),
+            "allocated": current,
+            "peak": current,
+            "peak_rss": 0,
+            "start_time": time.time(),
+            "start": time.perf_counter(),
+            "start_cpu": time.process_time(),
+        })
+
+    def end(self, name, namespace=None, error=None):
+        if not self.stack or self.stack[-1]["name"] != name:
+            raise ValueError(f"Step {name} ended while {self.stack[-1]['name'] if self.stack else 'no step'} is open")
+        state = self.stack.pop()
+        wall = time.perf_counter() - state["start"]
+        cpu = time.process_time() - state["start_cpu"]
+
+        frames = changed_frames(state["frames"], frame_rows(namespace))
+        rows_in, rows_out = next(iter(frames.values()), (None, None))
+        record = {
+            "run_id": self.run_id,
+            "script": self.script,
+            "step": name,
+            "desc": self.descriptions.get(name, ""),
+            "parent": self.stack[-1]["name"] if self.stack else None,
+            "depth": len(self.stack),
+            "start_time": state["start_time"],
+            "wall_seconds": wall,
+            "cpu_seconds": cpu,
+            "rows_in": rows_in,
+            "rows_out": rows_out,
+            "frames": frames,
+            "peak_rss_mb": None,
+        }
+        if self.rss_reset:
+            record["peak_rss_mb"] = max(state["peak_rss"], step_peak_rss_mb())
+            if self.stack:
+                self.stack[-1]["peak_rss"] = max(self.stack[-1]["peak_rss"], record["peak_rss_mb"])
+        if self.trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            peak = max(state["peak"], peak)
+            record["peak_alloc_mb"] = (peak - state["allocated"]) / (1024 * 1024)
+            record["net_alloc_mb"] = (current - state["allocated"]) / (1024 * 1024)
+            if self.stack:
+                self.stack[-1]["peak"] = max(self.stack[-1]["peak"], peak)
+        if error is not None:
+            record["error"] = repr(error)
+
+        for hook in self.hooks:
+            hook.end(name, record)
+        self.records.append(record)
+        if self.log_path is not None:
+            with open(self.log_path, "a", encoding="utf-8") as file:
+                file.write(json.dumps(record) + "\n")
+        return record
+
+    def abort(self, error, namespace=None):
+        # Close every open step, innermost first, recording the error
+        while self.stack:
+            self.end(self.stack[-1]["name"], namespace, error)
+
+    @contextmanager
+    def step(self, name, namespace=None):
+        """Profile a `with` block as a step, for code outside the annotated scripts."""
+        self.begin(name, namespace)
+        try:
+            yield
+        except BaseException as error:
+            self.end(name, namespace, error)
+            raise
+        self.end(name, namespace)
+
+    def print_report(self):
+        print(f"{'Step':<40} | {'Wall (s)':<10} | {'CPU (s)':<10} | {'Rows In':<10} | {'Rows Out':<10} | "
+              f"{'Peak RSS (MB)':<15} | {'Peak Alloc (MB)':<15}")
+        print("-" * 125)
+        for record in sorted(self.records, key=lambda record: record["start_time"]):
+            step = "  " * record["depth"] + record["step"]
+            rows_in = "-" if record["rows_in"] is None else record["rows_in"]
+            rows_out = "-" if record["rows_out"] is None else record["rows_out"]
+            peak_rss = "-" if record["peak_rss_mb"] is None else f"{record['peak_rss_mb']:.1f}"
+            peak_alloc = f"{record['peak_alloc_mb']:.1f}" if "peak_alloc_mb" in record else "-"
+            print(f"{step:<40} | {record['wall_seconds']:<10.3f} | {record['cpu_seconds']:<10.3f} | {rows_in:<10} | "
+                  f"{rows_out:<10} | {peak_rss:<15} | {peak_alloc:<15}")
+
+def frame_rows(namespace):
+    # Identity and row count of every DataFrame bound in the namespace
+    if namespace is None:
+        return {}
+    return {name: (id(value), len(value)) for name, value in list(namespace.items())
+            if isinstance(value, pd.DataFrame)}
+
+def changed_frames(before, after):
+    """
+    {name: [rows_in, rows_out]} for the frames a step (re)bound. rows_in is
+    None for a name the step bound for the first time.
+    """
+    return {
+        name: [before[name][1] if name in before else None, rows]
+        for name, (identity, rows) in after.items()
+        if name not in before or before[name][0] != identity
+    }
+
+def instrument(source, profiler_name="__profiler__"):
+    """
+    Replace every `@begin`/`@end` comment line with a call to the profiler
+    at the comment's indentation, keeping the comment and every line number.
+    """
+    lines = source.splitlines(keepends=True)
+    for position, line in enumerate(lines):
+        calls = []
+        for tag, value in comment_tags(line):
+            if tag in ("begin", "end") and value:
+                calls.append(f'{profiler_name}.{tag}({value.split()[0]!r}, globals())')
+        if calls:
+            indent = line[:len(line) - len(line.lstrip())]
+            newline = "\n" if line.endswith("\n") else ""
+            lines[position] = f"{indent}{'; '.join(calls)}  {line.strip()}{newline}"
+    return "".join(lines)
+
+def run_script(path, log_path=None, trace_memory=False, hooks=()):
+    """
+    Run an annotated script as `__main__` with every block profiled, and
+    return the profiler. If the script fails, its open steps are closed with
+    the error recorded before the error is raised again.
+    """
+    with open(path, "r", encoding="utf-8") as file:
+        source = file.read()
+    descriptions = {block.name: block.desc for root in parse_blocks(source) for block in root.walk()}
+
+    profiler = StepProfiler(os.path.basename(path), log_path, trace_memory, hooks, descriptions)
+    code = compile(instrument(source), path, "exec")
+    namespace = {"__name__": "__main__", "__file__": path, "__profiler__": profiler}
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(path)))
+    try:
+        exec(code, namespace)
+    except BaseException as error:
+        profiler.abort(error, namespace)
+        raise
+    finally:
+        sys.path.pop(0)
+    return profiler
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run an annotated script with every @begin/@end block profiled")
+    parser.add_argument("script")
+    parser.add_argument("--log", default=DEFAULT_LOG, help="JSON Lines file the step records are appended to")
+    parser.add_argument("--trace-memory", action="store_true", help="Record peak and net allocations (slower)")
+    parser.add_argument("--cprofile", nargs="+", default=[], metavar="STEP", help="Steps to run under cProfile")
+    parser.add_argument("--cprofile-dir", default="./data/.cache/profile")
+    args = parser.parse_args()
+
+    hooks = [CProfileHook(args.cprofile, args.cprofile_dir)] if args.cprofile else []
+    profiler = run_script(args.script, args.log, args.trace_memory, hooks)
+    print()
+    profiler.print_report()
@@ -0,0 +1,277 @@
+'''
+Compressed bitmaps of the rows violating each integrity constraint, stored
+next to the IC report so that drill-downs ("which rows violate date AND
+currency?") are bitmap operations and row lookups instead of re-running the
+checks over the whole table
+
+Usage: python ViolationBitmaps.py [--dir dir] summary
+       python ViolationBitmaps.py [--dir dir] rows "date & currency" [--side Original] [--limit n]
+'''
+
+import argparse
+import json
+import os
+import re
+import sys
+from datetime import datetime, timezone
+
+import numpy as np
+
+DEFAULT_DIR = "./data/.cache/violations"
+# Containers holding more positions than this are stored as 65536-bit bitsets
+ARRAY_LIMIT = 4096
+
+class Bitmap:
+    """
+    Set of row positions split into roaring-style containers: the high 16
+    bits of a position select a container, which holds the low 16 bits
+    either as a sorted uint16 array (sparse) or as a 1024-word uint64
+    bitset (dense, more than ARRAY_LIMIT positions).
+    """
+
+    def __init__(self, containers=None):
+        # {high bits: uint16 array or uint64 bitset}
+        self.containers = containers or {}
+
+    @classmethod
+    def from_positions(cls, positions):
+        positions = np.unique(np.asarray(positions, dtype=np.int64))
+        if len(positions) and (positions[0] < 0 or positions[-1] >= 1 << 32):
+            raise ValueError("Row positions must be in [0, 2**32)")
+        high = positions >> 16
+        starts = np.flatnonzero(np.r_[True, high[1:] != high[:-1]]) if len(positions) else []
+        ends = list(starts[1:]) + [len(positions)]
+        return cls({int(high[start]): normalize((positions[start:end] & 0xFFFF).astype(np.uint16))
+                    for start, end in zip(starts, ends)})
+
+    @classmethod
+    def from_mask(cls, mask, index=None):
+        """
+        Bitmap of the True rows of a boolean mask. With an integer `index`
+        (e.g. the labels of a frame cleaned from a loaded table) the rows are
+        identified by their labels, otherwise by their positions.
+        """
+        mask = np.asarray(mask, dtype=bool)
+        if index is not None and index.dtype.kind in "iu":
+            return cls.from_positions(index.to_numpy()[mask])
+        return cls.from_positions(np.flatnonzero(mask))
+
+    def to_positions(self):
+        if not self.containers:
+            return np.array([], dtype=np.int64)
+        return np.concatenate([(key << 16) + low_bits(self.containers[key]) for key in sorted(self.containers)])
+
+    def __len__(self):
+        return sum(cardinality(container) for container in self.containers.values())
+
+    def __contains__(self, position):
+        container = self.containers.get(int(position) >> 16)
+        if container is None:
+            return False
+        low = int(position) & 0xFFFF
+        if container.dtype == np.uint16:
+            index = np.searchsorted(container, low)
+            return bool(index < len(container) and container[index] == low)
+        return bool((int(container[low >> 6]) >> (low & 63)) & 1)
+
+    def combine(self, other, operation):
+        keys = {"and": self.containers.keys() & other.containers.keys(),
+                "or": self.containers.keys() | other.containers.keys(),
+                "andnot": self.containers.keys()}[operation]
+        containers = {}
+        for key in keys:
+            left, right = self.containers.get(key), other.containers.get(key)
+            if right is None:
+                result = left if operation != "and" else None
+            elif left is None:
+                result = right if operation == "or" else None
+            else:
+                result = combine_containers(left, right, operation)
+            if result is not None and cardinality(result):
+                containers[key] = result
+        return Bitmap(containers)
+
+    def __and__(self, other):
+        return self.combine(other, "and")
+
+    def __or__(self, other):
+        return self.combine(other, "or")
+
+    def __sub__(self, other):
+        return self.combine(other, "andnot")
+
+    @property
+    def nbytes(self):
+        return sum(container.nbytes for container in self.containers.values())
+
+    def to_arrays(self):
+        # (keys, kinds, lengths, data): kind 0 is an array container, 1 a bitset stored as 4096 uint16 words
+        keys = sorted(self.containers)
+        kinds = np.array([self.containers[key].dtype == np.uint64 for key in keys], dtype=np.uint8)
+        data = [self.containers[key].view(np.uint16) for key in keys]
+        lengths = np.array([len(part) for part in data], dtype=np.uint32)
+        return (np.array(keys, dtype=np.uint32), kinds, lengths,
+                np.concatenate(data) if data else np.array([], dtype=np.uint16))
+
+    @classmethod
+    def from_arrays(cls, keys, kinds, lengths, data):
+        containers, offset = {}, 0
+        for key, kind, length in zip(keys, kinds, lengths):
+            part = data[offset:offset + length]
+            containers[int(key)] = part.view(np.uint64) if kind else part
+            offset += length
+        return cls(containers)
+
+def cardinality(container):
+    if container.dtype == np.uint16:
+        return len(container)
+    return int(np.unpackbits(container.view(np.uint8)).sum())
+
+def low_bits(container):
+    if container.dtype == np.uint16:
+        return container.astype(np.int64)
+    return np.flatnonzero(np.unpackbits(container.view(np.uint8), bitorder="little")).astype(np.int64)
+
+def to_bitset(container):
+    if container.dtype == np.uint64:
+        return container
+    bits = np.zeros(1 << 16, dtype=bool)
+    bits[container] = True
+    return np.packbits(bits, bitorder="little").view(np.uint64)
+
+def normalize(container):
+    # Sparse containers as sorted arrays, dense ones as bitsets
+    if container.dtype == np.uint16 and len(container) > ARRAY_LIMIT:
+        return to_bitset(container)
+    if container.dtype == np.uint64 and cardinality(container) <= ARRAY_LIMIT:
+        return low_bits(container).astype(np.uint16)
+    return container
+
+def combine_containers(left, right, operation):
+    if left.dtype == np.uint16 and right.dtype == np.uint16:
+        func = {"and": np.intersect1d, "or": np.union1d, "andnot": np.setdiff1d}[operation]
+        return normalize(func(left, right, assume_unique=True) if operation != "or" else func(left, right))
+    left, right = to_bitset(left), to_bitset(right)
+    words = {"and": left & right, "or": left | right, "andnot": left & ~right}[operation]
+    return normalize(words)
+
+def save_report(directory, results, bitmaps, tables):
+    """
+    Write the IC report and the violation bitmaps to `directory`: one
+    `report.json` with the counts and the table of every bitmap, and one
+    `bitmaps.npz` with the bitmap containers. `results` and `bitmaps` are
+    keyed by (constraint, side) as in ICScheduler; `tables` maps each table
+    name to its {"path", "rows", "constraints"}. The size and mtime of each
+    table's file are recorded so drill-downs can tell when it changed.
+    """
+    os.makedirs(directory, exist_ok=True)
+    table_of = {name: table for table, info in tables.items() for name in info["constraints"]}
+
+    entries, arrays = [], {}
+    for (name, side), bitmap in bitmaps.items():
+        key = f"{side}:{name}"
+        for suffix, values in zip(["keys", "kinds", "lengths", "data"], bitmap.to_arrays()):
+            arrays[f"{key}.{suffix}"] = values
+        entries.append({"constraint": name, "side": side, "table": table_of.get(name),
+                        "violations": int(results.get((name, side), len(bitmap))), "bytes": bitmap.nbytes})
+
+    np.savez_compressed(os.path.join(directory, "bitmaps.npz"), **arrays)
+    report = {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "tables": {table: {"path": info["path"], "rows": info["rows"], **file_stamp(info["path"])}
+                   for table, info in tables.items()},
+        "bitmaps": entries,
+    }
+    with open(os.path.join(directory, "report.json"), "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=1)
+
+def file_stamp(path):
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+def stale_reason(table):
+    """Why the file of a saved `table` entry no longer matches the report, or None when it still does."""
+    if not os.path.exists(table["path"]):
+        return f"{table['path']} no longer exists"
+    if "size" not in table or file_stamp(table["path"]) != {"size": table["size"], "mtime_ns": table["mtime_ns"]}:
+        return f"{table['path']} changed since the report was saved"
+    return None
+
+def load_report(directory=DEFAULT_DIR):
+    """The saved report and its bitmaps, keyed by (constraint, side)."""
+    with open(os.path.join(directory, "report.json"), "r", encoding="utf-8") as file:
+        report = json.load(file)
+    with np.load(os.path.join(directory, "bitmaps.npz")) as arrays:
+        bitmaps = {
+            (entry["constraint"], entry["side"]): Bitmap.from_arrays(
+                *(arrays[f"{entry['side']}:{entry['constraint']}.{suffix}"]
+                  for suffix in ["keys", "kinds", "lengths", "data"])
+            )
+            for entry in report["bitmaps"]
+        }
+    return report, bitmaps
+
+def evaluate_expression(expression, bitmaps, side):
+    """
+    Evaluate e.g. "date & currency", "iso date | occasion" or "date - currency"
+    (violates date but not currency) left to right over one side's bitmaps.
+    """
+    parts = re.split(r"\s*([&|-])\s*", expression.strip())
+    names = parts[::2]
+    unknown = [name for name in names if (name, side) not in bitmaps]
+    if unknown:
+        known = sorted({name for name, bitmap_side in bitmaps if bitmap_side == side})
+        raise KeyError(f"No {side} bitmaps for {unknown}; known constraints are {known}")
+
+    result = bitmaps[(names[0], side)]
+    for operator, name in zip(parts[1::2], names[1:]):
+        other = bitmaps[(name, side)]
+        result = {"&": result & other, "|": result | other, "-": result - other}[operator]
+    return result, names
+
+def print_summary(report):
+    print(f"{'Constraint':<20} | {'Side':<10} | {'Table':<10} | {'Violations':<12} | {'Bitmap Bytes':<12}")
+    print("-" * 75)
+    for entry in report["bitmaps"]:
+        print(f"{entry['constraint']:<20} | {entry['side']:<10} | {entry['table'] or '-':<10} | "
+              f"{entry['violations']:<12} | {entry['bytes']:<12}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Drill into the rows behind the IC report")
+    parser.add_argument("--dir", default=DEFAULT_DIR, help="Directory the report and bitmaps were saved to")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("summary", help="List the saved bitmaps")
+    rows_parser = commands.add_parser("rows", help="Show the rows matching a bitmap expression")
+    rows_parser.add_argument("expression", help='e.g. "date & currency", "iso date | occasion", "date - currency"')
+    rows_parser.add_argument("--side", default="Original", choices=["Original", "Cleaned"])
+    rows_parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    report, bitmaps = load_report(args.dir)
+    if args.command == "summary":
+        print_summary(report)
+    else:
+        from DataCache import load_csv
+
+        result, names = evaluate_expression(args.expression, bitmaps, args.side)
+        tables = {entry["table"] for entry in report["bitmaps"] if entry["constraint"] in names}
+        if len(tables) != 1:
+            raise SystemExit(f"The constraints of {args.expression!r} are checked on different tables: {sorted(tables)}")
+        table = report["tables"][tables.pop()]
+        # The bitmaps hold row positions, which only point at the right rows of the file they were built from
+        reason = stale_reason(table)
+        if reason is not None:
+            raise SystemExit(f"{reason}; re-run ICViolations.py to rebuild the bitmaps")
+        df = load_csv(table["path"])
+        if len(df) != table["rows"]:
+            raise SystemExit(f"{table['path']} has {len(df)} rows, the report was built from {table['rows']}")
+
+        positions = result.to_positions()
+        try:
+            print(f"{len(positions)} of {table['rows']} rows of {table['path']} match {args.expression!r} ({args.side})")
+            print(df.iloc[positions[:args.limit]])
+            sys.stdout.flush()
+        except BrokenPipeError:
+            # e.g. piped into `head`; send what is left to /dev/null so the exit flush does not fail again
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+            sys.exit(1)
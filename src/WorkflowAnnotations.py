@@ -0,0 +1,83 @@
+'''
+Parser for the YesWorkflow `@begin/@end/@in/@out/@param/@desc` comment
+annotations of the annotated scripts
+'''
+
+import re
+
+TAG_PATTERN = re.compile(r"@(\w+)\s*([^@]*)")
+
+class Block:
+    """
+    One `@begin ... @end` block: its name, description, the names it reads
+    (`@in`, `@param`) and writes (`@out`), the 1-based lines of its
+    `@begin` and `@end` comments and its nested blocks.
+    """
+
+    def __init__(self, name, begin_line, parent=None):
+        self.name = name
+        self.begin_line = begin_line
+        self.end_line = None
+        self.parent = parent
+        self.desc = ""
+        self.inputs = []
+        self.outputs = []
+        self.params = []
+        self.uris = {}
+        self.children = []
+
+    @property
+    def depth(self):
+        return 0 if self.parent is None else self.parent.depth + 1
+
+    def walk(self):
+        yield self
+        for child in self.children:
+            yield from child.walk()
+
+    def __repr__(self):
+        return f"Block({self.name!r}, lines {self.begin_line}-{self.end_line})"
+
+def comment_tags(line):
+    # (tag, value) pairs of an annotation comment line, or [] for any other line
+    stripped = line.strip()
+    if not stripped.startswith("#") or "@" not in stripped:
+        return []
+    return [(tag, value.strip()) for tag, value in TAG_PATTERN.findall(stripped.lstrip("#"))]
+
+def parse_blocks(source):
+    """
+    Parse the annotations of `source` and return its top-level blocks.
+    Raises ValueError on an `@end` that does not close the innermost open
+    block, or on a block that is never closed.
+    """
+    roots, stack = [], []
+    for line_number, line in enumerate(source.splitlines(), start=1):
+        last = None
+        for tag, value in comment_tags(line):
+            if tag == "begin":
+                block = Block(value.split()[0], line_number, stack[-1] if stack else None)
+                (stack[-1].children if stack else roots).append(block)
+                stack.append(block)
+            elif tag == "end":
+                name = value.split()[0] if value else None
+                if not stack or (name is not None and name != stack[-1].name):
+                    raise ValueError(f"line {line_number}: @end {name} does not close an open block")
+                stack.pop().end_line = line_number
+            elif not stack:
+                continue
+            elif tag == "desc":
+                stack[-1].desc = value
+            elif tag in ("in", "out", "param"):
+                last = value.split()[0]
+                {"in": stack[-1].inputs, "out": stack[-1].outputs, "param": stack[-1].params}[tag].append(last)
+            elif tag == "uri" and last is not None:
+                stack[-1].uris[last] = value
+
+    if stack:
+        raise ValueError(f"@begin {stack[-1].name} on line {stack[-1].begin_line} is never closed")
+    return roots
+
+def parse_file(path):
+    with open(path, "r", encoding="utf-8") as file:
+        return parse_blocks(file.read())
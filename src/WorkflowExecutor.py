@@ -0,0 +1,525 @@
+'''
+Executes an annotated script as a DAG of its YesWorkflow blocks. Every
+top-level `@begin/@end` block (and every stretch of code between blocks)
+becomes a node; nodes depend on the nodes that last wrote the variables
+they read, and on the blocks whose `@out` names they declare as `@in`.
+Independent nodes run in parallel threads, and each node's outputs and
+printed text are cached under a hash of its code and its inputs' hashes, so
+a re-run after editing one block only recomputes that block and the nodes
+downstream of it. The least recently used entries are evicted once a
+script's cache grows past --max-cache-mb
+
+Usage: python WorkflowExecutor.py script [--workers n] [--cache-dir dir] [--max-cache-mb mb] [--no-cache] [--graph]
+'''
+
+import argparse
+import ast
+import builtins
+import copy
+import hashlib
+import io
+import os
+import pickle
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import lru_cache
+
+import pandas as pd
+
+from DataCache import file_hash
+from WorkflowAnnotations import parse_blocks
+
+# Bump whenever the cache entry layout changes
+CACHE_VERSION = 1
+DEFAULT_CACHE_DIR = "./data/.cache/workflow"
+DEFAULT_MAX_CACHE_MB = 1024
+
+MUTATING_METHODS = {
+    "append", "extend", "insert", "pop", "popitem", "remove", "clear", "update", "setdefault",
+    "add", "discard", "sort", "reverse",
+}
+
+class NameUsage(ast.NodeVisitor):
+    """
+    Names a piece of module-level code reads before binding them (`reads`)
+    and binds or mutates (`writes`). Item and attribute assignments,
+    `inplace=True` calls and in-place container methods count as both a
+    read and a write of the object's name. Functions contribute the global
+    names their bodies read, since those are looked up when they are called.
+    """
+
+    def __init__(self, bound=()):
+        self.reads = set()
+        self.writes = set()
+        self.bound = set(bound)
+        self.modules = set()
+
+    def load(self, name):
+        if name not in self.bound:
+            self.reads.add(name)
+
+    def store(self, name):
+        self.writes.add(name)
+        self.bound.add(name)
+
+    def mutate(self, node):
+        while isinstance(node, (ast.Attribute, ast.Subscript)):
+            node = node.value
+        if isinstance(node, ast.Name):
+            self.load(node.id)
+            self.store(node.id)
+
+    def visit_Name(self, node):
+        if isinstance(node.ctx, ast.Load):
+            self.load(node.id)
+        else:
+            self.store(node.id)
+
+    def visit_Subscript(self, node):
+        if isinstance(node.ctx, ast.Load):
+            self.generic_visit(node)
+        else:
+            self.visit(node.slice)
+            self.mutate(node.value)
+
+    def visit_Attribute(self, node):
+        if isinstance(node.ctx, ast.Load):
+            self.generic_visit(node)
+        else:
+            self.mutate(node.value)
+
+    def visit_Call(self, node):
+        self.generic_visit(node)
+        inplace = any(keyword.arg == "inplace" and isinstance(keyword.value, ast.Constant) and keyword.value.value is True
+                      for keyword in node.keywords)
+        if isinstance(node.func, ast.Attribute) and (inplace or node.func.attr in MUTATING_METHODS):
+            self.mutate(node.func.value)
+
+    def visit_Assign(self, node):
+        self.visit(node.value)
+        for target in node.targets:
+            self.visit(target)
+
+    def visit_AnnAssign(self, node):
+        if node.value is not None:
+            self.visit(node.value)
+        self.visit(node.target)
+
+    def visit_AugAssign(self, node):
+        self.visit(node.value)
+        if isinstance(node.target, ast.Name):
+            self.load(node.target.id)
+            self.store(node.target.id)
+        else:
+            self.visit(node.target)
+
+    def visit_For(self, node):
+        self.visit(node.iter)
+        self.visit(node.target)
+        for statement in node.body + node.orelse:
+            self.visit(statement)
+
+    def visit_Import(self, node):
+        for alias in node.names:
+            self.modules.add(alias.name.split(".")[0])
+            self.store(alias.asname or alias.name.split(".")[0])
+
+    def visit_ImportFrom(self, node):
+        if node.module is not None and node.level == 0:
+            self.modules.add(node.module.split(".")[0])
+        for alias in node.names:
+            if alias.name != "*":
+                self.store(alias.asname or alias.name)
+
+    def inner_scope(self, arguments, body):
+        # Free names of a nested scope are reads of the enclosing one
+        names = [arg.arg for arg in arguments.posonlyargs + arguments.args + arguments.kwonlyargs]
+        names += [arg.arg for arg in (arguments.vararg, arguments.kwarg) if arg is not None]
+        inner = NameUsage(names)
+        for node in body:
+            inner.visit(node)
+        for name in inner.reads:
+            self.load(name)
+        self.modules |= inner.modules
+
+    def visit_FunctionDef(self, node):
+        for expression in node.decorator_list + node.args.defaults + [d for d in node.args.kw_defaults if d]:
+            self.visit(expression)
+        self.inner_scope(node.args, node.body)
+        self.store(node.name)
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_Lambda(self, node):
+        for expression in node.args.defaults + [d for d in node.args.kw_defaults if d]:
+            self.visit(expression)
+        self.inner_scope(node.args, [node.body])
+
+    def visit_comprehension_scope(self, node, results):
+        inner = NameUsage()
+        for generator in node.generators:
+            inner.visit(generator.iter)
+            inner.visit(generator.target)
+            for condition in generator.ifs:
+                inner.visit(condition)
+        for result in results:
+            inner.visit(result)
+        for name in inner.reads:
+            self.load(name)
+
+    def visit_ListComp(self, node):
+        self.visit_comprehension_scope(node, [node.elt])
+
+    visit_SetComp = visit_GeneratorExp = visit_ListComp
+
+    def visit_DictComp(self, node):
+        self.visit_comprehension_scope(node, [node.key, node.value])
+
+class Node:
+    """A block or a stretch of code between blocks, with its lines and name usage."""
+
+    def __init__(self, name, first_line, last_line, code, block=None):
+        self.name = name
+        self.first_line = first_line
+        self.last_line = last_line
+        self.code = code
+        self.block = block
+        self.dependencies = set()
+        self.producers = {}
+
+        try:
+            tree = ast.parse(code)
+        except SyntaxError as error:
+            raise ValueError(f"{name} (lines {first_line}-{last_line}) is not a sequence of complete statements") from error
+        usage = NameUsage()
+        for statement in tree.body:
+            usage.visit(statement)
+        builtin_names = set(dir(builtins))
+        self.reads = usage.reads - builtin_names
+        self.writes = usage.writes
+        self.modules = usage.modules
+        self.has_code = bool(tree.body)
+
+    def __repr__(self):
+        return f"Node({self.name!r}, lines {self.first_line}-{self.last_line})"
+
+def build_nodes(source):
+    """
+    Split an annotated script into its nodes, in program order, and connect
+    each node to the nodes it depends on. A script wrapped in a single
+    top-level block is split along that block's children.
+    """
+    roots = parse_blocks(source)
+    blocks = roots[0].children if len(roots) == 1 and roots[0].children else roots
+    lines = source.splitlines(keepends=True)
+
+    nodes, position = [], 1
+    def add(name, first_line, last_line, block=None):
+        node = Node(name, first_line, last_line, "".join(lines[first_line - 1:last_line]), block)
+        if node.has_code or block is not None:
+            nodes.append(node)
+
+    for block in blocks:
+        if block.begin_line > position:
+            add(f"lines_{position}_{block.begin_line - 1}", position, block.begin_line - 1)
+        add(block.name, block.begin_line, block.end_line, block)
+        position = block.end_line + 1
+    if position <= len(lines):
+        add(f"lines_{position}_{len(lines)}", position, len(lines))
+
+    # Data dependencies on the last writer of each name, plus the declared @in/@out edges
+    writers, declared = {}, {}
+    for node in nodes:
+        for name in sorted(node.reads):
+            if name in writers:
+                node.producers[name] = writers[name]
+                node.dependencies.add(writers[name])
+        if node.block is not None:
+            for name in node.block.inputs:
+                if name in declared:
+                    node.dependencies.add(declared[name])
+            for name in node.block.outputs:
+                declared[name] = node
+        for name in node.writes:
+            writers[name] = node
+    return nodes
+
+@lru_cache(maxsize=None)
+def imported_modules(path):
+    # Top-level names of the absolute imports anywhere in a module, including inside functions
+    with open(path, "r", encoding="utf-8") as file:
+        tree = ast.parse(file.read(), filename=path)
+    modules = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            modules.update(alias.name.split(".")[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module is not None and node.level == 0:
+            modules.add(node.module.split(".")[0])
+    return modules
+
+def local_module_files(modules, directory):
+    """
+    Files of the modules in `directory` that `modules` reach, directly or
+    through the imports of other local modules.
+    """
+    files, pending = {}, list(modules)
+    while pending:
+        module = pending.pop()
+        path = os.path.join(directory, f"{module}.py")
+        if module in files or not os.path.exists(path):
+            continue
+        files[module] = path
+        pending.extend(imported_modules(path))
+    return [files[module] for module in sorted(files)]
+
+class ThreadOutput(io.TextIOBase):
+    """
+    Stand-in for sys.stdout that sends what a thread prints to that thread's
+    buffer while it has one, so parallel nodes never interleave their output.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+
+    def write(self, text):
+        buffer = getattr(self.local, "buffer", None)
+        return (buffer if buffer is not None else self.stream).write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+class WorkflowExecutor:
+    """
+    Runs the nodes of an annotated script. Each node executes in its own
+    namespace holding the values of the names it reads, taken from the
+    nodes that produced them; names a node mutates are handed over as
+    shallow copies so that its siblings keep seeing the original objects.
+    """
+
+    def __init__(self, path, cache_dir=DEFAULT_CACHE_DIR, workers=None, use_cache=True,
+                 max_cache_mb=DEFAULT_MAX_CACHE_MB):
+        self.path = path
+        with open(path, "r", encoding="utf-8") as file:
+            self.source = file.read()
+        self.nodes = build_nodes(self.source)
+        self.cache_dir = os.path.join(cache_dir, os.path.splitext(os.path.basename(path))[0])
+        self.workers = workers or os.cpu_count()
+        self.use_cache = use_cache
+        self.max_cache_bytes = None if max_cache_mb is None else int(max_cache_mb * 1024 * 1024)
+        self.cache_lock = threading.Lock()
+        self.script_dir = os.path.dirname(os.path.abspath(path))
+        # The executor's own code decides what is cached, so a new version invalidates every entry
+        self.version = f"{CACHE_VERSION}:{file_hash(os.path.abspath(__file__))}"
+        self.keys = self.node_keys()
+        self.records = []
+
+    def node_keys(self):
+        """
+        Content hash of every node: the executor version, its code, the
+        hashes of the nodes it depends on, every local module its imports
+        reach (directly or through other local modules) and the files named
+        by its `@uri file:` annotations.
+        """
+        keys, module_hashes = {}, {}
+        for node in self.nodes:
+            digest = hashlib.blake2b(f"{self.version}\n{node.name}\n{node.code}".encode("utf-8"))
+            for dependency in sorted(node.dependencies, key=self.nodes.index):
+                digest.update(keys[dependency.name].encode("utf-8"))
+            for module_path in local_module_files(node.modules, self.script_dir):
+                if module_path not in module_hashes:
+                    module_hashes[module_path] = file_hash(module_path)
+                digest.update(f"{os.path.basename(module_path)}:{module_hashes[module_path]}".encode("utf-8"))
+            if node.block is not None:
+                for uri in node.block.uris.values():
+                    if uri.startswith("file:") and os.path.exists(uri[len("file:"):]):
+                        digest.update(file_hash(uri[len("file:"):]).encode("utf-8"))
+            keys[node.name] = digest.hexdigest()
+        return keys
+
+    def cache_path(self, node):
+        return os.path.join(self.cache_dir, f"{node.name}.{self.keys[node.name]}.pkl")
+
+    def read_cache(self, node):
+        path = self.cache_path(node)
+        if not self.use_cache or not os.path.exists(path):
+            return None
+        with open(path, "rb") as file:
+            entry = pickle.load(file)
+        # A read counts as a use, so that the entry is evicted after the ones not read since
+        os.utime(path)
+        return entry
+
+    def write_cache(self, node, stdout, outputs):
+        if not self.use_cache:
+            return
+        try:
+            outputs = pickle.dumps(outputs, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            # Modules, functions and the like cannot be stored; the node re-runs when they are needed
+            outputs = None
+        if outputs is not None and self.max_cache_bytes is not None and len(outputs) > self.max_cache_bytes:
+            outputs = None
+        with self.cache_lock:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            for stale in os.listdir(self.cache_dir):
+                if stale.startswith(f"{node.name}.") and stale.endswith(".pkl"):
+                    os.remove(os.path.join(self.cache_dir, stale))
+            with open(self.cache_path(node), "wb") as file:
+                pickle.dump({"stdout": stdout, "outputs": outputs}, file, protocol=pickle.HIGHEST_PROTOCOL)
+            self.evict(keep=self.cache_path(node))
+
+    def evict(self, keep=None):
+        """
+        Remove the least recently used cache entries, other than `keep`,
+        until the script's cache fits in the size bound.
+        """
+        if self.max_cache_bytes is None:
+            return
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".pkl"):
+                stat = os.stat(os.path.join(self.cache_dir, name))
+                entries.append((stat.st_mtime_ns, stat.st_size, os.path.join(self.cache_dir, name)))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_cache_bytes:
+                break
+            if path != keep:
+                os.remove(path)
+                total -= size
+
+    def plan(self, entries):
+        """
+        Decide what every node does: "run" when it has no cache entry, or
+        when its values are needed downstream but could not be cached;
+        "load" when only its cached values are needed; "replay" otherwise,
+        which only prints its cached output.
+        """
+        actions, needed = {}, set()
+        for node in reversed(self.nodes):
+            entry = entries[node.name]
+            if entry is None or (node.name in needed and entry["outputs"] is None):
+                actions[node.name] = "run"
+                needed.update(producer.name for producer in node.producers.values())
+            elif node.name in needed:
+                actions[node.name] = "load"
+            else:
+                actions[node.name] = "replay"
+        return actions
+
+    def execute(self, node, values):
+        namespace = {"__name__": "__main__", "__file__": self.path, "__builtins__": builtins}
+        for name, producer in node.producers.items():
+            value = values[producer.name][name]
+            if name in node.writes and isinstance(value, (pd.DataFrame, pd.Series)):
+                value = value.copy(deep=False)
+            elif name in node.writes and isinstance(value, (list, dict, set)):
+                value = copy.copy(value)
+            namespace[name] = value
+
+        buffer = io.StringIO()
+        sys.stdout.local.buffer = buffer
+        start = time.perf_counter()
+        try:
+            exec(compile("\n" * (node.first_line - 1) + node.code, self.path, "exec"), namespace)
+        finally:
+            sys.stdout.local.buffer = None
+        elapsed = time.perf_counter() - start
+
+        outputs = {name: namespace[name] for name in node.writes if name in namespace}
+        self.write_cache(node, buffer.getvalue(), outputs)
+        return buffer.getvalue(), outputs, elapsed
+
+    def run(self):
+        # Copy-on-write keeps the shallow copies handed to mutating nodes independent
+        with pd.option_context("mode.copy_on_write", True):
+            return self.run_nodes()
+
+    def run_nodes(self):
+        entries = {node.name: self.read_cache(node) for node in self.nodes}
+        if self.use_cache and os.path.isdir(self.cache_dir):
+            # Apply a bound lowered since the last run; the entries just read are the last to go
+            with self.cache_lock:
+                self.evict()
+        actions = self.plan(entries)
+
+        values, stdout, finished = {}, {}, set()
+        for node in self.nodes:
+            if actions[node.name] != "run":
+                stdout[node.name] = entries[node.name]["stdout"]
+                if actions[node.name] == "load":
+                    values[node.name] = pickle.loads(entries[node.name]["outputs"])
+                finished.add(node.name)
+                self.records.append({"node": node.name, "action": actions[node.name], "seconds": 0.0})
+
+        real_stdout = sys.stdout
+        sys.stdout = ThreadOutput(real_stdout)
+        sys.path.insert(0, self.script_dir)
+        printed = self.flush(stdout, 0, real_stdout)
+        try:
+            with ThreadPoolExecutor(self.workers) as pool:
+                running = {}
+                pending = [node for node in self.nodes if node.name not in finished]
+                while pending or running:
+                    for node in [node for node in pending if all(d.name in finished for d in node.dependencies)]:
+                        running[pool.submit(self.execute, node, values)] = node
+                        pending.remove(node)
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        node = running.pop(future)
+                        try:
+                            stdout[node.name], values[node.name], elapsed = future.result()
+                        except BaseException:
+                            printed = self.flush(stdout, printed, real_stdout)
+                            raise
+                        finished.add(node.name)
+                        self.records.append({"node": node.name, "action": "run", "seconds": elapsed})
+                    printed = self.flush(stdout, printed, real_stdout)
+        finally:
+            sys.stdout = real_stdout
+            sys.path.remove(self.script_dir)
+        return values
+
+    def flush(self, stdout, printed, stream):
+        # Print the output of every finished node in program order, up to the first unfinished one
+        while printed < len(self.nodes) and self.nodes[printed].name in stdout:
+            stream.write(stdout[self.nodes[printed].name])
+            printed += 1
+        stream.flush()
+        return printed
+
+    def print_graph(self):
+        print(f"{'Node':<35} | {'Lines':<10} | {'Depends On'}")
+        print("-" * 100)
+        for node in self.nodes:
+            dependencies = ", ".join(d.name for d in sorted(node.dependencies, key=self.nodes.index))
+            print(f"{node.name:<35} | {f'{node.first_line}-{node.last_line}':<10} | {dependencies}")
+
+    def print_report(self):
+        order = {node.name: position for position, node in enumerate(self.nodes)}
+        print(f"{'Node':<35} | {'Action':<10} | {'Seconds':<10}")
+        print("-" * 60)
+        for record in sorted(self.records, key=lambda record: order[record["node"]]):
+            print(f"{record['node']:<35} | {record['action']:<10} | {record['seconds']:<10.3f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run an annotated script as a DAG of its @begin/@end blocks")
+    parser.add_argument("script")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR)
+    parser.add_argument("--max-cache-mb", type=float, default=DEFAULT_MAX_CACHE_MB,
+                        help="Evict the least recently used entries once the script's cache grows past this size")
+    parser.add_argument("--no-cache", dest="use_cache", action="store_false")
+    parser.add_argument("--graph", action="store_true", help="Print the dependency graph instead of running it")
+    args = parser.parse_args()
+
+    executor = WorkflowExecutor(args.script, args.cache_dir, args.workers, args.use_cache, args.max_cache_mb)
+    if args.graph:
+        executor.print_graph()
+    else:
+        executor.run()
+        print()
+        executor.print_report()
@@ -0,0 +1,16 @@
+import os
+import sys
+
+import pytest
+
+# The modules live flat in src/ and import each other by name, as the scripts do
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+@pytest.fixture(scope="session")
+def data_dir(tmp_path_factory):
+    # A small synthetic Menu/Dish/MenuItem dataset, written in several chunks like the large ones
+    from Benchmark import write_dataset
+
+    directory = str(tmp_path_factory.mktemp("data"))
+    write_dataset(directory, 3000, seed=1, chunk_size=1000)
+    return directory
@@ -0,0 +1,25 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from Pipeline import peak_rss_mb, reset_peak_rss
+from Benchmark import measure
+
+def test_measure_peak_excludes_earlier_allocations():
+    if not reset_peak_rss():
+        pytest.skip("The peak RSS can only be reset on Linux")
+    # Raise the process-wide peak by 200 MB before the measurement
+    block = np.ones(200 * 1024 * 1024 // 8)
+    del block
+    earlier_peak = peak_rss_mb()
+    df = pd.DataFrame({"id": range(100)})
+    record, result = measure("Head", "Menu", lambda frame: frame.head(10), df, repeat=2)
+    assert len(result) == 10 and record["rows_in"] == 100 and record["rows_out"] == 10
+    assert record["peak_rss_mb"] < earlier_peak - 150
+
+def test_measure_peak_includes_the_step():
+    if not reset_peak_rss():
+        pytest.skip("The peak RSS can only be reset on Linux")
+    small, _ = measure("Small", None, lambda frame: None, None, repeat=1)
+    large, _ = measure("Large", None, lambda frame: np.ones(200 * 1024 * 1024 // 8).sum(), None, repeat=1)
+    assert large["peak_rss_mb"] > small["peak_rss_mb"] + 150
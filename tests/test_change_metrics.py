@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from ChangeMetrics import cleaned_positions, column_changes, modified_cells
+
+def naive_changes(original, cleaned, column):
+    # Aligned copy of the original, where a value missing on both sides is unchanged
+    before = original[column].reindex(cleaned.index).astype(object)
+    after = cleaned[column].astype(object)
+    return sum(not (pd.isna(a) and pd.isna(b)) and (pd.isna(a) or pd.isna(b) or a != b)
+               for a, b in zip(before, after))
+
+@pytest.fixture
+def frames():
+    rng = np.random.default_rng(0)
+    original = pd.DataFrame({
+        "date": rng.choice(["1900-01-01", "Jan 1 1900", None, ""], 200),
+        "currency": pd.Categorical(rng.choice(["Dollars", "Francs", None], 200)),
+        "dish_id": pd.array(rng.choice([1, 2, 3, None], 200), dtype="Int64"),
+        "price": np.where(rng.random(200) < 0.3, np.nan, rng.random(200).round(2)),
+    })
+    cleaned = original[original["price"].notna()].assign(
+        date=lambda df: df["date"].replace({"Jan 1 1900": "1900-01-01", "": None}),
+        currency=lambda df: df["currency"].astype(object).replace({"Dollars": "USD"}),
+        dish_id=lambda df: df["dish_id"].replace({3: 1}),
+    )
+    return original, cleaned
+
+def test_column_changes_match_aligned_comparison(frames):
+    original, cleaned = frames
+    changes = column_changes(original, cleaned)
+    for column in original.columns:
+        assert changes.loc[column, "cells_modified"] == naive_changes(original, cleaned, column)
+        assert changes.loc[column, "cells_unchanged"] == len(cleaned) - changes.loc[column, "cells_modified"]
+    assert (changes["rows_removed"] == len(original) - len(cleaned)).all()
+    assert changes.loc["price", "cells_modified"] == 0
+
+def test_positions_without_range_index(frames):
+    original, cleaned = frames
+    original, cleaned = original.set_axis(original.index * 10 + 7), cleaned.set_axis(cleaned.index * 10 + 7)
+    np.testing.assert_array_equal(original.index[cleaned_positions(original, cleaned)], cleaned.index)
+    pd.testing.assert_frame_equal(column_changes(original, cleaned), column_changes(*frames))
+
+def test_positions_reject_unknown_rows(frames):
+    original, cleaned = frames
+    with pytest.raises(ValueError):
+        cleaned_positions(original.iloc[:10].set_axis(list("abcdefghij")), cleaned)
+
+def test_missing_on_both_sides_is_unchanged():
+    before = pd.array([1, None, None, 2], dtype="Int64")
+    after = pd.array([1, None, 5, None], dtype="Int64")
+    assert modified_cells(before, after).tolist() == [False, False, True, True]
@@ -0,0 +1,37 @@
+import sys
+
+import pandas as pd
+import pytest
+
+from CurrencyValidation import ISO_4217_SNAPSHOT, count_invalid_iso_4217, load_iso_4217_codes, validate_iso_4217
+
+def count_invalid_per_row(values):
+    # The original check: a new CurrencyCodes lookup for every row
+    CurrencyCodes = pytest.importorskip("forex_python.converter").CurrencyCodes
+    return int(values.apply(lambda code: CurrencyCodes().get_currency_name(code) is None if pd.notna(code) else True).sum())
+
+CODES = pd.Series(["USD", "FRF", "usd", None, "XXX1", "USD", "", "GBP", float("nan"), "ZZZ", "EUR"] * 3)
+
+def test_count_matches_per_row_check():
+    assert count_invalid_iso_4217(pd.DataFrame({"code": CODES}), "code") == count_invalid_per_row(CODES)
+
+def test_invalid_codes_are_counted_per_value():
+    invalid_count, invalid_codes = validate_iso_4217(CODES)
+    assert invalid_count == invalid_codes.sum()
+    known = load_iso_4217_codes()
+    assert set(invalid_codes.index.dropna()) == {code for code in CODES.dropna() if code not in known}
+    assert invalid_codes["ZZZ"] == 3
+
+def test_categorical_column():
+    assert validate_iso_4217(CODES.astype("category"))[0] == count_invalid_per_row(CODES)
+
+def test_bundled_snapshot_needs_no_forex_python(monkeypatch):
+    monkeypatch.setitem(sys.modules, "forex_python.converter", None)
+    assert load_iso_4217_codes.__wrapped__(ISO_4217_SNAPSHOT) == load_iso_4217_codes()
+    assert {"USD", "EUR", "GBP"} <= load_iso_4217_codes()
+
+def test_rebuilt_snapshot_matches_bundled(tmp_path):
+    pytest.importorskip("forex_python")
+    path = str(tmp_path / "codes.json")
+    codes = load_iso_4217_codes.__wrapped__(path)
+    assert codes == load_iso_4217_codes() == load_iso_4217_codes.__wrapped__(path)
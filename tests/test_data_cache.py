@@ -0,0 +1,77 @@
+import os
+
+import pandas as pd
+import pytest
+
+from CleaningRules import MENU_CONSTRAINTS, MENU_REQUIRED, clean_menu, drop_missing_values, replace_empty_strings
+from CurrencyValidation import CURRENCY_TO_SYMBOL, map_currency_symbols
+from DataCache import blank_mask, load_csv, load_required_csv, read_schema_csv, unique_rows
+from ICRegistry import count_violations
+
+@pytest.fixture(scope="module")
+def menus(data_dir):
+    # The same Menu.csv with the schema's categorical columns and as plain strings
+    path = os.path.join(data_dir, "Menu.csv")
+    categorical = load_csv(path, cache_dir=os.path.join(data_dir, ".cache"))
+    assert isinstance(categorical["currency"].dtype, pd.CategoricalDtype)
+    return categorical, read_schema_csv(path, {"id": "Int64"})
+
+def test_unique_rows_matches_drop_duplicates(menus):
+    categorical, plain = menus
+    columns = ["currency", "currency_symbol"]
+    expected = plain[columns].drop_duplicates()
+    unique = unique_rows(categorical, columns)
+    assert list(unique.index) == list(expected.index)
+    pd.testing.assert_frame_equal(unique.astype(object), expected.astype(object))
+
+def test_violations_match_on_categorical_and_plain(menus):
+    categorical, plain = menus
+    assert count_violations(MENU_CONSTRAINTS, categorical)[0] == count_violations(MENU_CONSTRAINTS, plain)[0]
+    cleaned_categorical, cleaned_plain = clean_menu(categorical), clean_menu(plain)
+    assert list(cleaned_categorical.index) == list(cleaned_plain.index)
+    assert count_violations(MENU_CONSTRAINTS, cleaned_categorical)[0] == \
+        count_violations(MENU_CONSTRAINTS, cleaned_plain)[0]
+
+def test_cached_load_matches_parse(data_dir, menus):
+    categorical, _ = menus
+    cached = load_csv(os.path.join(data_dir, "Menu.csv"), cache_dir=os.path.join(data_dir, ".cache"))
+    # Arrow reads missing strings back as None where the parser gives NaN
+    pd.testing.assert_frame_equal(cached.astype(object).where(cached.notna(), None),
+                                  categorical.astype(object).where(categorical.notna(), None))
+    assert (cached.dtypes == categorical.dtypes).all()
+
+def test_map_currency_symbols_categorical_matches_object():
+    currency = pd.Series(["Dollars", None, "Euros", "Marks", "Yen", "Dollars", None])
+    symbol = pd.Series(["$", "FRF", None, "DM", "¥", None, None])
+    expected = map_currency_symbols(currency, symbol)
+    mapped = map_currency_symbols(currency.astype("category"), symbol.astype("category"))
+    assert isinstance(mapped.dtype, pd.CategoricalDtype)
+    pd.testing.assert_series_equal(mapped.astype("string"), expected.astype("string"))
+    assert expected.tolist()[:3] == [CURRENCY_TO_SYMBOL["Dollars"], "FRF", "EUR"]
+
+def test_blank_mask():
+    values = pd.Series(["a", "", "  ", None, "b", "\t"])
+    assert blank_mask(values).tolist() == [False, True, True, True, False, True]
+    assert blank_mask(values.astype("category")).tolist() == blank_mask(values).tolist()
+
+def test_load_required_matches_drop_missing_values(data_dir):
+    path = os.path.join(data_dir, "Menu.csv")
+    cache_dir = os.path.join(data_dir, ".cache")
+    expected = drop_missing_values(replace_empty_strings(load_csv(path, cache_dir=cache_dir)))
+    df = load_required_csv(path, MENU_REQUIRED, cache_dir=cache_dir)
+    assert list(df.index) == list(expected.index)
+    pd.testing.assert_frame_equal(df[MENU_REQUIRED].astype(object), expected[MENU_REQUIRED].astype(object))
+
+def test_load_required_null_columns(tmp_path):
+    path = tmp_path / "Menu.csv"
+    path.write_text("id,date,currency,location,place\n1,1900-01-01,Dollars,Hotel, \n2,,Dollars,Hotel,Cafe\n"
+                    "3,1900-01-02,Dollars,Hotel,Cafe\n", encoding="utf-8")
+    df = load_required_csv(str(path), MENU_REQUIRED, null_columns=["place"], cache_dir=str(tmp_path / ".cache"))
+    assert df["id"].tolist() == [1, 3]
+    assert df["place"].isna().tolist() == [True, False]
+
+def test_load_required_without_rows(tmp_path):
+    path = tmp_path / "Menu.csv"
+    path.write_text("id,date,currency,location\n", encoding="utf-8")
+    df = load_required_csv(str(path), MENU_REQUIRED, cache_dir=str(tmp_path / ".cache"))
+    assert len(df) == 0 and list(df.columns) == ["id", "date", "currency", "location"]
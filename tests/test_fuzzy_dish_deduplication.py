@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from Pipeline import peak_rss_mb, reset_peak_rss
+from FuzzyDishDeduplication import (blocking_key, candidate_pairs, connected_components, estimated_similarities,
+                                    fuzzy_id_mapping, jaccard_similarities, minhash_signatures, ngram_hashes)
+
+KEYS = ["chicken broth", "chicken broths", "roast beef", "roast beef au jus", "apple pie", "chicken broth"]
+
+def dishes(names):
+    return pd.DataFrame({"id": pd.array(range(1, len(names) + 1), dtype="Int64"), "name": names})
+
+def test_all_null_names():
+    assert fuzzy_id_mapping(dishes([None, None, float("nan")])) == {}
+
+def test_no_names():
+    assert fuzzy_id_mapping(dishes([])) == {}
+
+def test_single_name():
+    assert fuzzy_id_mapping(dishes(["Consommé Royale"])) == {}
+
+def test_single_name_repeated():
+    # Same blocking key, so both later rows map to the first id
+    assert fuzzy_id_mapping(dishes(["Consommé Royale", None, "consomme royale", "CONSOMME ROYALE!"])) == {3: 1, 4: 1}
+
+def test_near_duplicates_merge():
+    mapping = fuzzy_id_mapping(dishes(["Chicken Broth", "Roast Beef", "Chicken Broths", "Apple Pie"]))
+    assert mapping == {3: 1}
+
+def test_blocking_key():
+    assert blocking_key("  Consommé,  Royale! ") == "consomme royale"
+    assert blocking_key("!!") is None and blocking_key(None) is None
+
+def test_ngram_hashes_match_python_ngrams():
+    hashes, owner = ngram_hashes(KEYS)
+    for key_index, key in enumerate(KEYS):
+        grams = {f" {key} "[start:start + 3] for start in range(len(key))}
+        assert len(set(hashes[owner == key_index].tolist())) == len(grams)
+    # Equal keys get equal n-grams
+    assert np.array_equal(hashes[owner == 0], hashes[owner == 5])
+
+def test_estimates_are_close_to_jaccard():
+    hashes, owner = ngram_hashes(KEYS)
+    signatures = minhash_signatures(hashes, owner, len(KEYS), num_perm=256)
+    pairs = np.array([(first, second) for first in range(len(KEYS)) for second in range(first + 1, len(KEYS))])
+    exact = jaccard_similarities(pairs, hashes, owner, len(KEYS))
+    estimates = estimated_similarities(pairs, signatures, chunk_size=4)
+    assert np.abs(estimates - exact).max() < 0.15
+    assert exact[pairs.tolist().index([0, 5])] == estimates[pairs.tolist().index([0, 5])] == 1.0
+
+def test_candidate_pairs_include_identical_and_close_keys():
+    hashes, owner = ngram_hashes(KEYS)
+    pairs = candidate_pairs(minhash_signatures(hashes, owner, len(KEYS)))
+    pairs = set(map(tuple, pairs.tolist()))
+    assert {(0, 5), (0, 1)} <= pairs
+    assert all(first < second for first, second in pairs)
+    assert (4, 5) not in pairs
+
+def test_connected_components():
+    pairs = np.array([[3, 4], [0, 1], [1, 2], [5, 2]])
+    assert connected_components(pairs, 7).tolist() == [0, 0, 0, 3, 3, 0, 6]
+    assert connected_components(np.empty((0, 2), dtype=np.int64), 3).tolist() == [0, 1, 2]
+
+def test_phase_peaks_exclude_earlier_allocations():
+    if not reset_peak_rss():
+        pytest.skip("The peak RSS can only be reset on Linux")
+    # Raise the process-wide peak by 200 MB before the phases run
+    block = np.ones(200 * 1024 * 1024 // 8)
+    del block
+    earlier_peak = peak_rss_mb()
+    phases = []
+    fuzzy_id_mapping(dishes(["Chicken Broth", "Chicken Broths", "Apple Pie"]), phases=phases)
+    assert [phase["phase"] for phase in phases][-1] == "Cluster"
+    assert all(phase["peak_rss_mb"] < earlier_peak - 150 for phase in phases)
@@ -0,0 +1,48 @@
+import os
+from functools import partial
+
+import pytest
+
+from CleaningRules import BAD_MAPPINGS, MENU_CONSTRAINTS, MENU_ITEM_CONSTRAINTS, clean_menu, count_empty
+from DataCache import load_csv
+from DishDeduplication import deduplicate_dishes
+from ICRegistry import count_violations, required_columns
+from ICScheduler import ICScheduler
+
+@pytest.fixture(scope="module")
+def frames(data_dir):
+    menu = load_csv(os.path.join(data_dir, "Menu.csv"))
+    menu_item = load_csv(os.path.join(data_dir, "MenuItem.csv"))
+    dish_df, _ = deduplicate_dishes(load_csv(os.path.join(data_dir, "Dish.csv")))
+    # Nameless dishes make bad mappings, which the synthetic names never are
+    dish_df = dish_df.assign(name=dish_df["name"].where(dish_df.index % 5 != 0))
+    return {"Original": menu, "Cleaned": clean_menu(menu)}, menu_item, dish_df
+
+@pytest.mark.parametrize("start_method", [None, "spawn"])
+def test_results_match_serial_checks(frames, start_method):
+    menus, menu_item, dish_df = frames
+    scheduler = ICScheduler()
+    for side, menu in menus.items():
+        scheduler.register_group([constraint.name for constraint in MENU_CONSTRAINTS], side,
+                                 partial(count_violations, MENU_CONSTRAINTS, bitmaps=True),
+                                 [(menu, required_columns(MENU_CONSTRAINTS))])
+    constraints = MENU_ITEM_CONSTRAINTS + [BAD_MAPPINGS]
+    scheduler.register_group([constraint.name for constraint in constraints], "Original",
+                             partial(count_violations, constraints),
+                             [(menu_item, required_columns(constraints)), (dish_df, ["id", "name"])])
+    scheduler.register("empty price", "Original", count_empty, [(menu_item, ["price"])], ("price",))
+    scheduler.set_result("empty price", "Cleaned", 0)
+
+    report = scheduler.run(max_workers=2, start_method=start_method)
+
+    for side, menu in menus.items():
+        counts, details, bitmaps = count_violations(MENU_CONSTRAINTS, menu, bitmaps=True)
+        for name, count in counts.items():
+            assert report.loc[name, side] == count
+            assert scheduler.bitmaps[(name, side)].to_positions().tolist() == bitmaps[name].to_positions().tolist()
+    counts, details = count_violations(constraints, menu_item, dish_df[["id", "name"]])
+    assert {name: report.loc[name, "Original"] for name in counts} == counts
+    assert counts["bad mappings"] > 0
+    assert scheduler.details[("bad mappings", "Original")].equals(details["bad mappings"])
+    assert report.loc["empty price", "Original"] == count_empty(menu_item, "price")
+    assert list(report.index) == [constraint.name for constraint in MENU_CONSTRAINTS + constraints] + ["empty price"]
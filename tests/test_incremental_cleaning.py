@@ -0,0 +1,66 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from Benchmark import generate_menu, generate_menu_items, write_dataset
+from IncrementalCleaning import run_incremental
+
+def read_raw(path):
+    # As text, so rewriting the file leaves the untouched rows byte for byte the same
+    return pd.read_csv(path, dtype=str, keep_default_na=False)
+
+def edit_table(path, rng, updates, generate):
+    """Delete and update a few random rows of the CSV at `path` and append new ones."""
+    df = read_raw(path)
+    df = df.drop(index=rng.choice(df.index, 20, replace=False))
+    rows = rng.choice(df.index, 40, replace=False)
+    for column, values in updates.items():
+        df.loc[rows, column] = rng.choice(values, len(rows))
+    new_rows = generate(15, int(df["id"].astype(int).max()) + 1).astype(str).replace({"nan": "", "<NA>": ""})
+    pd.concat([df, new_rows[df.columns]]).to_csv(path, index=False)
+
+def edit_dataset(directory, rng):
+    paths = {name: os.path.join(directory, f"{name}.csv") for name in ["Menu", "MenuItem", "Dish"]}
+    dish_ids = read_raw(paths["Dish"])["id"].to_numpy()
+    edit_table(paths["Menu"], rng, {
+        "date": ["1900-02-30", "Jan 5 1901", "", "1911-11-11"],
+        "currency": ["Cents", "Dollars", "", "Francs"],
+        "currency_symbol": ["", "$", "FRF"],
+        "occasion": ["", "Dinner", "daily menu", "anniversary banquet"],
+    }, lambda rows, start: generate_menu(rows, seed=int(rng.integers(1000)), start_id=start))
+    edit_table(paths["MenuItem"], rng, {
+        "price": ["", "0.5", "12.0"],
+        "dish_id": list(dish_ids[:30]) + [""],
+    }, lambda rows, start: generate_menu_items(rows, len(dish_ids), 100, seed=int(rng.integers(1000)), start_id=start))
+
+    # Renamed dishes change the id mapping, nameless ones the bad mappings
+    dish = read_raw(paths["Dish"])
+    rows = rng.choice(dish.index, 20, replace=False)
+    dish.loc[rows[:10], "name"] = dish.loc[rng.choice(dish.index, 10), "name"].to_numpy()
+    dish.loc[rows[10:], "name"] = ""
+    dish.to_csv(paths["Dish"], index=False)
+
+@pytest.mark.parametrize("seed", [0, 1])
+def test_incremental_totals_match_a_full_run(tmp_path, seed):
+    directory = str(tmp_path / "data")
+    write_dataset(directory, 600, seed=seed)
+    paths = [os.path.join(directory, f"{name}.csv") for name in ["Menu", "MenuItem", "Dish"]]
+    state_dir = str(tmp_path / "state")
+    run_incremental(*paths, state_dir)
+
+    rng = np.random.default_rng(seed)
+    for round_number in range(2):
+        edit_dataset(directory, rng)
+        menu_state, menu_delta, menu_item_state, menu_item_delta = run_incremental(*paths, state_dir)
+        full_menu, _, full_menu_item, _ = run_incremental(*paths, str(tmp_path / f"full{round_number}"))
+
+        assert len(menu_delta["deleted"]) == len(menu_item_delta["deleted"]) == 20
+        assert len(menu_delta["inserted"]) == len(menu_item_delta["inserted"]) == 15
+        assert 0 < len(menu_delta["recomputed"]) < len(full_menu.rows)
+
+        for state, full in [(menu_state, full_menu), (menu_item_state, full_menu_item)]:
+            assert state.totals == full.totals
+            pd.testing.assert_frame_equal(state.rows, full.rows, check_dtype=False)
+        assert full_menu_item.totals["original bad mappings"] > 0
@@ -0,0 +1,51 @@
+import pandas as pd
+import pytest
+
+import Memoization
+from Memoization import DiskMemo, memo_namespace, memoize_column, set_disk_store
+
+@pytest.fixture
+def store(tmp_path):
+    yield set_disk_store(str(tmp_path / "memo.sqlite"))
+    set_disk_store(None)
+    Memoization.MEMO_STATS.clear()
+
+def shout(value):
+    return None if pd.isna(value) else value.upper()
+
+VALUES = pd.Series(["a", "b", None, "a", "c", "b"], index=[5, 4, 3, 2, 1, 0])
+
+def test_matches_map(store):
+    pd.testing.assert_series_equal(memoize_column(shout, VALUES), VALUES.map(shout).astype(object))
+    assert Memoization.MEMO_STATS[f"{__name__}.shout"] == {"rows": 6, "distinct": 3, "disk_hits": 0, "computed": 4}
+
+def test_disk_hits_across_runs(store):
+    calls = []
+    def counted(value):
+        calls.append(value)
+        return shout(value)
+    memoize_column(counted, VALUES, name="counted", version="1")
+    memoize_column(counted, VALUES.iloc[:2], name="counted", version="1")
+    # The second run finds both of its values on disk
+    assert len(calls) == 4
+    assert Memoization.MEMO_STATS["counted"]["disk_hits"] == 2
+
+def test_new_version_invalidates(store):
+    memoize_column(shout, VALUES, name="shout", version="1")
+    result = memoize_column(str.lower, pd.Series(["A", "B"]), name="shout", version="2")
+    assert result.tolist() == ["a", "b"]
+    assert store.get_many("shout@1", ["a", "b", "c"]) == {}
+    assert store.get_many("shout@2", ["A", "B"]) == {0: "a", 1: "b"}
+
+def test_namespace_follows_source():
+    assert memo_namespace(shout, "shout") == memo_namespace(shout, "shout")
+    assert memo_namespace(shout, "shout") != memo_namespace(str.upper, "shout")
+    assert memo_namespace(shout, "shout", version="7") == "shout@7"
+
+def test_least_recently_used_are_evicted(tmp_path):
+    memo = DiskMemo(str(tmp_path / "memo.sqlite"), max_entries=3)
+    for key, value in [("a", 1), ("b", 2), ("c", 3)]:
+        memo.put_many("ns", [(key, value)])
+    assert memo.get_many("ns", ["a"]) == {0: 1}
+    memo.put_many("ns", [("d", 4)])
+    assert memo.get_many("ns", ["a", "b", "c", "d"]) == {0: 1, 2: 3, 3: 4}
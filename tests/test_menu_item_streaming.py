@@ -0,0 +1,37 @@
+import os
+
+import pytest
+
+from ChangeMetrics import column_changes
+from CleaningRules import BAD_MAPPINGS, MENU_ITEM_CONSTRAINTS, count_empty, drop_missing_price, handle_duplicates, \
+    replace_empty_strings
+from DataCache import load_csv
+from DishDeduplication import deduplicate_dishes
+from ICRegistry import count_violations
+from MenuItemStreaming import stream_menu_item
+
+@pytest.mark.parametrize("chunk_size", [700, 1000, 10_000])
+def test_streamed_counts_match_in_memory(data_dir, chunk_size):
+    # The in-memory counts as ICViolations.py and DataCleaningChanges.py compute them
+    dish_df = load_csv(os.path.join(data_dir, "Dish.csv"))
+    # Repeats of a dish_id without a name are bad mappings, which the synthetic names never are
+    dish_df, id_mapping = deduplicate_dishes(dish_df.assign(name=dish_df["name"].where(dish_df.index % 5 != 0)))
+    df = load_csv(os.path.join(data_dir, "MenuItem.csv"))
+    cleaned = drop_missing_price(replace_empty_strings(df))
+    remapped = handle_duplicates(df, id_mapping)
+    reference = dish_df[["id", "name"]]
+    original_counts, _ = count_violations(MENU_ITEM_CONSTRAINTS + [BAD_MAPPINGS], df, reference)
+    cleaned_counts, _ = count_violations(MENU_ITEM_CONSTRAINTS + [BAD_MAPPINGS], remapped, reference)
+
+    counters, violation_ids = stream_menu_item(os.path.join(data_dir, "MenuItem.csv"), dish_df, id_mapping, chunk_size)
+
+    assert counters["rows"] == len(df)
+    assert counters["rows_cleaned"] == len(cleaned)
+    assert counters["price_original"] == count_empty(df, "price") == original_counts["price"]
+    assert counters["price_cleaned"] == count_empty(cleaned, "price") == 0
+    assert counters["dish_id_changed"] == column_changes(df, remapped).loc["dish_id", "cells_modified"]
+    assert counters["dish_id_changed"] > 0
+    assert counters["bad_mappings_original"] == original_counts["bad mappings"]
+    assert counters["bad_mappings_cleaned"] == cleaned_counts["bad mappings"]
+    assert counters["bad_mappings_original"] > 0
+    assert violation_ids["violations"].sum() == counters["bad_mappings_cleaned"]
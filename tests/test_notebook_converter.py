@@ -0,0 +1,104 @@
+import json
+import os
+
+import pytest
+
+from NotebookConverter import block_name, convert_all, find_notebooks
+from WorkflowAnnotations import parse_blocks
+from WorkflowExecutor import build_nodes
+
+CELLS = [
+    ("markdown", "# Menu Cleaning"),
+    ("code", "import pandas as pd\n"),
+    ("markdown", "### 1. Load @ Data\nThe raw menus."),
+    ("code", "df = pd.DataFrame({\"price\": [1.0, None, 2.0]})"),
+    ("markdown", "### 2. Drop Missing"),
+    ("code", ["clean = df.dropna()\n", "print(len(clean))"]),
+]
+
+def write_notebook(path, cells=CELLS):
+    notebook = {
+        "nbformat": 4,
+        "nbformat_minor": 5,
+        "metadata": {},
+        "cells": [{"cell_type": cell_type, "metadata": {}, "source": source} for cell_type, source in cells],
+    }
+    path.write_text(json.dumps(notebook), encoding="utf-8")
+    return str(path)
+
+@pytest.fixture
+def notebook(tmp_path):
+    return write_notebook(tmp_path / "Cleaning.ipynb")
+
+def statuses(results):
+    return [result["status"] for result in results]
+
+def test_convert_then_unchanged(notebook, tmp_path):
+    results = convert_all([notebook], workers=1)
+    assert statuses(results) == ["converted"] and results[0]["cells"] == 3
+    script = tmp_path / "Cleaning.py"
+    assert script.read_text(encoding="utf-8") == (
+        "import pandas as pd\n\n\n"
+        "df = pd.DataFrame({\"price\": [1.0, None, 2.0]})\n\n"
+        "clean = df.dropna()\nprint(len(clean))\n\n"
+    )
+    assert statuses(convert_all([notebook], workers=1)) == ["unchanged"]
+    assert statuses(convert_all([notebook], workers=1, force=True)) == ["converted"]
+
+def test_edited_notebook_is_converted_again(notebook, tmp_path):
+    convert_all([notebook], workers=1)
+    write_notebook(tmp_path / "Cleaning.ipynb", CELLS + [("code", "print(clean)")])
+    results = convert_all([notebook], workers=1)
+    assert statuses(results) == ["converted"] and results[0]["cells"] == 4
+    assert (tmp_path / "Cleaning.py").read_text(encoding="utf-8").endswith("print(clean)\n\n")
+
+def test_refuses_to_overwrite_scripts_it_did_not_write(notebook, tmp_path):
+    script = tmp_path / "Cleaning.py"
+    script.write_text("# maintained by hand\n", encoding="utf-8")
+    assert statuses(convert_all([notebook], workers=1)) == ["not ours"]
+    assert script.read_text(encoding="utf-8") == "# maintained by hand\n"
+
+    assert statuses(convert_all([notebook], workers=1, overwrite=True)) == ["converted"]
+    # Once written by the converter, the script is converted again, until someone edits it
+    assert statuses(convert_all([notebook], workers=1, force=True)) == ["converted"]
+    with open(script, "a", encoding="utf-8") as file:
+        file.write("# edited\n")
+    assert statuses(convert_all([notebook], workers=1, force=True)) == ["not ours"]
+
+def test_annotate(notebook, tmp_path):
+    output_dir = tmp_path / "scripts"
+    output_dir.mkdir()
+    assert statuses(convert_all([notebook], str(output_dir), annotate=True, workers=1)) == ["converted"]
+    source = (output_dir / "Cleaning.py").read_text(encoding="utf-8")
+
+    roots = parse_blocks(source)
+    assert [root.name for root in roots] == ["CleaningScript"]
+    blocks = roots[0].children
+    assert [block.name for block in blocks] == ["Menu_Cleaning", "Load_Data", "Drop_Missing"]
+    assert blocks[1].desc == "1. Load  Data"
+    assert (blocks[1].inputs, blocks[1].outputs) == (["pd"], ["df"])
+    assert (blocks[2].inputs, blocks[2].outputs) == (["df"], ["clean"])
+    # The annotated script splits into one executor node per cell
+    assert [node.name for node in build_nodes(source)] == ["Menu_Cleaning", "Load_Data", "Drop_Missing"]
+
+    # Annotating changes the script, so the plain conversion is not "unchanged"
+    assert statuses(convert_all([notebook], str(output_dir), workers=1)) == ["converted"]
+    assert "# @begin" not in (output_dir / "Cleaning.py").read_text(encoding="utf-8")
+
+def test_parallel_conversion(tmp_path):
+    paths = [write_notebook(tmp_path / f"Notebook{number}.ipynb") for number in range(3)]
+    assert statuses(convert_all(paths, workers=2)) == ["converted"] * 3
+    assert all(os.path.exists(tmp_path / f"Notebook{number}.py") for number in range(3))
+
+def test_find_notebooks(tmp_path):
+    (tmp_path / "nested" / ".ipynb_checkpoints").mkdir(parents=True)
+    first = write_notebook(tmp_path / "A.ipynb")
+    second = write_notebook(tmp_path / "nested" / "B.ipynb")
+    write_notebook(tmp_path / "nested" / ".ipynb_checkpoints" / "B-checkpoint.ipynb")
+    assert find_notebooks([str(tmp_path), first]) == [os.path.normpath(first), os.path.normpath(second)]
+
+def test_block_name():
+    used = set()
+    assert block_name("### 2. Date Standardization", used) == "Date_Standardization"
+    assert block_name("## Date Standardization", used) == "Date_Standardization_2"
+    assert block_name("# 2023 Menus", used) == "Cell_2023_Menus"
@@ -0,0 +1,48 @@
+import pandas as pd
+import pytest
+
+from OccasionClustering import OCCASION_CLUSTERS, OccasionIndex, normalize_key, normalize_occasions
+
+INDEX = OccasionIndex()
+
+@pytest.mark.parametrize("occasion, cluster, method", [
+    ("Dinner", "Dinner", "exact"),
+    ("Religious Holiday", "Religious Holiday", "exact"),
+    ("dinner", "Dinner", "normalized"),
+    ("  RELIGIOUS   holiday! ", "Religious Holiday", "normalized"),
+    ("Annual Dinner of the Society", "Annual", "token"),
+    ("Banquet in honor of the mayor", "Dinner", "token"),
+    # A two-word keyword wins over the one-word cluster name before it
+    ("Dinner; New Year's eve", "Holiday", "token"),
+    ("CHRISTMAS-SUPPER", "Religious Holiday", "token"),
+    ("Dinners", None, "unmatched"),
+    ("Daily menu?", "Daily", "token"),
+    ("[?]", None, "unmatched"),
+    ("", None, "unmatched"),
+    (None, None, "missing"),
+    (float("nan"), None, "missing"),
+    (12, None, "unmatched"),
+])
+def test_match(occasion, cluster, method):
+    assert INDEX.match(occasion) == (cluster, method)
+
+def test_normalize_key():
+    assert normalize_key("  New_Year's   EVE ") == "new year s eve"
+
+def test_normalize_occasions_matches_per_value():
+    occasions = pd.Series(["Dinner", "dinner", None, "Luncheon", "[?]", "Dinner", "Fair and dance", ""],
+                          index=[10, 11, 12, 13, 14, 15, 16, 17])
+    for values in [occasions, occasions.astype("category")]:
+        clusters, counts = normalize_occasions(values)
+        assert list(clusters.index) == list(occasions.index)
+        assert list(clusters.cat.categories) == OCCASION_CLUSTERS
+        assert clusters.astype(object).where(clusters.notna(), None).tolist() == \
+            [INDEX.match(value)[0] for value in occasions]
+        assert counts == {"exact": 2, "normalized": 1, "token": 2, "unmatched": 2, "missing": 1}
+
+def test_custom_clusters():
+    index = OccasionIndex(["Tea"], {"Tea": ["high tea", "afternoon"]})
+    assert index.match("Afternoon High Tea") == ("Tea", "token")
+    clusters, counts = normalize_occasions(pd.Series(["tea", "Dinner"]), index)
+    assert clusters.astype(object).tolist()[0] == "Tea" and pd.isna(clusters.iloc[1])
+    assert counts["normalized"] == 1 and counts["unmatched"] == 1
@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+
+from Pipeline import PipelineRunner, touched_columns
+
+def frame():
+    return pd.DataFrame({
+        "id": pd.array([1, 2, 3, 4], dtype="Int64"),
+        "currency": pd.Categorical(["Dollars", None, "Francs", "Dollars"]),
+        "price": [1.0, np.nan, 2.5, 3.0],
+        "occasion": ["Dinner", "", None, "Lunch"],
+    })
+
+def test_global_copy_on_write_is_left_alone():
+    before = pd.get_option("mode.copy_on_write")
+    runner = PipelineRunner()
+    runner.frames["menu"] = frame()
+    runner.run("menu", [("Upper", lambda df: df.assign(occasion=df["occasion"].str.upper()))])
+    assert pd.get_option("mode.copy_on_write") == before
+
+def test_steps_do_not_modify_the_loaded_frame():
+    runner = PipelineRunner()
+    runner.frames["menu"] = frame()
+
+    def mutate(df):
+        df["price"] = 0.0
+        return df
+
+    assert (runner.run("menu", [("Mutate", mutate)])["price"] == 0.0).all()
+    pd.testing.assert_frame_equal(runner.frames["menu"], frame())
+
+def test_touched_columns():
+    df = frame()
+    with pd.option_context("mode.copy_on_write", True):
+        assert touched_columns(df, df.copy(deep=False)) == []
+        assert touched_columns(df, df.assign(price=df["price"] * 2)) == ["price"]
+        # Assigned but equal values, missing on both sides included, are unchanged
+        assert touched_columns(df, df.assign(price=df["price"].copy(), id=df["id"].copy())) == []
+        assert touched_columns(df, df.assign(currency=df["currency"].cat.rename_categories(["USD", "FRF"]))) == \
+            ["currency"]
+        assert touched_columns(df, df.dropna(subset=["price"])) == []
+        assert touched_columns(df, df.dropna(subset=["price"]).assign(extra=1).drop(columns="id")) == ["extra", "id"]
+        assert touched_columns(df, (df.iloc[::-1].reset_index(drop=True), {})) == list(df.columns)
+        assert touched_columns(df, {"not": "a frame"}) is None
+
+def test_report_records():
+    runner = PipelineRunner()
+    runner.frames["menu"] = frame()
+    runner.run("menu", [("Drop_Missing_Price", lambda df: df.dropna(subset=["price"]))])
+    record = runner.records[-1]
+    assert (record["step"], record["rows_in"], record["rows_out"], record["columns"]) == \
+        ("Drop_Missing_Price", 4, 3, "none")
@@ -0,0 +1,38 @@
+import os
+
+import pytest
+
+pytest.importorskip("polars")
+
+from ChangeMetrics import column_changes
+from CleaningRules import clean_menu, clean_menu_item
+from DataCache import load_csv
+from DishDeduplication import deduplicate_dishes
+from PolarsBackend import build_plans, check_against_pandas, collect_plans
+
+@pytest.fixture(scope="module")
+def results(data_dir):
+    return collect_plans(build_plans(data_dir))
+
+def test_cleaned_tables_match_pandas(results, data_dir):
+    assert check_against_pandas(results, data_dir) == {"menu": [], "menu_item": []}
+
+def test_changes_match_pandas(results, data_dir):
+    _, id_mapping = deduplicate_dishes(load_csv(os.path.join(data_dir, "Dish.csv")))
+    menu, menu_item = load_csv(os.path.join(data_dir, "Menu.csv")), load_csv(os.path.join(data_dir, "MenuItem.csv"))
+    expected = {"menu_changes": column_changes(menu, clean_menu(menu)),
+                "menu_item_changes": column_changes(menu_item, clean_menu_item(menu_item, id_mapping))}
+    for plan, changes in expected.items():
+        for row in results[plan].iter_rows(named=True):
+            assert row["rows_removed"] == changes.loc[row["column"], "rows_removed"]
+            assert row["cells_modified"] == changes.loc[row["column"], "cells_modified"]
+
+def test_format_and_match_counts_accumulate(data_dir):
+    format_counts, match_counts = {}, {}
+    for _ in range(2):
+        collect_plans(build_plans(data_dir, format_counts, match_counts))
+    once_format, once_match = {}, {}
+    collect_plans(build_plans(data_dir, once_format, once_match))
+    assert once_format and once_match
+    assert format_counts == {name: 2 * count for name, count in once_format.items()}
+    assert match_counts == {name: 2 * count for name, count in once_match.items()}
@@ -0,0 +1,60 @@
+import os
+
+import pytest
+
+from CleaningRules import BAD_MAPPINGS, MENU_CONSTRAINTS, MENU_ITEM_CONSTRAINTS, currency_to_symbol, \
+    drop_empty_currency, drop_invalid_currencies, drop_missing_price, drop_missing_values, handle_duplicates, \
+    normalize_occasion, replace_empty_strings, to_iso_format
+from DataCache import load_csv
+from DishDeduplication import deduplicate_dishes
+from ICRegistry import count_violations
+from SQLBackend import SQLBackend, connect
+
+def pandas_report(data_dir):
+    # The Original/Cleaned counts of ICViolations.py, whose sections each clean the loaded frame
+    menu = load_csv(os.path.join(data_dir, "Menu.csv"))
+    menu_item = load_csv(os.path.join(data_dir, "MenuItem.csv"))
+    dish_df, id_mapping = deduplicate_dishes(load_csv(os.path.join(data_dir, "Dish.csv")))
+    reference = dish_df[["id", "name"]]
+
+    sides = {
+        "Original": [count_violations(MENU_CONSTRAINTS, menu)[0],
+                     count_violations(MENU_ITEM_CONSTRAINTS + [BAD_MAPPINGS], menu_item, reference)[0]],
+        "Cleaned": [count_violations(MENU_CONSTRAINTS[:3], drop_missing_values(replace_empty_strings(menu)))[0],
+                    count_violations(MENU_CONSTRAINTS[3:4], to_iso_format(menu))[0],
+                    count_violations(MENU_CONSTRAINTS[4:5],
+                                     currency_to_symbol(drop_invalid_currencies(drop_empty_currency(menu))))[0],
+                    count_violations(MENU_CONSTRAINTS[5:6], normalize_occasion(menu))[0],
+                    count_violations(MENU_ITEM_CONSTRAINTS, drop_missing_price(replace_empty_strings(menu_item)))[0],
+                    count_violations([BAD_MAPPINGS], handle_duplicates(menu_item, id_mapping), reference)[0]],
+    }
+    report = {}
+    for side, counts in sides.items():
+        for side_counts in counts:
+            for name, count in side_counts.items():
+                report.setdefault(name, {})[side] = count
+    return report
+
+@pytest.mark.parametrize("engine", ["sqlite", "duckdb"])
+def test_ic_report_matches_pandas(data_dir, tmp_path, engine):
+    if engine == "duckdb":
+        pytest.importorskip("duckdb")
+    backend = SQLBackend(connect(engine, str(tmp_path / "tables.sqlite")))
+    try:
+        report = backend.ic_report(data_dir)
+    finally:
+        backend.engine.close()
+
+    expected = pandas_report(data_dir)
+    assert report == expected
+
+def test_reruns_replace_lookup_tables(data_dir, tmp_path):
+    engine = connect("sqlite", str(tmp_path / "tables.sqlite"))
+    backend = SQLBackend(engine)
+    lookup_tables = []
+    for _ in range(2):
+        backend.ic_report(data_dir)
+        lookup_tables.append([name for (name,) in engine.query("SELECT name FROM sqlite_temp_master WHERE type = 'table'")
+                              if name.startswith("_lookup_")])
+    engine.close()
+    assert lookup_tables[0] and sorted(lookup_tables[0]) == sorted(lookup_tables[1])
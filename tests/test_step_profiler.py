@@ -0,0 +1,75 @@
+import json
+import runpy
+
+import numpy as np
+import pytest
+
+from StepProfiler import StepProfiler, instrument, run_script
+
+SCRIPT = '''\
+# @begin Example
+import pandas as pd
+
+# @begin Load @out df
+df = pd.DataFrame({"price": [1.0, None, 2.0, None, 3.0]})
+# @end Load
+
+# @begin Drop_Missing @in df @out df
+df = df.dropna()
+for row in df.itertuples():
+    # @begin Per_Row
+    print(row.price)
+    # @end Per_Row
+# @end Drop_Missing
+
+print(len(df))
+# @end Example
+'''
+
+@pytest.fixture
+def script(tmp_path):
+    path = tmp_path / "example.py"
+    path.write_text(SCRIPT, encoding="utf-8")
+    return str(path)
+
+def test_instrumented_run_matches_direct_run(script, tmp_path, capsys):
+    direct = runpy.run_path(script, run_name="__main__")
+    direct_output = capsys.readouterr().out
+
+    log_path = str(tmp_path / "steps.jsonl")
+    profiler = run_script(script, log_path)
+    assert capsys.readouterr().out == direct_output == "1.0\n2.0\n3.0\n3\n"
+
+    steps = [record["step"] for record in profiler.records]
+    assert steps == ["Load", "Per_Row", "Per_Row", "Per_Row", "Drop_Missing", "Example"]
+    drop = profiler.records[4]
+    assert (drop["rows_in"], drop["rows_out"], drop["depth"], drop["parent"]) == (5, 3, 1, "Example")
+    with open(log_path, "r", encoding="utf-8") as file:
+        assert [json.loads(line)["step"] for line in file] == steps
+
+def test_instrument_keeps_line_numbers():
+    instrumented = instrument(SCRIPT)
+    assert len(instrumented.splitlines()) == len(SCRIPT.splitlines())
+    assert "__profiler__.begin('Per_Row', globals())" in instrumented.splitlines()[10]
+
+def test_failed_step_is_recorded():
+    profiler = StepProfiler()
+    with pytest.raises(KeyError):
+        with profiler.step("Outer"):
+            with profiler.step("Fails"):
+                raise KeyError("price")
+    assert [(record["step"], record["error"]) for record in profiler.records] == \
+        [("Fails", "KeyError('price')"), ("Outer", "KeyError('price')")]
+
+def test_peak_rss_is_per_step():
+    profiler = StepProfiler()
+    if not profiler.rss_reset:
+        pytest.skip("The peak RSS can only be reset on Linux")
+    with profiler.step("Outer"):
+        with profiler.step("Allocates"):
+            np.ones(200 * 1024 * 1024 // 8).sum()
+        with profiler.step("Small"):
+            pass
+    peaks = {record["step"]: record["peak_rss_mb"] for record in profiler.records}
+    assert peaks["Small"] < peaks["Allocates"] - 150
+    assert peaks["Outer"] >= peaks["Allocates"]
@@ -0,0 +1,79 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ViolationBitmaps import ARRAY_LIMIT, Bitmap, evaluate_expression, load_report, save_report, stale_reason
+
+def random_positions(seed, size, dense_blocks=()):
+    # Sparse positions across a few 65536-row containers plus every row of `dense_blocks`
+    rng = np.random.default_rng(seed)
+    positions = set(rng.integers(0, 5 << 16, size).tolist())
+    for block in dense_blocks:
+        positions |= set(range(block << 16, (block << 16) + ARRAY_LIMIT + 1000))
+    return positions
+
+@pytest.fixture
+def sets():
+    return random_positions(0, 3000, dense_blocks=[1, 3]), random_positions(1, 3000, dense_blocks=[1, 2])
+
+def test_roundtrip_positions(sets):
+    for positions in sets:
+        bitmap = Bitmap.from_positions(list(positions))
+        assert bitmap.to_positions().tolist() == sorted(positions)
+        assert len(bitmap) == len(positions)
+    # Blocks holding more than ARRAY_LIMIT rows are bitsets
+    assert bitmap.containers[1].dtype == np.uint64 and bitmap.containers[0].dtype == np.uint16
+
+@pytest.mark.parametrize("operator", ["&", "|", "-"])
+def test_set_operations_match_python_sets(sets, operator):
+    left, right = sets
+    combine = {"&": lambda a, b: a & b, "|": lambda a, b: a | b, "-": lambda a, b: a - b}[operator]
+    result = combine(Bitmap.from_positions(list(left)), Bitmap.from_positions(list(right)))
+    assert result.to_positions().tolist() == sorted(combine(left, right))
+    assert len(result) == len(combine(left, right))
+
+def test_membership(sets):
+    positions = sets[0]
+    bitmap = Bitmap.from_positions(list(positions))
+    for position in list(positions)[:200] + [(1 << 16) + 5, 2, 4 << 16, (10 << 16) + 1]:
+        assert (position in bitmap) == (position in positions)
+
+def test_empty_and_out_of_range():
+    empty = Bitmap.from_positions([])
+    assert len(empty) == 0 and empty.to_positions().tolist() == []
+    assert len(empty | Bitmap.from_positions([3])) == 1
+    with pytest.raises(ValueError):
+        Bitmap.from_positions([-1])
+
+def test_from_mask_uses_integer_labels():
+    mask = np.array([True, False, True, True])
+    assert Bitmap.from_mask(mask).to_positions().tolist() == [0, 2, 3]
+    assert Bitmap.from_mask(mask, pd.Index([10, 11, 70000, 12])).to_positions().tolist() == [10, 12, 70000]
+
+def test_save_and_load_report(sets, tmp_path):
+    csv_path = tmp_path / "Menu.csv"
+    csv_path.write_text("id\n1\n", encoding="utf-8")
+    bitmaps = {("date", "Original"): Bitmap.from_positions(list(sets[0])),
+               ("currency", "Original"): Bitmap.from_positions(list(sets[1])),
+               ("date", "Cleaned"): Bitmap.from_positions([])}
+    results = {key: len(bitmap) for key, bitmap in bitmaps.items()}
+    tables = {"menu": {"path": str(csv_path), "rows": 1, "constraints": ["date", "currency"]}}
+
+    save_report(str(tmp_path / "violations"), results, bitmaps, tables)
+    report, loaded = load_report(str(tmp_path / "violations"))
+    assert {key: bitmap.to_positions().tolist() for key, bitmap in loaded.items()} == \
+        {key: bitmap.to_positions().tolist() for key, bitmap in bitmaps.items()}
+    assert {entry["constraint"]: entry["table"] for entry in report["bitmaps"]} == {"date": "menu", "currency": "menu"}
+
+    result, names = evaluate_expression("date - currency", loaded, "Original")
+    assert names == ["date", "currency"] and result.to_positions().tolist() == sorted(sets[0] - sets[1])
+    with pytest.raises(KeyError):
+        evaluate_expression("date & occasion", loaded, "Original")
+
+    assert stale_reason(report["tables"]["menu"]) is None
+    csv_path.write_text("id\n1\n2\n", encoding="utf-8")
+    assert "changed" in stale_reason(report["tables"]["menu"])
+    os.remove(csv_path)
+    assert "no longer exists" in stale_reason(report["tables"]["menu"])
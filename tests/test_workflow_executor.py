@@ -0,0 +1,135 @@
+import ast
+import os
+import runpy
+
+import pytest
+
+from WorkflowExecutor import NameUsage, WorkflowExecutor, build_nodes
+
+SCRIPT = '''\
+import pandas as pd
+from helper import dropped
+
+# @begin Load @out df
+df = pd.DataFrame({"price": [1.0, None, 2.0, None, 3.0]})
+print("load", len(df))
+# @end Load
+
+# @begin Count @in df
+print("count", df["price"].count())
+# @end Count
+
+# @begin Clean @in df @out clean
+clean = dropped(df)
+print("clean", len(clean))
+# @end Clean
+
+# @begin Report @in clean
+print("report", clean["price"].sum())
+# @end Report
+'''
+
+HELPER = '''\
+def dropped(df):
+    return df.dropna()
+'''
+
+@pytest.fixture
+def script(tmp_path):
+    (tmp_path / "helper.py").write_text(HELPER, encoding="utf-8")
+    path = tmp_path / "example.py"
+    path.write_text(SCRIPT, encoding="utf-8")
+    return str(path)
+
+def usage(code):
+    visitor = NameUsage()
+    for statement in ast.parse(code).body:
+        visitor.visit(statement)
+    return visitor.reads, visitor.writes
+
+def run(script, tmp_path, capsys, **options):
+    executor = WorkflowExecutor(script, str(tmp_path / "cache"), **options)
+    executor.run()
+    actions = {record["node"]: record["action"] for record in executor.records}
+    return capsys.readouterr().out, actions
+
+def test_name_usage():
+    assert usage("df = df.dropna()") == ({"df"}, {"df"})
+    assert usage("df['price'] = 1") == ({"df"}, {"df"})
+    assert usage("df.dropna(inplace=True)") == ({"df"}, {"df"})
+    assert usage("names.append(name)") == ({"names", "name"}, {"names"})
+    assert usage("total = 0\ntotal += price") == ({"price"}, {"total"})
+    assert usage("def scale(x, factor=default):\n    return x * rate") == ({"default", "rate"}, {"scale"})
+    assert usage("squares = [x * x for x in values if x > limit]") == ({"values", "limit"}, {"squares"})
+
+def test_build_nodes_dependencies():
+    nodes = build_nodes(SCRIPT)
+    assert [node.name for node in nodes] == ["lines_1_3", "Load", "Count", "Clean", "Report"]
+    dependencies = {node.name: sorted(d.name for d in node.dependencies) for node in nodes}
+    assert dependencies == {
+        "lines_1_3": [],
+        "Load": ["lines_1_3"],
+        "Count": ["Load"],
+        "Clean": ["Load", "lines_1_3"],
+        "Report": ["Clean"],
+    }
+    assert {name: producer.name for name, producer in nodes[3].producers.items()} == \
+        {"df": "Load", "dropped": "lines_1_3"}
+
+def test_node_keys_change_downstream_only(script, tmp_path):
+    keys = WorkflowExecutor(script, str(tmp_path / "cache")).keys
+    with open(script, "w", encoding="utf-8") as file:
+        file.write(SCRIPT.replace('print("clean", len(clean))', 'print("cleaned", len(clean))'))
+    edited = WorkflowExecutor(script, str(tmp_path / "cache")).keys
+    assert [name for name in keys if keys[name] != edited[name]] == ["Clean", "Report"]
+
+    # Editing a local module changes the nodes that import it and everything downstream of them
+    (tmp_path / "helper.py").write_text(HELPER + "\n", encoding="utf-8")
+    changed = WorkflowExecutor(script, str(tmp_path / "cache")).keys
+    assert [name for name in edited if edited[name] != changed[name]] == ["lines_1_3", "Load", "Count", "Clean", "Report"]
+
+def test_cached_replay_matches_direct_run(script, tmp_path, capsys, monkeypatch):
+    monkeypatch.syspath_prepend(str(tmp_path))
+    runpy.run_path(script, run_name="__main__")
+    direct = capsys.readouterr().out
+
+    output, actions = run(script, tmp_path, capsys)
+    assert output == direct
+    assert set(actions.values()) == {"run"}
+
+    output, actions = run(script, tmp_path, capsys)
+    assert output == direct
+    assert set(actions.values()) == {"replay"}
+
+def test_edit_reruns_downstream_nodes_only(script, tmp_path, capsys):
+    run(script, tmp_path, capsys)
+    with open(script, "w", encoding="utf-8") as file:
+        file.write(SCRIPT.replace('print("clean", len(clean))', 'print("cleaned", len(clean))'))
+
+    output, actions = run(script, tmp_path, capsys)
+    # The imports re-run since modules cannot be cached, but Load's frame comes from the cache
+    assert actions == {"lines_1_3": "run", "Load": "load", "Count": "replay", "Clean": "run", "Report": "run"}
+    assert "cleaned 3\n" in output and output.endswith("report 6.0\n")
+
+def test_cache_size_bound(script, tmp_path, capsys):
+    run(script, tmp_path, capsys)
+    cache_dir = tmp_path / "cache" / "example"
+    sizes = {entry.name: entry.stat().st_size for entry in os.scandir(cache_dir)}
+    bound = max(sizes.values()) + 1
+
+    output, actions = run(script, tmp_path, capsys, max_cache_mb=bound / (1024 * 1024))
+    assert set(actions.values()) == {"replay"}
+    # Every read touches its entry, so the next write evicts the entries not read again
+    with open(script, "w", encoding="utf-8") as file:
+        file.write(SCRIPT.replace('print("report", ', 'print("total", '))
+    output, actions = run(script, tmp_path, capsys, max_cache_mb=bound / (1024 * 1024))
+    assert output.endswith("total 6.0\n")
+    assert sum(entry.stat().st_size for entry in os.scandir(cache_dir)) <= bound
+    assert [entry.name.split(".")[0] for entry in os.scandir(cache_dir)] == ["Report"]
+
+def test_oversized_outputs_are_not_cached(script, tmp_path, capsys):
+    output, _ = run(script, tmp_path, capsys, max_cache_mb=0)
+    assert "report 6.0\n" in output
+    executor = WorkflowExecutor(script, str(tmp_path / "cache"), max_cache_mb=0)
+    entries = [executor.read_cache(node) for node in executor.nodes]
+    assert all(entry is None or entry["outputs"] is None for entry in entries)